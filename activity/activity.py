@@ -25,17 +25,18 @@ DEALINGS IN THE SOFTWARE.
 """
 
 import datetime
+import hashlib
+import json
 import re
 import os
 import io
+import logging
+import time
 import aiohttp
 import asyncio
 
 from collections import OrderedDict
 
-import matplotlib
-matplotlib.use('Agg')
-
 import discord
 from discord.ext import commands
 from discord.ext.commands import Command
@@ -46,7 +47,6 @@ from __main__ import send_cmd_help
 from .utils.dataIO import dataIO
 from .utils import checks
 
-from matplotlib import pyplot as plt
 
 try:
     import psutil
@@ -66,6 +66,7 @@ PATH = os.path.join(*PATH_LIST)
 JSON = os.path.join(*PATH_LIST, "settings.json")
 HOST = '127.0.0.1'
 INTERVAL = 5
+FLUSH_INTERVAL = 60
 
 class Activity:
     """Activity Logger.
@@ -86,6 +87,10 @@ class Activity:
       - on_off
       - server_id
       - server_name
+    - flush_interval
+
+    Counters are updated in memory and written to disk by a
+    background flusher (write-behind) instead of on every message.
     """
 
     def __init__(self, bot):
@@ -95,13 +100,42 @@ class Activity:
         self.lock = False
         self.session = aiohttp.ClientSession(loop=self.bot.loop)
         self.rank_max = 5
+        # (server_id, time_id) with unsaved changes
+        self.dirty = set()
+        self.flush_stats = {
+            'flushes': 0,
+            'last_latency': 0,
+            'last_bytes': 0,
+            'total_bytes': 0,
+            'last_flushed': None
+        }
+        self.task = bot.loop.create_task(self.loop_task())
 
     def __unload(self):
         self.lock = True
+        self.task.cancel()
+        self.flush()
         self.session.close()
         for h in self.handles.values():
             h.close()
 
+    async def loop_task(self):
+        """Loop task: flush dirty counters to disk."""
+        await self.bot.wait_until_ready()
+        await asyncio.sleep(self.flush_interval)
+        try:
+            self.flush()
+        except Exception:
+            # dirty set is kept so the next flush retries the write
+            logging.getLogger("red").exception("Activity: failed to flush counters")
+        if self is self.bot.get_cog('Activity'):
+            self.task = self.bot.loop.create_task(self.loop_task())
+
+    @property
+    def flush_interval(self):
+        """Seconds between background flushes."""
+        return int(self.settings.get('flush_interval', FLUSH_INTERVAL))
+
     @commands.group(pass_context=True)
     @checks.is_owner()
     async def activityset(self, ctx: Context):
@@ -124,6 +158,42 @@ class Activity:
             await self.bot.say(f"Logging disabled for {server}")
         self.save_json()
 
+    @activityset.command(name="flushinterval", pass_context=True)
+    async def activityset_flushinterval(self, ctx: Context, seconds: int):
+        """Set interval in seconds between writes to disk."""
+        if seconds < 1:
+            await self.bot.say("Interval must be at least 1 second.")
+            return
+        self.settings['flush_interval'] = seconds
+        self.save_json()
+        await self.bot.say(
+            "Activity data will be saved every {} seconds.".format(seconds))
+
+    @activityset.command(name="flush", pass_context=True)
+    async def activityset_flush(self, ctx: Context):
+        """Write pending activity data to disk now.
+
+        Shows flush latency and bytes written.
+        """
+        flushed = self.flush()
+        stats = self.flush_stats
+        out = []
+        if flushed:
+            out.append("Flushed {} server week(s).".format(flushed))
+        else:
+            out.append("Nothing to flush.")
+        out.append("Flush interval: {} seconds".format(self.flush_interval))
+        out.append("Flushes: {}".format(stats['flushes']))
+        out.append("Last flush latency: {:.2f} ms".format(
+            stats['last_latency'] * 1000))
+        out.append("Last flush bytes written: {:,}".format(
+            stats['last_bytes']))
+        out.append("Total bytes written: {:,}".format(stats['total_bytes']))
+        if stats['last_flushed'] is not None:
+            out.append("Last flushed: {} UTC".format(
+                stats['last_flushed'].isoformat()))
+        await self.bot.say("\n".join(out))
+
     @commands.command(pass_context=True, no_pm=True)
     async def rank(self, ctx: Context, member: discord.Member = None):
         """Return the activity level of the caller or member.
@@ -253,57 +323,35 @@ class Activity:
         if settings is None:
             return
 
-        facecolor = '#32363b'
-        edgecolor = '#eeeeee'
-        spinecolor = '#999999'
-        footercolor = '#999999'
-        labelcolor = '#cccccc'
-        tickcolor = '#999999'
-        titlecolor = '#ffffff'
+        render = self.bot.get_cog('PlotRender')
+        if render is None:
+            await self.bot.say(
+                "PlotRender cog is required to plot activity.")
+            return
 
         # settings[day][hour]
-        fig, axes = plt.subplots(7, sharex=True, sharey=True)
-
-        plt.xticks(range(0, 24, 4))
-
-        days = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
-        days_gen = (d for d in days)
-
-        for ax in axes:
-            ax.ylabel = next(days_gen)
-            # await self.bot.say(day)
-            for spine in ax.spines.values():
-                spine.set_edgecolor(spinecolor)
-
-        for i, (k, v) in enumerate(settings.items()):
+        version = hashlib.sha1(
+            json.dumps(settings, sort_keys=True).encode()).hexdigest()
+        png = await render.render(
+            'activity', (server.id, time_id), version,
+            lambda: self.activity_data(settings))
+        await self.bot.send_file(
+            ctx.message.channel, io.BytesIO(png),
+            filename='plot.png', content="")
+
+    def activity_data(self, settings):
+        """Plot data for plotactivity."""
+        days = []
+        for _, v in sorted(settings.items()):
             # fix legacy data  issues where v is not a dict
             if isinstance(v, dict):
-                x = [str(k) for k in v.keys()]
-                y = [int(k) for k in v.values()]
-                axes[i].plot(x, y, 'o-')
-                axes[i].tick_params(axis='x', colors=tickcolor)
-                axes[i].tick_params(axis='y', colors=tickcolor)
-
-        fig.subplots_adjust(hspace=0)
-        plt.setp([a.get_xticklabels() for a in fig.axes[:-1]], visible=False)
-
-        plot_filename = 'plot.png'
-        plot_name = ""
-
-        with io.BytesIO() as f:
-            plt.savefig(
-                f, format="png", facecolor=facecolor,
-                edgecolor=edgecolor, transparent=True)
-            f.seek(0)
-            await ctx.bot.send_file(
-                ctx.message.channel,
-                f,
-                filename=plot_filename,
-                content=plot_name)
-
-        fig.clf()
-        plt.clf()
-        plt.cla()
+                hours = sorted(v.items())
+                days.append((
+                    [int(k) for k, _ in hours],
+                    [int(c) for _, c in hours]))
+            else:
+                days.append(None)
+        return {'days': days}
 
     def get_message_ranks(
             self, server: discord.Server, time_id: str, top_max=5):
@@ -499,7 +547,7 @@ class Activity:
             day = date.strftime("%w")
             server_settings['message_time'][day][hour] += 1
 
-        self.save_json()
+        self.mark_dirty(server, time_id)
 
     async def on_command(self, command: Command, ctx: Context):
         """Log command used."""
@@ -527,7 +575,7 @@ class Activity:
             }
         server_commands[command.name]['count'] += 1
 
-        self.save_json()
+        self.mark_dirty(server, time_id)
 
     def check_server_settings(self, server: discord.Server):
         """Verify server settings are available."""
@@ -563,8 +611,6 @@ class Activity:
 
         self.check_message_time_settings(server)
 
-        self.save_json()
-
     def check_message_time_settings(self, server: discord.Server):
         """Create message time fields if not already set."""
         time_id = self.get_time_id()
@@ -580,7 +626,6 @@ class Activity:
             if len(k) > 1:
                 del new_settings[k]
         settings = new_settings
-        self.save_json()
 
     def get_time_id(self, date: datetime.date=None):
         """Return current year, week as a tuple."""
@@ -603,9 +648,33 @@ class Activity:
             time_id = self.get_time_id()
         return self.settings[server.id][time_id]["commands"]
 
+    def mark_dirty(self, server: discord.Server, time_id: str):
+        """Flag server counters as changed since last flush."""
+        self.dirty.add((server.id, time_id))
+
+    def flush(self):
+        """Save settings if any counters have changed.
+
+        Return number of dirty server / time_id pairs written.
+        """
+        if not self.dirty:
+            return 0
+        count = len(self.dirty)
+        self.save_json()
+        return count
+
     def save_json(self):
         """Save settings."""
+        start = time.perf_counter()
         dataIO.save_json(JSON, self.settings)
+        latency = time.perf_counter() - start
+        size = os.path.getsize(JSON)
+        self.dirty.clear()
+        self.flush_stats['flushes'] += 1
+        self.flush_stats['last_latency'] = latency
+        self.flush_stats['last_bytes'] = size
+        self.flush_stats['total_bytes'] += size
+        self.flush_stats['last_flushed'] = datetime.datetime.utcnow()
 
 
 def check_folders():
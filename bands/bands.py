@@ -38,6 +38,13 @@ from cogs.utils import checks
 from cogs.utils.dataIO import dataIO
 from discord.ext import commands
 
+try:
+    from cogs.httpclient import client_session
+except ImportError:
+    def client_session(bot):
+        """One-off session when the HTTPClient cog is not installed."""
+        return aiohttp.ClientSession()
+
 PATH = os.path.join("data", "bands")
 JSON = os.path.join(PATH, "settings.json")
 CONFIG_YAML = os.path.join(PATH, "config.yml")
@@ -51,8 +58,9 @@ def nested_dict():
 class Client():
     """BrawlStats async client."""
 
-    def __init__(self, auth=None):
+    def __init__(self, auth=None, bot=None):
         """Init."""
+        self.bot = bot
         self.headers = {
             'Authorization': auth
         }
@@ -66,8 +74,8 @@ class Client():
         """Get a clan."""
         data = None
         try:
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.get(self.api_url("bands", tag)) as resp:
+            async with client_session(self.bot) as session:
+                async with session.get(self.api_url("bands", tag), headers=self.headers) as resp:
                     if resp.status == 200:
                         data = await resp.json()
         except json.JSONDecodeError:
@@ -98,7 +106,7 @@ class Bands:
     def client(self):
         if self._client is None:
             if self.bands_config is not None:
-                self._client = Client(auth=self.bands_config.authorization)
+                self._client = Client(auth=self.bands_config.authorization, bot=self.bot)
         return self._client
 
     @checks.mod_or_permissions()
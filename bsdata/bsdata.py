@@ -34,6 +34,7 @@ from random import choice
 
 import discord
 from __main__ import send_cmd_help
+from cogs.serverindex import emoji_str, get_emoji
 from cogs.utils import checks
 from cogs.utils.dataIO import dataIO
 from discord.ext import commands
@@ -44,6 +45,13 @@ try:
 except ImportError:
     raise ImportError("Please install the aiohttp package.") from None
 
+try:
+    from cogs.httpclient import client_session
+except ImportError:
+    def client_session(bot):
+        """One-off session when the HTTPClient cog is not installed."""
+        return aiohttp.ClientSession()
+
 PATH = os.path.join("data", "bsdata")
 JSON = os.path.join(PATH, "settings.json")
 
@@ -107,16 +115,17 @@ def format_timedelta(td):
     return '{0[0]} hr {0[1]} min {0[2]} sec'.format(l)
 
 
-async def fetch(url, timeout=10, headers=None):
+async def fetch(bot, url, timeout=10, headers=None):
     """Fetch URL.
 
-    :param session: aiohttp.ClientSession
+    :param bot: bot used to look up the shared HTTPClient session
     :param url: URL
+    :param headers: request headers
     :return: Response in JSON
     """
     try:
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.get(url, timeout=timeout) as resp:
+        async with client_session(bot) as session:
+            async with session.get(url, timeout=timeout, headers=headers) as resp:
                 data = await resp.json()
                 return data
     except asyncio.TimeoutError:
@@ -139,17 +148,11 @@ class BotEmoji:
 
     def name(self, name):
         """Emoji by name."""
-        for emoji in self.bot.get_all_emojis():
-            if emoji.name == name:
-                return '<:{}:{}>'.format(emoji.name, emoji.id)
-        return ''
+        return emoji_str(self.bot, name)
 
     def named(self, name):
         """Emoji object by name"""
-        for emoji in self.bot.get_all_emojis():
-            if emoji.name == name:
-                return emoji
-        return None
+        return get_emoji(self.bot, name)
 
     def key(self, key):
         """Chest emojis by api key name or key.
@@ -819,7 +822,7 @@ class BSData:
     async def get_band_data(self, tag):
         """Return band data JSON."""
         url = "{}{}".format(self.settings.band_api_url, tag)
-        data = await fetch(url, headers={"Authorization": self.settings.api_auth})
+        data = await fetch(self.bot, url, headers={"Authorization": self.settings.api_auth})
         return data
 
     def tag2member(self, tag=None):
@@ -1052,7 +1055,7 @@ class BSData:
     async def get_player_data(self, tag):
         """Return player data JSON."""
         url = "{}{}".format(self.settings.player_api_url, tag)
-        data = await fetch(url, headers={"Authorization": self.settings.api_auth})
+        data = await fetch(self.bot, url, headers={"Authorization": self.settings.api_auth})
         return data
 
     async def get_player_model(self, tag):
@@ -1219,7 +1222,7 @@ class BSData:
 
         await self.bot.type()
         url = self.settings.event_api_url
-        data = await fetch(url, headers={"Authorization": self.settings.api_auth})
+        data = await fetch(self.bot, url, headers={"Authorization": self.settings.api_auth})
         if data is None:
             await self.bot.say("Error fetching events from API.")
             return
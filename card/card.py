@@ -23,19 +23,16 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
-import matplotlib
-matplotlib.use('Agg')
 
 from .utils.dataIO import dataIO
 from __main__ import send_cmd_help
+from cogs.crcards import CatalogMissing, card_catalog, catalog_required
 from cogs.utils.chat_formatting import pagify, box
 from discord.ext import commands
 from discord.ext.commands import Context
 from itertools import islice
-from matplotlib import pyplot as plt
 from random import choice
 import datetime
-import asyncio
 import discord
 import itertools
 import io
@@ -43,14 +40,17 @@ import os
 import re
 import string
 import pprint
-import statistics
 
 from .deck import Deck
 from collections import namedtuple
 
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("Please install the numpy package.") from None
+
 
 settings_path = "data/card/settings.json"
-crdata_path = "data/card/clashroyale.json"
 cardpop_path = "data/card/cardpop.json"
 crtexts_path = "data/card/crtexts.json"
 dates_path = "data/card/dates.json"
@@ -73,40 +73,157 @@ def take(n, iterable):
     return list(islice(iterable, n))
 
 
+class CardPop:
+    """Card popularity snapshots as arrays.
+
+    counts and changes are card × snapshot matrices. Rows follow cpids,
+    columns follow snapshot_ids. Decks of each snapshot are kept as
+    parallel arrays sorted by popularity, with an inverted index from
+    cpid to the positions of decks containing the card.
+
+    Also used by the clashroyale cog.
+    """
+
+    def __init__(self, cardpop):
+        """Build arrays from the cardpop.json data."""
+        self.snapshot_ids = sorted(int(k) for k in cardpop.keys())
+        self.snapshot_index = {
+            id: i for i, id in enumerate(self.snapshot_ids)}
+        self.cpids = sorted(set(
+            cpid
+            for snapshot in cardpop.values()
+            for cpid in snapshot["cardpop"].keys()))
+        self.cpid_index = {cpid: i for i, cpid in enumerate(self.cpids)}
+
+        shape = (len(self.cpids), len(self.snapshot_ids))
+        self.counts = np.zeros(shape, dtype=np.int32)
+        self.changes = np.zeros(shape, dtype=np.int32)
+
+        self.deck_keys = {}
+        self.deck_cards = {}
+        self.card_decks = {}
+        self.deck_counts = {}
+        self.deck_elixirs = {}
+        self.elixir_means = np.zeros(len(self.snapshot_ids))
+        self.elixir_medians = np.zeros(len(self.snapshot_ids))
+
+        for snapshot_id, snapshot in cardpop.items():
+            col = self.snapshot_index[int(snapshot_id)]
+            for cpid, v in snapshot["cardpop"].items():
+                row = self.cpid_index[cpid]
+                self.counts[row, col] = v["count"]
+                self.changes[row, col] = v["change"]
+
+            decks = snapshot["decks"]
+            keys = list(decks.keys())
+            counts = np.array(
+                [decks[k]["count"] for k in keys], dtype=np.int32)
+            elixirs = np.array(
+                [decks[k]["elixir"] for k in keys], dtype=np.float64)
+            order = np.argsort(-counts, kind='mergesort')
+            self.deck_keys[col] = [keys[i] for i in order]
+            self.deck_cards[col] = [k.split(', ') for k in self.deck_keys[col]]
+            card_decks = {}
+            for i, deck_cards in enumerate(self.deck_cards[col]):
+                for cpid in deck_cards:
+                    card_decks.setdefault(cpid, set()).add(i)
+            self.card_decks[col] = card_decks
+            self.deck_counts[col] = counts[order]
+            self.deck_elixirs[col] = elixirs[order]
+            if counts.sum():
+                self.elixir_means[col] = np.average(elixirs, weights=counts)
+                self.elixir_medians[col] = np.median(
+                    np.repeat(elixirs, counts))
+
+    def count(self, cpid, snapshot_id):
+        """Return card count in snapshot, 0 if not found."""
+        row = self.cpid_index.get(cpid)
+        col = self.snapshot_index.get(int(snapshot_id))
+        if row is None or col is None:
+            return 0
+        return int(self.counts[row, col])
+
+    def change(self, cpid, snapshot_id):
+        """Return change of card count in snapshot, 0 if not found."""
+        row = self.cpid_index.get(cpid)
+        col = self.snapshot_index.get(int(snapshot_id))
+        if row is None or col is None:
+            return 0
+        return int(self.changes[row, col])
+
+    def card_series(self, cpid, snapshot_ids):
+        """Return card counts for a list of snapshot ids."""
+        row = self.cpid_index.get(cpid)
+        if row is None:
+            return [0] * len(snapshot_ids)
+        return [
+            int(self.counts[row, self.snapshot_index[id]])
+            if id in self.snapshot_index else 0
+            for id in snapshot_ids]
+
+    def ranked_cards(self, snapshot_id):
+        """Return list of (cpid, count, change) sorted by count."""
+        col = self.snapshot_index[int(snapshot_id)]
+        counts = self.counts[:, col]
+        order = np.argsort(-counts, kind='mergesort')
+        return [
+            (self.cpids[i], int(counts[i]), int(self.changes[i, col]))
+            for i in order if counts[i]]
+
+    def search_decks(self, cpids, snapshot_ids=None):
+        """Return decks containing all cpids ranked by count.
+
+        Each item is (snapshot id, deck key, count, deck cpids).
+        Search all snapshots if snapshot_ids is None.
+        """
+        if snapshot_ids is None:
+            snapshot_ids = self.snapshot_ids
+        results = []
+        for id in snapshot_ids:
+            col = self.snapshot_index.get(int(id))
+            if col is None:
+                continue
+            if cpids:
+                rows = sorted(
+                    (self.card_decks[col].get(cpid, set()) for cpid in cpids),
+                    key=len)
+                found = sorted(set.intersection(*rows))
+            else:
+                found = range(len(self.deck_keys[col]))
+            counts = self.deck_counts[col]
+            for i in found:
+                results.append((
+                    int(id), self.deck_keys[col][i], int(counts[i]),
+                    self.deck_cards[col][i]))
+        if len(snapshot_ids) > 1:
+            results.sort(key=lambda r: (-r[2], -r[0]))
+        return results
+
+    def ranked_decks(self, snapshot_id):
+        """Return list of (deck key, count) sorted by count."""
+        col = self.snapshot_index[int(snapshot_id)]
+        return list(zip(
+            self.deck_keys[col], self.deck_counts[col].tolist()))
+
+
 class Card:
     """Clash Royale Card Popularity snapshots."""
 
     def __init__(self, bot):
         self.bot = bot
         self.file_path = settings_path
-        self.crdata_path = crdata_path
         self.cardpop_path = cardpop_path
         self.crtexts_path = crtexts_path
         self.dates_path = dates_path
 
         self.settings = dataIO.load_json(self.file_path)
-        self.crdata = dataIO.load_json(self.crdata_path)
-        self.cardpop = dataIO.load_json(self.cardpop_path)
+        self.cardpop = None
+        self.cardpop_version = None
+        self.cardpop_data = None
+        self.load_cardpop()
         self.crtexts = dataIO.load_json(self.crtexts_path)
         self.dates = dataIO.load_json(self.dates_path)
 
-        # init card data
-        self.cards = []
-        self.cards_abbrev = {}
-
-        for card_key, card_value in self.crdata["Cards"].items():
-            self.cards.append(card_key)
-            self.cards_abbrev[card_key] = card_key
-
-            if card_key.find('-'):
-                self.cards_abbrev[card_key.replace('-', '')] = card_key
-
-            aka_list = card_value["aka"]
-            for aka in aka_list:
-                self.cards_abbrev[aka] = card_key
-                if aka.find('-'):
-                    self.cards_abbrev[aka.replace('-', '')] = card_key
-
         self.card_w = 302
         self.card_h = 363
         self.card_ratio = self.card_w / self.card_h
@@ -114,10 +231,8 @@ class Card:
         self.card_thumb_w = int(self.card_w * self.card_thumb_scale)
         self.card_thumb_h = int(self.card_h * self.card_thumb_scale)
 
-        self.plotfigure = 0
-        self.plot_lock = asyncio.Lock()
-
     @commands.command(pass_context=True)
+    @catalog_required()
     async def card(self, ctx, card=None):
         """Display statistics about a card.
 
@@ -139,10 +254,10 @@ class Card:
         data.set_thumbnail(url=self.get_card_image_url(card))
         data.add_field(
             name="Elixir",
-            value=self.crdata["Cards"][card]["elixir"])
+            value=card_catalog(self.bot).elixir(card))
         data.add_field(
             name="Rarity",
-            value=string.capwords(self.crdata["Cards"][card]["rarity"]))
+            value=string.capwords(card_catalog(self.bot).rarity(card)))
 
         # for id in range(cardpop_range_min, cardpop_range_max):
         #     data.add_field(
@@ -163,6 +278,7 @@ class Card:
         await ctx.invoke(Card.decks, card)
 
     @commands.command(pass_context=True)
+    @catalog_required()
     async def decks(self, ctx: Context, *cards):
         """Display top deck with specific card in particular snapshot.
 
@@ -171,6 +287,9 @@ class Card:
 
         !decks princess miner
         displays decks with both miner and pricness in latest snapshot.
+
+        !decks miner all
+        displays decks with miner in all snapshots.
         """
         if cards is None or not len(cards):
             await send_cmd_help(ctx)
@@ -178,19 +297,22 @@ class Card:
 
         # legacy param - will remove in future updates
         snapshot_id = None
+        all_snapshots = False
 
         # check last param, if digit, assign as snapshot id
+        # if all, search every snapshot
         if cards[-1].isdigit():
             snapshot_id = int(cards[-1])
             cards = cards[:-1]
+        elif cards[-1].lower() == 'all':
+            all_snapshots = True
+            cards = cards[:-1]
 
         if snapshot_id is None:
-            snapshot_id = str(cardpop_range_max - 1)
+            snapshot_id = cardpop_range_max - 1
 
         is_most_recent_snapshot = int(snapshot_id) == cardpop_range_max - 1
 
-        # await self.bot.say("{}: {}".format(snapshot_id, cards))
-
         card_names_are_valid = True
         for card in cards:
             if self.get_card_name(card) is None:
@@ -202,45 +324,41 @@ class Card:
 
         # repopulate cards with normalized data
         cards = [self.get_card_name(c) for c in cards]
-        # cpids = [self.get_card_cpid(c) for c in cards]
-
-        found_decks = []
-        if snapshot_id in self.cardpop:
-            decks = self.cardpop[snapshot_id]["decks"]
-            for k in decks.keys():
-                deck = decks[k]["deck"]
-                if all(card in deck for card in cards):
-                    found_decks.append(k)
-                # if all(cpid in k for cpid in cpids):
-                #     found_decks.append(k)
-
-        await self.bot.say("Found {} decks with {} in Snapshot #{}{}.".format(
+        cpids = [self.get_card_cpid(c) for c in cards]
+
+        self.load_cardpop()
+        found_decks = self.cardpop_data.search_decks(
+            cpids, None if all_snapshots else [snapshot_id])
+
+        if all_snapshots:
+            where = "all snapshots"
+        else:
+            where = "Snapshot #{}{}".format(
+                snapshot_id,
+                ' (most recent)' if is_most_recent_snapshot else '')
+        await self.bot.say("Found {} decks with {} in {}.".format(
             len(found_decks),
             ', '.join([self.card_to_str(card) for card in cards]),
-            snapshot_id,
-            ' (most recent)' if is_most_recent_snapshot else ''))
+            where))
 
         if len(found_decks):
-            # await self.bot.say(
-            #     "Listing top {} decks:".format(
-            #         min([max_deck_show, len(found_decks)])))
-
-            for i, deck in enumerate(found_decks):
-                # Show top 5 deck images only
-                # if i < max_deck_show:
+            results_max = 3
 
-                results_max = 3
+            for i, found_deck in enumerate(found_decks):
+                deck_snapshot_id, deck, count, deck_cpids = found_deck
+                norm_cards = [self.get_card_from_cpid(c) for c in deck_cpids]
 
-                cards = deck.split(', ')
-                norm_cards = [self.get_card_from_cpid(c) for c in cards]
-
-                await self.bot.say("**{}**: {}/100: {}".format(
+                snapshot_str = ''
+                if all_snapshots:
+                    snapshot_str = " (Snapshot #{})".format(deck_snapshot_id)
+                await self.bot.say("**{}**: {}/100: {}{}".format(
                     i + 1,
-                    self.get_deckpop_count(deck, snapshot_id),
-                    self.card_to_str(deck)))
+                    count,
+                    self.card_to_str(deck),
+                    snapshot_str))
 
                 FakeMember = namedtuple("FakeMember", "name")
-                m = FakeMember(name="Snapshot #{}".format(snapshot_id))
+                m = FakeMember(name="Snapshot #{}".format(deck_snapshot_id))
 
                 await self.bot.get_cog("Deck").deck_get_helper(
                     ctx,
@@ -269,6 +387,7 @@ class Card:
                         return
 
     @commands.command(pass_context=True)
+    @catalog_required()
     async def cardimage(self, ctx, card=None):
         """Display the card image."""
         card = self.get_card_name(card)
@@ -289,6 +408,7 @@ class Card:
                                "to send this")
 
     @commands.command(pass_context=True, aliases=["cardtrends"])
+    @catalog_required()
     async def cardtrend(self, ctx: Context, *cards):
         """Display trends about a card based on popularity snapshot.
 
@@ -315,118 +435,35 @@ class Card:
                 validated_cards.append(card)
 
         if len(validated_cards) == len(cards):
-
-            facecolor = '#32363b'
-            edgecolor = '#eeeeee'
-            spinecolor = '#999999'
-            footercolor = '#999999'
-            labelcolor = '#cccccc'
-            tickcolor = '#999999'
-            titlecolor = '#ffffff'
-
-            fig = plt.figure(
-                num=1,
-                figsize=(8, 6),
-                dpi=192,
-                facecolor=facecolor,
-                edgecolor=edgecolor)
-            plt.grid(b=True, alpha=0.3)
-
-            ax = fig.add_subplot(111)
-
-            ax.set_title('Clash Royale Card Trends', color=titlecolor)
-            ax.set_xlabel('Snapshots')
-            ax.set_ylabel('Usage')
-
-            for spine in ax.spines.values():
-                spine.set_edgecolor(spinecolor)
-
-            ax.xaxis.label.set_color(labelcolor)
-            ax.yaxis.label.set_color(labelcolor)
-            ax.tick_params(axis='x', colors=tickcolor)
-            ax.tick_params(axis='y', colors=tickcolor)
-
-            # create labels using snapshot dates
-            labels = []
-            for id in range(cardpop_range_min, cardpop_range_max):
-                dt = datetime.datetime.strptime(
-                    self.dates[str(id)], '%Y-%m-%d')
-                dtstr = dt.strftime('%b %d, %y')
-                labels.append("{}\n   {}".format(id, dtstr))
-
-            # process plot only when all the cards are valid
-            for card in validated_cards:
-
-                x = range(cardpop_range_min, cardpop_range_max)
-                y = [int(self.get_cardpop_count(card, id)) for id in x]
-                ax.plot(x, y, 'o-', label=self.card_to_str(card))
-                plt.xticks(x, labels, rotation=70, fontsize=8, ha='right')
-
-            # make tick label font size smaller
-            # for tick in ax.xaxis.get_major_ticks():
-            #     tick.label.set_fontsize(8)
-
-            leg = ax.legend(facecolor=facecolor, edgecolor=spinecolor)
-            for text in leg.get_texts():
-                text.set_color(labelcolor)
-
-            ax.annotate(
-                'Compiled with data from Woody’s popularity snapshots',
-
-                # The point that we'll place the text in relation to
-                xy=(0, 0),
-                # Interpret the x as axes coords, and the y as figure
-                # coords
-                xycoords=('figure fraction'),
-
-                # The distance from the point that the text will be at
-                xytext=(15, 10),
-                # Interpret `xytext` as an offset in points...
-                textcoords='offset points',
-
-                # Any other text parameters we'd like
-                size=8, ha='left', va='bottom', color=footercolor)
-
-            plt.subplots_adjust(left=0.1, right=0.96, top=0.9, bottom=0.2)
-
-            plot_filename = "{}-plot.png".format("-".join(cards))
-            # plot_name = "Card Trends: {}".format(
-            #     ", ".join([self.card_to_str(c) for c in validated_cards]))
-            plot_name = ""
-
-            with io.BytesIO() as f:
-                plt.savefig(f, format="png", facecolor=facecolor,
-                            edgecolor=edgecolor, transparent=True)
-                f.seek(0)
-                await ctx.bot.send_file(
-                    ctx.message.channel, f,
-                    filename=plot_filename,
-                    content=plot_name)
-
-            fig.clf()
-
-        plt.clf()
-        plt.cla()
+            validated_cards = sorted(validated_cards)
+            await self.send_plot(
+                ctx, 'cardtrend', tuple(validated_cards),
+                lambda: self.cardtrend_data(validated_cards),
+                "{}-plot.png".format("-".join(validated_cards)))
+
+    def cardtrend_data(self, cards):
+        """Plot data for cardtrend."""
+        x = list(range(cardpop_range_min, cardpop_range_max))
+        return {
+            'x': x,
+            'labels': self.snapshot_labels(x),
+            'series': [
+                (self.card_to_str(card),
+                 self.cardpop_data.card_series(self.get_card_cpid(card), x))
+                for card in cards]
+        }
 
     @commands.command(pass_context=True)
     async def elixirlist(self, ctx: Context):
         """Display average elixir over time."""
-        trend = {}
-
-        for snapshot_id, snapshot in self.cardpop.items():
-            decks = snapshot["decks"]
-            deck_count = 0
-            elixir_all = 0
-            for deck_id, deck_v in decks.items():
-                deck_count += deck_v["count"]
-                elixir_all += deck_v["count"] * deck_v["elixir"]
-            trend[snapshot_id] = elixir_all / deck_count
+        self.load_cardpop()
+        data = self.cardpop_data
 
         out = []
         for id in range(cardpop_range_min, cardpop_range_max):
             out.append(
                 "Snapshot {:2}: {}"
-                "".format(id, trend[str(id)]))
+                "".format(id, data.elixir_means[data.snapshot_index[id]]))
 
         await self.bot.say(
             "```python\n" +
@@ -436,132 +473,57 @@ class Card:
     @commands.command(pass_context=True)
     async def elixirtrend(self, ctx: Context):
         """Plot elixir trend over time."""
-        # sorted by snapshot id
-        trend = {}
-        # unsorted as list of dict
-        trendall = []
-        stats = []
-
-        for snapshot_id, snapshot in self.cardpop.items():
-            decks = snapshot["decks"]
-            # deck_id = 0
-
-            if snapshot_id not in trend:
-                trend[snapshot_id] = []
-
-            for deck_key, deck_v in decks.items():
-                trend[snapshot_id].append({
-                    "elixir": deck_v["elixir"],
-                    "count": deck_v["count"]
-                })
-                trendall.append({
-                    "id": snapshot_id,
-                    "elixir": deck_v["elixir"],
-                    "count": deck_v["count"]
-                })
-
-            # expand count to list for statistics
-            trendstat = []
-            for t in trend[snapshot_id]:
-                trendstat.extend([t["elixir"]] * t["count"])
-            stats.append({
-                "id": snapshot_id,
-                "trend": trendstat,
-                "median": statistics.median(trendstat),
-                "mean": statistics.mean(trendstat)
-            })
-            # print (str(trendstat))
-
-        # Colors
-        facecolor = '#32363b'
-        edgecolor = '#333333'
-        spinecolor = '#666666'
-        footercolor = '#999999'
-        labelcolor = '#cccccc'
-        tickcolor = '#999999'
-        titlecolor = '#ffffff'
-
-        fig = plt.figure(
-            num=1,
-            figsize=(8, 6),
-            dpi=192,
-            facecolor=facecolor,
-            edgecolor=edgecolor)
-        # plt.grid(b=True, alpha=1)
-
-        ax = fig.add_subplot(111)
-
-        ax.set_title(
-            'Clash Royale Decks: Average Elixir Trends', color=titlecolor)
-        ax.set_xlabel('Snapshots')
-        ax.set_ylabel('Elixir')
-
-        for spine in ax.spines.values():
-            spine.set_edgecolor(spinecolor)
-
-        ax.xaxis.label.set_color(labelcolor)
-        ax.yaxis.label.set_color(labelcolor)
-        ax.tick_params(axis='x', colors=tickcolor)
-        ax.tick_params(axis='y', colors=tickcolor)
-
-        # create labels using snapshot dates
+        await self.send_plot(
+            ctx, 'elixirtrend', None, self.elixirtrend_data,
+            "elixir-trend-plot.png")
+
+    def elixirtrend_data(self):
+        """Plot data for elixirtrend."""
+        data = self.cardpop_data
+        x = []
+        elixirs = []
+        counts = []
+        for col, id in enumerate(data.snapshot_ids):
+            x.extend([id] * len(data.deck_keys[col]))
+            elixirs.extend(data.deck_elixirs[col].tolist())
+            counts.extend(data.deck_counts[col].tolist())
+
+        return {
+            'x': x,
+            'labels': self.snapshot_labels(data.snapshot_ids),
+            'elixirs': elixirs,
+            'counts': counts,
+            'stats': [
+                ('Mean', data.snapshot_ids, data.elixir_means.tolist()),
+                ('Median', data.snapshot_ids, data.elixir_medians.tolist())]
+        }
+
+    def snapshot_labels(self, snapshot_ids):
+        """Tick labels using snapshot dates."""
         labels = []
-        # for id in range(cardpop_range_min, cardpop_range_max):
-        for t in trendall:
+        for id in snapshot_ids:
             dt = datetime.datetime.strptime(
-                self.dates[str(t["id"])], '%Y-%m-%d')
+                self.dates[str(id)], '%Y-%m-%d')
             dtstr = dt.strftime('%b %d, %y')
-            labels.append("{}\n   {}".format(t["id"], dtstr))
-
-        # cmap=plt.get_cmap(name)
-        # scatter plot datapoints
-        x = [int(t["id"]) for t in trendall]
-        y = [t["elixir"] for t in trendall]
-        area = [t["count"] * 2 for t in trendall]
-        # ax.scatter(x, y, s=area, c="np.arange(100)", cmap="plasma")
-        ax.scatter(x, y, s=area, c="yellow")
-        plt.xticks(x, labels, rotation=70, fontsize=8, ha='right')
-
-        # plot mean and median
-        for p in ["mean", "median"]:
-            x = [s["id"] for s in stats]
-            y = [s[p] for s in stats]
-            ax.plot(x, y, 'o-', label=string.capwords(p))
-
-        leg = ax.legend(facecolor=facecolor, edgecolor=spinecolor)
-        for text in leg.get_texts():
-            text.set_color(labelcolor)
-
-        ax.annotate(
-            'Compiled with data from Woody’s popularity snapshots',
-            xy=(0, 0),
-            xycoords=('figure fraction'),
-            xytext=(15, 10),
-            textcoords='offset points',
-            size=8, ha='left', va='bottom', color=footercolor)
-
-        plt.subplots_adjust(left=0.1, right=0.96, top=0.9, bottom=0.2)
-
-        plot_filename = "elixir-trend-plot.png"
-        # plot_name = "Card Trends: {}".format(
-        #     ", ".join([self.card_to_str(c) for c in validated_cards]))
-        plot_name = ""
-
-        with io.BytesIO() as f:
-            plt.savefig(f, format="png", facecolor=facecolor,
-                        edgecolor=edgecolor, transparent=True)
-            f.seek(0)
-            await ctx.bot.send_file(
-                ctx.message.channel, f,
-                filename=plot_filename,
-                content=plot_name)
-
-        fig.clf()
-        plt.clf()
-        plt.cla()
-
+            labels.append("{}\n   {}".format(id, dtstr))
+        return labels
+
+    async def send_plot(self, ctx, kind, args, data_fn, filename):
+        """Render plot with the PlotRender cog and send it."""
+        self.load_cardpop()
+        render = self.bot.get_cog('PlotRender')
+        if render is None:
+            await self.bot.say(
+                "PlotRender cog is required to plot card data.")
+            return
+        png = await render.render(
+            kind, args, self.cardpop_version, data_fn)
+        await self.bot.send_file(
+            ctx.message.channel, io.BytesIO(png),
+            filename=filename, content="")
 
     @commands.command(pass_context=True)
+    @catalog_required()
     async def popdata(self, ctx: Context,
         snapshot_id=str(cardpop_range_max - 1), limit=10):
         """Display raw data of the card popularity snapshot."""
@@ -578,9 +540,8 @@ class Card:
         if limit <= 0:
             limit = 10000
 
-        snapshot = self.cardpop[snapshot_id]
-        cards = snapshot["cardpop"]
-        decks = snapshot["decks"]
+        self.load_cardpop()
+        data = self.cardpop_data
 
         dt = datetime.datetime.strptime(
             self.dates[str(snapshot_id)], '%Y-%m-%d')
@@ -591,29 +552,44 @@ class Card:
 
         await self.bot.say("**Cards:**")
         out = []
-        for card_key, card_value in take(limit, cards.items()):
+        for cpid, count, change in take(limit, data.ranked_cards(snapshot_id)):
             out.append("{:4d} ({:3d}) {}".format(
-                card_value["count"],
-                card_value["change"],
-                self.card_to_str(card_key)))
+                count,
+                change,
+                self.card_to_str(self.get_card_from_cpid(cpid))))
         for page in pagify("\n".join(out), shorten_by=12):
             await self.bot.say(box(page, lang="py"))
 
         await self.bot.say("**Decks:**")
         out = []
-        for deck_key, deck_value in take(limit, decks.items()):
+        for deck_key, count in take(limit, data.ranked_decks(snapshot_id)):
             out.append("**{:4d}**: {}".format(
-                deck_value["count"],
+                count,
                 self.card_to_str(deck_key)))
         for page in pagify("\n".join(out), shorten_by=12):
             await self.bot.say(page)
 
     @commands.command(pass_content=True)
+    @catalog_required()
     async def popdataall(self, ctx: Context,
         snapshot_id=str(cardpop_range_max - 1)):
         """Display raw data of card popularity snapshot without limits."""
         pass
 
+    async def on_command_error(self, error, ctx):
+        """Tell the user when a command needs the card catalog."""
+        if isinstance(error, CatalogMissing) and ctx.command.instance is self:
+            await self.bot.send_message(ctx.message.channel, str(error))
+
+    def load_cardpop(self):
+        """Load cardpop.json and build arrays if the file has changed."""
+        version = os.path.getmtime(self.cardpop_path)
+        if version == self.cardpop_version:
+            return
+        self.cardpop = dataIO.load_json(self.cardpop_path)
+        self.cardpop_data = CardPop(self.cardpop)
+        self.cardpop_version = version
+
     def get_random_color(self):
         """Return a discord.Color instance of a random color."""
         color = ''.join([choice('0123456789ABCDEF') for x in range(6)])
@@ -630,15 +606,13 @@ class Card:
         """Return standard name used in data files."""
         if card is None:
             return None
-        if card.lower() in self.cards_abbrev:
-            return self.cards_abbrev[card.lower()]
-        return None
+        return card_catalog(self.bot).resolve(card)
 
     def get_card_description(self, card=None):
         """Return the description of a card."""
         if card is None:
             return ""
-        tid = self.crdata["Cards"][card]["tid"]
+        tid = card_catalog(self.bot).field(card, "tid")
         return self.crtexts[tid]
 
     def get_card_image_file(self, card=None):
@@ -655,15 +629,9 @@ class Card:
 
     def get_cardpop_count(self, card=None, snapshot_id=None):
         """Return card popularity count by snapshot id."""
-        out = 0
-        snapshot_id = str(snapshot_id)
-        if card is not None and snapshot_id is not None:
-            if snapshot_id in self.cardpop:
-                cardpop = self.cardpop[snapshot_id]["cardpop"]
-                cpid = self.get_card_cpid(card)
-                if cpid in cardpop:
-                    out = cardpop[cpid]["count"]
-        return out
+        if card is None or snapshot_id is None:
+            return 0
+        return self.cardpop_data.count(self.get_card_cpid(card), snapshot_id)
 
     def get_cardpop(self, card=None, snapshot_id=None):
         """Return card popularity by snapshot id.
@@ -671,29 +639,25 @@ class Card:
         Format: Count (Change)
         """
         out = "---"
-        snapshot_id = str(snapshot_id)
-
-        if card is not None and snapshot_id is not None:
-            if snapshot_id in self.cardpop:
-                cardpop = self.cardpop[snapshot_id]["cardpop"]
-                cpid = self.get_card_cpid(card)
-                if cpid in cardpop:
-                    out = "**{}** ({})".format(
-                        cardpop[cpid]["count"],
-                        cardpop[cpid]["change"])
+        if card is None or snapshot_id is None:
+            return out
+        data = self.cardpop_data
+        cpid = self.get_card_cpid(card)
+        if cpid in data.cpid_index and int(snapshot_id) in data.snapshot_index:
+            out = "**{}** ({})".format(
+                data.count(cpid, snapshot_id),
+                data.change(cpid, snapshot_id))
         return out
 
     def get_card_cpid(self, card=None):
-        """Return the card populairty ID used in data."""
-        # return self.crdata["Cards"][card]["cpid"]
+        """Return the card populairty ID used in data.
+
+        cardpop.json of this cog is keyed by card keys.
+        """
         return card
 
     def get_card_from_cpid(self, cpid=None):
         """Return the card id from cpid."""
-        # for k, v in self.crdata["Cards"].items():
-        #     if cpid == v["cpid"]:
-        #         return k
-        # return None
         return cpid
 
     def get_deckpop_count(self, deck=None, snapshot_id=None):
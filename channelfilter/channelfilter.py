@@ -25,11 +25,14 @@ DEALINGS IN THE SOFTWARE.
 """
 
 import os
-from collections import defaultdict
+import re
+import time
+from collections import Counter, defaultdict
 
 import discord
 from __main__ import send_cmd_help
 from cogs.utils import checks
+from cogs.utils.chat_formatting import box
 from cogs.utils.dataIO import dataIO
 from discord.ext import commands
 
@@ -49,6 +52,11 @@ class ChannelFilter:
         """Init."""
         self.bot = bot
         self.settings = dataIO.load_json(JSON)
+        # channel id -> (compiled pattern, casefolded word -> word)
+        self.matchers = {}
+        self.stats = defaultdict(float)
+        # channel id -> Counter of filtered words
+        self.word_hits = defaultdict(Counter)
 
     def get_server_settings(self, server):
         """Return server settings."""
@@ -65,20 +73,64 @@ class ChannelFilter:
             dataIO.save_json(JSON, self.settings)
         return self.settings[server.id][channel.id]
 
+    def build_matcher(self, server, channel):
+        """Compile the channel word list into a single case-folded pattern.
+
+        Longest words go first so the reported term is the most specific one.
+        """
+        start = time.perf_counter()
+        words = {}
+        for word in self.get_channel_settings(server, channel):
+            words.setdefault(word.casefold(), word)
+        pattern = None
+        if words:
+            pattern = re.compile("|".join(
+                re.escape(w) for w in sorted(words, key=len, reverse=True)))
+        self.matchers[channel.id] = (pattern, words)
+        self.stats['builds'] += 1
+        self.stats['build_time'] = time.perf_counter() - start
+        return self.matchers[channel.id]
+
+    def get_matcher(self, server, channel):
+        """Return compiled pattern and word map for channel."""
+        if channel.id not in self.matchers:
+            return self.build_matcher(server, channel)
+        return self.matchers[channel.id]
+
+    def match(self, server, channel, content):
+        """Return the filtered word found in content, or None."""
+        pattern, words = self.get_matcher(server, channel)
+        if pattern is None:
+            return None
+        start = time.perf_counter()
+        m = pattern.search(content.casefold())
+        self.stats['matches'] += 1
+        self.stats['match_time'] += time.perf_counter() - start
+        if m is None:
+            return None
+        self.stats['hits'] += 1
+        word = words[m.group(0)]
+        self.word_hits[channel.id][word] += 1
+        return word
+
     def add_word(self, server, channel, word):
         """Add word to filter."""
         channel_settings = self.get_channel_settings(server, channel)
-        if word.lower() not in channel_settings:
+        if word.casefold() not in (w.casefold() for w in channel_settings):
             channel_settings.append(word)
             dataIO.save_json(JSON, self.settings)
+            self.build_matcher(server, channel)
 
     def remove_word(self, server, channel, word):
         """Remove word from filter."""
         channel_settings = self.get_channel_settings(server, channel)
-        if word.lower() not in channel_settings:
+        found = [w for w in channel_settings if w.casefold() == word.casefold()]
+        if not found:
             return False
-        channel_settings.remove(word)
+        for w in found:
+            channel_settings.remove(w)
         dataIO.save_json(JSON, self.settings)
+        self.build_matcher(server, channel)
         return True
 
     @checks.mod_or_permissions()
@@ -138,6 +190,30 @@ class ChannelFilter:
             return
         await self.bot.say(", ".join(out))
 
+    @checks.mod_or_permissions()
+    @channelfilter.command(name="stats", pass_context=True, no_pm=True)
+    async def channelfilter_stats(self, ctx):
+        """Matcher build and match times, and words filtered in channel."""
+        server = ctx.message.server
+        channel = ctx.message.channel
+        pattern, words = self.get_matcher(server, channel)
+        matches = int(self.stats['matches'])
+        out = [
+            "Words in channel: {:,}".format(len(words)),
+            "Compiled channels: {:,}".format(len(self.matchers)),
+            "Builds: {:,}".format(int(self.stats['builds'])),
+            "Last build: {:.3f} ms".format(self.stats['build_time'] * 1000),
+            "Messages matched: {:,}".format(matches),
+            "Messages filtered: {:,}".format(int(self.stats['hits'])),
+            "Average match: {:.3f} ms".format(
+                self.stats['match_time'] * 1000 / max(1, matches)),
+        ]
+        hits = self.word_hits[channel.id].most_common(10)
+        if hits:
+            out.append("Filtered words in channel:")
+            out.extend("  {}: {:,}".format(word, count) for word, count in hits)
+        await self.bot.say(box("\n".join(out)))
+
     async def on_message(self, message):
         """Filter words by channel."""
         server = message.server
@@ -156,16 +232,15 @@ class ChannelFilter:
         if author.server_permissions.manage_messages:
             return
 
-        channel_settings = self.get_channel_settings(server, channel)
-        for word in channel_settings:
-            if word.lower() in message.content.lower():
-                await self.bot.send_message(
-                    channel,
-                    "{} Your message contains words not permitted on this channel. "
-                    "Repeat offenders will be kicked/banned".format(
-                        author.mention
-                    ))
-                await self.bot.delete_message(message)
+        word = self.match(server, channel, message.content)
+        if word is not None:
+            await self.bot.send_message(
+                channel,
+                "{} Your message contains words not permitted on this channel. "
+                "Repeat offenders will be kicked/banned".format(
+                    author.mention
+                ))
+            await self.bot.delete_message(message)
 
 
 def check_folder():
@@ -41,6 +41,13 @@ from cogs.utils.dataIO import dataIO
 from cogs.utils.chat_formatting import pagify
 from discord.ext import commands
 
+try:
+    from cogs.httpclient import client_session
+except ImportError:
+    def client_session(bot):
+        """One-off session when the HTTPClient cog is not installed."""
+        return aiohttp.ClientSession()
+
 PATH = os.path.join("data", "clans")
 JSON = os.path.join(PATH, "settings.json")
 CACHE = os.path.join(PATH, "cache.json")
@@ -109,7 +116,7 @@ class Clans:
         headers = {'auth': self.auth}
 
         try:
-            async with aiohttp.ClientSession() as session:
+            async with client_session(self.bot) as session:
                 async with session.get(url, headers=headers, timeout=30) as resp:
                     data = await resp.json()
         except json.decoder.JSONDecodeError:
@@ -125,7 +132,7 @@ class Clans:
         headers = {'auth': self.auth}
 
         try:
-            async with aiohttp.ClientSession() as session:
+            async with client_session(self.bot) as session:
                 async with session.get(url, headers=headers, timeout=30) as resp:
                     data = await resp.json()
         except json.decoder.JSONDecodeError:
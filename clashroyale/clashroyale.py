@@ -23,25 +23,20 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
-import matplotlib
-matplotlib.use('Agg')
 
 
 
 # from .deck import Deck
 from .utils.dataIO import dataIO
 from __main__ import send_cmd_help
+from cogs.card import CardPop
+from cogs.crcards import CatalogMissing, card_catalog, catalog_required
 from cogs.utils.chat_formatting import pagify, box
 from collections import namedtuple
 from discord.ext import commands
 from discord.ext.commands import Context
 from itertools import islice
-from matplotlib import pyplot as plt
-from PIL import Image
-from PIL import ImageDraw
-from PIL import ImageFont
 from random import choice
-import asyncio
 import datetime
 import discord
 import io
@@ -49,8 +44,8 @@ import itertools
 import os
 import string
 
+data_path = "data/clashroyale"
 settings_path = "data/clashroyale/settings.json"
-crdata_path = "data/clashroyale/clashroyale.json"
 cardpop_path = "data/clashroyale/cardpop.json"
 crtexts_path = "data/clashroyale/crtexts.json"
 dates_path = "data/clashroyale/dates.json"
@@ -110,33 +105,29 @@ e.g. `!deck show 2` shows the second deck in your deck list.
 """
 
 
+def take(n, iterable):
+    """Return first n items of the iterable as a list."""
+    return list(islice(iterable, n))
+
+
 class ClashRoyale:
     """Clash Royale Deck Builder."""
 
     def __init__(self, bot):
         self.bot = bot
         self.file_path = settings_path
-        self.crdata_path = crdata_path
 
         self.settings = dataIO.load_json(self.file_path)
-        self.crdata = dataIO.load_json(self.crdata_path)
-
-        # init card data
-        self.cards = []
-        self.cards_abbrev = {}
-
-        for card_key, card_value in self.crdata["Cards"].items():
-            self.cards.append(card_key)
-            self.cards_abbrev[card_key] = card_key
+        self.cardpop = {}
+        self.cardpop_version = None
+        self.cardpop_data = CardPop(self.cardpop)
+        self.load_cardpop()
+        self.dates = {}
+        if dataIO.is_valid_json(dates_path):
+            self.dates = dataIO.load_json(dates_path)
 
-            if card_key.find('-'):
-                self.cards_abbrev[card_key.replace('-', '')] = card_key
-
-            aka_list = card_value["aka"]
-            for aka in aka_list:
-                self.cards_abbrev[aka] = card_key
-                if aka.find('-'):
-                    self.cards_abbrev[aka.replace('-', '')] = card_key
+        # deck builder cards, loaded on first use
+        self._cards = None
 
         self.card_w = 302
         self.card_h = 363
@@ -145,12 +136,27 @@ class ClashRoyale:
         self.card_thumb_w = int(self.card_w * self.card_thumb_scale)
         self.card_thumb_h = int(self.card_h * self.card_thumb_scale)
 
-        self.plotfigure = 0
-        self.plot_lock = asyncio.Lock()
-
         # deck validation hack
         self.deck_is_valid = False
 
+    async def on_command_error(self, error, ctx):
+        """Tell the user when a command needs the card catalog."""
+        if isinstance(error, CatalogMissing) and ctx.command.instance is self:
+            await self.bot.send_message(ctx.message.channel, str(error))
+
+    @property
+    def cards(self):
+        """Card keys available to the deck builder.
+
+        Only cards with an image in data/clashroyale/img/cards.
+        """
+        if self._cards is None:
+            images = os.listdir(os.path.join(data_path, "img", "cards"))
+            self._cards = [
+                key for key in card_catalog(self.bot).keys
+                if "{}.png".format(key) in images]
+        return self._cards
+
     def grouper(self, n, iterable, fillvalue=None):
         """Helper function to split lists.
 
@@ -163,6 +169,7 @@ class ClashRoyale:
 
 
     @commands.group(pass_context=True, no_pm=True)
+    @catalog_required()
     async def deck(self, ctx):
         """Clash Royale deck builder.
 
@@ -331,7 +338,8 @@ class ClashRoyale:
     async def deck_cards(self, ctx):
         """Display all available cards and acceptable abbreviations."""
         out = []
-        for card_key, card_value in self.crdata["Cards"].items():
+        for card_key in self.cards:
+            card_value = card_catalog(self.bot).card(card_key)
             names = [card_key]
             name = string.capwords(card_key.replace('-', ' '))
             for abbrev in card_value["aka"]:
@@ -479,6 +487,7 @@ class ClashRoyale:
 
 
     @commands.command(pass_context=True)
+    @catalog_required()
     async def card(self, ctx, card=None):
         """Display statistics about a card.
 
@@ -500,10 +509,10 @@ class ClashRoyale:
         data.set_thumbnail(url=self.get_card_image_url(card))
         data.add_field(
             name="Elixir",
-            value=self.crdata["Cards"][card]["elixir"])
+            value=card_catalog(self.bot).elixir(card))
         data.add_field(
             name="Rarity",
-            value=string.capwords(self.crdata["Cards"][card]["rarity"]))
+            value=string.capwords(card_catalog(self.bot).rarity(card)))
 
         # for id in range(cardpop_range_min, cardpop_range_max):
         #     data.add_field(
@@ -524,6 +533,7 @@ class ClashRoyale:
         await ctx.invoke(Card.decks, card)
 
     @commands.command(pass_context=True)
+    @catalog_required()
     async def decks(self, ctx:Context, *cards):
         """Display top deck with specific card in particular snapshot.
 
@@ -532,6 +542,9 @@ class ClashRoyale:
 
         !decks princess miner
         displays decks with both miner and pricness in latest snapshot.
+
+        !decks miner all
+        displays decks with miner in all snapshots.
         """
         if cards is None or not len(cards):
             await send_cmd_help(ctx)
@@ -539,19 +552,22 @@ class ClashRoyale:
 
         # legacy param - will remove in future updates
         snapshot_id = None
+        all_snapshots = False
 
         # check last param, if digit, assign as snapshot id
+        # if all, search every snapshot
         if cards[-1].isdigit():
             snapshot_id = int(cards[-1])
             cards = cards[:-1]
+        elif cards[-1].lower() == 'all':
+            all_snapshots = True
+            cards = cards[:-1]
 
         if snapshot_id is None:
-            snapshot_id = str(cardpop_range_max - 1)
+            snapshot_id = cardpop_range_max - 1
 
         is_most_recent_snapshot = int(snapshot_id) == cardpop_range_max - 1
 
-        # await self.bot.say("{}: {}".format(snapshot_id, cards))
-
         card_names_are_valid = True
         for card in cards:
             if self.get_card_name(card) is None:
@@ -565,40 +581,39 @@ class ClashRoyale:
         cards = [self.get_card_name(c) for c in cards]
         cpids = [self.get_card_cpid(c) for c in cards]
 
-        found_decks = []
-        if snapshot_id in self.cardpop:
-            decks = self.cardpop[snapshot_id]["decks"]
-            for k in decks.keys():
-                if all(cpid in k for cpid in cpids):
-                    found_decks.append(k)
+        self.load_cardpop()
+        found_decks = self.cardpop_data.search_decks(
+            cpids, None if all_snapshots else [snapshot_id])
 
-        await self.bot.say("Found {} decks with {} in Snapshot #{}{}.".format(
+        if all_snapshots:
+            where = "all snapshots"
+        else:
+            where = "Snapshot #{}{}".format(
+                snapshot_id,
+                ' (most recent)' if is_most_recent_snapshot else '')
+        await self.bot.say("Found {} decks with {} in {}.".format(
             len(found_decks),
             ', '.join([self.card_to_str(card) for card in cards]),
-            snapshot_id,
-            ' (most recent)' if is_most_recent_snapshot else ''))
+            where))
 
         if len(found_decks):
-            # await self.bot.say(
-            #     "Listing top {} decks:".format(
-            #         min([max_deck_show, len(found_decks)])))
-
-            for i, deck in enumerate(found_decks):
-                # Show top 5 deck images only
-                # if i < max_deck_show:
-
-                results_max = 3
+            results_max = 3
 
-                cards = deck.split(', ')
-                norm_cards = [self.get_card_from_cpid(c) for c in cards]
+            for i, found_deck in enumerate(found_decks):
+                deck_snapshot_id, deck, count, deck_cpids = found_deck
+                norm_cards = [self.get_card_from_cpid(c) for c in deck_cpids]
 
-                await self.bot.say("**{}**: {}/100: {}".format(
+                snapshot_str = ''
+                if all_snapshots:
+                    snapshot_str = " (Snapshot #{})".format(deck_snapshot_id)
+                await self.bot.say("**{}**: {}/100: {}{}".format(
                     i + 1,
-                    self.get_deckpop_count(deck, snapshot_id),
-                    deck))
+                    count,
+                    deck,
+                    snapshot_str))
 
                 FakeMember = namedtuple("FakeMember", "name")
-                m = FakeMember(name="Snapshot #{}".format(snapshot_id))
+                m = FakeMember(name="Snapshot #{}".format(deck_snapshot_id))
 
                 # await self.bot.get_cog("Deck").deck_get_helper(ctx,
                 #     card1=norm_cards[0],
@@ -638,6 +653,7 @@ class ClashRoyale:
                         return
 
     @commands.command(pass_context=True)
+    @catalog_required()
     async def cardimage(self, ctx, card=None):
         """Display the card image."""
         card = self.get_card_name(card)
@@ -658,6 +674,7 @@ class ClashRoyale:
                                "to send this")
 
     @commands.command(pass_context=True, aliases=["cardtrends"])
+    @catalog_required()
     async def cardtrend(self, ctx: Context, *cards):
         """Display trends about a card based on popularity snapshot.
 
@@ -684,100 +701,45 @@ class ClashRoyale:
                 validated_cards.append(card)
 
         if len(validated_cards) == len(cards):
-
-            facecolor = '#32363b'
-            edgecolor = '#eeeeee'
-            spinecolor = '#999999'
-            footercolor = '#999999'
-            labelcolor = '#cccccc'
-            tickcolor = '#999999'
-            titlecolor = '#ffffff'
-
-            fig = plt.figure(
-                num=1,
-                figsize=(8, 6),
-                dpi=192,
-                facecolor=facecolor,
-                edgecolor=edgecolor)
-            plt.grid(b=True, alpha=0.3)
-
-            ax = fig.add_subplot(111)
-
-            ax.set_title('Clash Royale Card Trends', color=titlecolor)
-            ax.set_xlabel('Snapshots')
-            ax.set_ylabel('Usage')
-
-            for spine in ax.spines.values():
-                spine.set_edgecolor(spinecolor)
-
-            ax.xaxis.label.set_color(labelcolor)
-            ax.yaxis.label.set_color(labelcolor)
-            ax.tick_params(axis='x', colors=tickcolor)
-            ax.tick_params(axis='y', colors=tickcolor)
-
-            # create labels using snapshot dates
-            labels = []
-            for id in range(cardpop_range_min, cardpop_range_max):
-                dt = datetime.datetime.strptime(
-                    self.dates[str(id)], '%Y-%m-%d')
-                dtstr = dt.strftime('%b %d, %y')
-                labels.append("{}\n   {}".format(id, dtstr))
-
-            # process plot only when all the cards are valid
-            for card in validated_cards:
-
-                x = range(cardpop_range_min, cardpop_range_max)
-                y = [int(self.get_cardpop_count(card, id)) for id in x]
-                ax.plot(x, y, 'o-', label=self.card_to_str(card))
-                plt.xticks(x, labels, rotation=70, fontsize=8, ha='right')
-
-            # make tick label font size smaller
-            # for tick in ax.xaxis.get_major_ticks():
-            #     tick.label.set_fontsize(8)
-
-            leg = ax.legend(facecolor=facecolor, edgecolor=spinecolor)
-            for text in leg.get_texts():
-                text.set_color(labelcolor)
-
-            ax.annotate(
-                'Compiled with data from Woody’s popularity snapshots',
-
-                # The point that we'll place the text in relation to
-                xy=(0, 0),
-                # Interpret the x as axes coords, and the y as figure
-                # coords
-                xycoords=('figure fraction'),
-
-                # The distance from the point that the text will be at
-                xytext=(15, 10),
-                # Interpret `xytext` as an offset in points...
-                textcoords='offset points',
-
-                # Any other text parameters we'd like
-                size=8, ha='left', va='bottom', color=footercolor)
-
-            plt.subplots_adjust(left=0.1, right=0.96, top=0.9, bottom=0.2)
-
-            plot_filename = "{}-plot.png".format("-".join(cards))
-            # plot_name = "Card Trends: {}".format(
-            #     ", ".join([self.card_to_str(c) for c in validated_cards]))
-            plot_name = ""
-
-            with io.BytesIO() as f:
-                plt.savefig(f, format="png", facecolor=facecolor,
-                            edgecolor=edgecolor, transparent=True)
-                f.seek(0)
-                await ctx.bot.send_file(
-                    ctx.message.channel, f,
-                    filename=plot_filename,
-                    content=plot_name)
-
-            fig.clf()
-
-        plt.clf()
-        plt.cla()
+            self.load_cardpop()
+            if not self.cardpop:
+                await self.bot.say("Card popularity data is not available.")
+                return
+            validated_cards = sorted(validated_cards)
+            render = self.bot.get_cog('PlotRender')
+            if render is None:
+                await self.bot.say(
+                    "PlotRender cog is required to plot card data.")
+                return
+            png = await render.render(
+                'cardtrend', tuple(validated_cards), self.cardpop_version,
+                lambda: self.cardtrend_data(validated_cards))
+            await self.bot.send_file(
+                ctx.message.channel, io.BytesIO(png),
+                filename="{}-plot.png".format("-".join(validated_cards)),
+                content="")
+
+    def cardtrend_data(self, cards):
+        """Plot data for cardtrend."""
+        x = list(range(cardpop_range_min, cardpop_range_max))
+        # create labels using snapshot dates
+        labels = []
+        for id in x:
+            dt = datetime.datetime.strptime(
+                self.dates[str(id)], '%Y-%m-%d')
+            dtstr = dt.strftime('%b %d, %y')
+            labels.append("{}\n   {}".format(id, dtstr))
+        return {
+            'x': x,
+            'labels': labels,
+            'series': [
+                (self.card_to_str(card),
+                 self.cardpop_data.card_series(self.get_card_cpid(card), x))
+                for card in cards]
+        }
 
     @commands.command(pass_context=True)
+    @catalog_required()
     async def popdata(self, ctx: Context,
         snapshot_id=str(cardpop_range_max - 1), limit=10):
         """Display raw data of the card popularity snapshot."""
@@ -794,9 +756,11 @@ class ClashRoyale:
         if limit <= 0:
             limit = 10000
 
-        snapshot = self.cardpop[snapshot_id]
-        cards = snapshot["cardpop"]
-        decks = snapshot["decks"]
+        self.load_cardpop()
+        data = self.cardpop_data
+        if int(snapshot_id) not in data.snapshot_index:
+            await self.bot.say("Card popularity data is not available.")
+            return
 
         dt = datetime.datetime.strptime(
             self.dates[str(snapshot_id)], '%Y-%m-%d')
@@ -807,29 +771,41 @@ class ClashRoyale:
 
         await self.bot.say("**Cards:**")
         out = []
-        for card_key, card_value in take(limit, cards.items()):
+        for cpid, count, change in take(limit, data.ranked_cards(snapshot_id)):
             out.append("{:4d} ({:3d}) {}".format(
-                card_value["count"],
-                card_value["change"],
-                card_key))
+                count,
+                change,
+                cpid))
         for page in pagify("\n".join(out), shorten_by=12):
             await self.bot.say(box(page, lang="py"))
 
         await self.bot.say("**Decks:**")
         out = []
-        for deck_key, deck_value in take(limit, decks.items()):
+        for deck_key, count in take(limit, data.ranked_decks(snapshot_id)):
             out.append("**{:4d}**: {}".format(
-                deck_value["count"],
+                count,
                 deck_key))
         for page in pagify("\n".join(out), shorten_by=12):
             await self.bot.say(page)
 
     @commands.command(pass_content=True)
+    @catalog_required()
     async def popdataall(self, ctx: Context,
         snapshot_id=str(cardpop_range_max - 1)):
         """Display raw data of card popularity snapshot without limits."""
         pass
 
+    def load_cardpop(self):
+        """Load cardpop.json and build arrays if the file has changed."""
+        if not dataIO.is_valid_json(cardpop_path):
+            return
+        version = os.path.getmtime(cardpop_path)
+        if version == self.cardpop_version:
+            return
+        self.cardpop = dataIO.load_json(cardpop_path)
+        self.cardpop_data = CardPop(self.cardpop)
+        self.cardpop_version = version
+
     def get_random_color(self):
         """Return a discord.Color instance of a random color."""
         color = ''.join([choice('0123456789ABCDEF') for x in range(6)])
@@ -846,15 +822,13 @@ class ClashRoyale:
         """Return standard name used in data files."""
         if card is None:
             return None
-        if card.lower() in self.cards_abbrev:
-            return self.cards_abbrev[card.lower()]
-        return None
+        return card_catalog(self.bot).resolve(card)
 
     def get_card_description(self, card=None):
         """Return the description of a card."""
         if card is None:
             return ""
-        tid = self.crdata["Cards"][card]["tid"]
+        tid = card_catalog(self.bot).field(card, "tid")
         return self.crtexts[tid]
 
     def get_card_image_file(self, card=None):
@@ -871,15 +845,9 @@ class ClashRoyale:
 
     def get_cardpop_count(self, card=None, snapshot_id=None):
         """Return card popularity count by snapshot id."""
-        out = 0
-        snapshot_id = str(snapshot_id)
-        if card is not None and snapshot_id is not None:
-            if snapshot_id in self.cardpop:
-                cardpop = self.cardpop[snapshot_id]["cardpop"]
-                cpid = self.get_card_cpid(card)
-                if cpid in cardpop:
-                    out = cardpop[cpid]["count"]
-        return out
+        if card is None or snapshot_id is None:
+            return 0
+        return self.cardpop_data.count(self.get_card_cpid(card), snapshot_id)
 
     def get_cardpop(self, card=None, snapshot_id=None):
         """Return card popularity by snapshot id.
@@ -887,28 +855,26 @@ class ClashRoyale:
         Format: Count (Change)
         """
         out = "---"
-        snapshot_id = str(snapshot_id)
-
-        if card is not None and snapshot_id is not None:
-            if snapshot_id in self.cardpop:
-                cardpop = self.cardpop[snapshot_id]["cardpop"]
-                cpid = self.get_card_cpid(card)
-                if cpid in cardpop:
-                    out = "**{}** ({})".format(
-                        cardpop[cpid]["count"],
-                        cardpop[cpid]["change"])
+        if card is None or snapshot_id is None:
+            return out
+        data = self.cardpop_data
+        cpid = self.get_card_cpid(card)
+        if cpid in data.cpid_index and int(snapshot_id) in data.snapshot_index:
+            out = "**{}** ({})".format(
+                data.count(cpid, snapshot_id),
+                data.change(cpid, snapshot_id))
         return out
 
     def get_card_cpid(self, card=None):
-        """Return the card populairty ID used in data."""
-        return self.crdata["Cards"][card]["cpid"]
+        """Return the card populairty ID used in data.
+
+        cardpop.json of this cog is keyed by the catalog cpid.
+        """
+        return card_catalog(self.bot).key_to_cpid(card)
 
     def get_card_from_cpid(self, cpid=None):
         """Return the card id from cpid."""
-        for k, v in self.crdata["Cards"].items():
-            if cpid == v["cpid"]:
-                return k
-        return None
+        return card_catalog(self.bot).cpid_to_key(cpid)
 
     def get_deckpop_count(self, deck=None, snapshot_id=None):
         """Return the deck popularity by snapshot id."""
@@ -966,8 +932,16 @@ class ClashRoyale:
 
     async def upload_deck_image(self, ctx, deck, deck_name, author):
         """Upload deck image to the server."""
+        deck_image = self.bot.get_cog('DeckImage')
+        if deck_image is None:
+            await self.bot.say("DeckImage cog is required to display decks.")
+            return
 
-        deck_image = self.get_deck_image(deck, deck_name, author)
+        png = await deck_image.render(
+            data_path, deck,
+            deck_name or "ClashRoyale",
+            author.name if author else "",
+            self.average_elixir(deck))
 
         # construct a filename using first three letters of each card
         filename = "deck-{}.png".format("-".join([card[:3] for card in deck]))
@@ -978,107 +952,25 @@ class ClashRoyale:
         # description = "ClashRoyale: {}".format(', '.join(card_names))
         description = ""
 
-        with io.BytesIO() as f:
-            deck_image.save(f, "PNG")
-            f.seek(0)
-            await ctx.bot.send_file(ctx.message.channel, f,
-                filename=filename, content=description)
-
-    def get_deck_image(self, deck, deck_name=None, deck_author=None):
-        """Construct the deck with Pillow and return image."""
-
-        card_w = 302
-        card_h = 363
-        card_x = 30
-        card_y = 30
-        font_size = 50
-        txt_y_line1 = 430
-        txt_y_line2 = 500
-        txt_x_name = 50
-        txt_x_cards = 503
-        txt_x_elixir = 1872
-
-        bg_image = Image.open("data/clashroyale/img/deck-bg-b.png")
-        size = bg_image.size
-
-        font_file_regular = "data/clashroyale/fonts/OpenSans-Regular.ttf"
-        font_file_bold = "data/clashroyale/fonts/OpenSans-Bold.ttf"
-
-        image = Image.new("RGBA", size)
-        image.paste(bg_image)
-
-        if not deck_name:
-            deck_name = "ClashRoyale"
-
-        # cards
-        for i, card in enumerate(deck):
-            card_image_file = "data/clashroyale/img/cards/{}.png".format(card)
-            card_image = Image.open(card_image_file)
-            # size = (card_w, card_h)
-            # card_image.thumbnail(size)
-            box = (card_x + card_w * i,
-                   card_y,
-                   card_x + card_w * (i+1),
-                   card_h + card_y)
-            image.paste(card_image, box, card_image)
-
-        # elixir
-        total_elixir = 0
-        for card_key, card_value in self.crdata["Cards"].items():
-            if card_key in deck:
-                total_elixir += card_value["elixir"]
-        average_elixir = "{:.3f}".format(total_elixir / 8)
-
-        # text
-        # Take out hyphnens and capitlize the name of each card
-        card_names = [string.capwords(c.replace('-', ' ')) for c in deck]
-
-        txt = Image.new("RGBA", size)
-        txt_name = Image.new("RGBA", (txt_x_cards-30, size[1]))
-        font_regular = ImageFont.truetype(font_file_regular, size=font_size)
-        font_bold = ImageFont.truetype(font_file_bold, size=font_size)
-
-        d = ImageDraw.Draw(txt)
-        d_name = ImageDraw.Draw(txt_name)
-
-        line1 = ', '.join(card_names[:4])
-        line2 = ', '.join(card_names[4:])
-        # card_text = '\n'.join([line0, line1])
-
-        deck_author_name = deck_author.name if deck_author else ""
-
-        d_name.text((txt_x_name, txt_y_line1), deck_name, font=font_bold,
-                         fill=(0xff, 0xff, 0xff, 255))
-        d_name.text((txt_x_name, txt_y_line2), deck_author_name, font=font_regular,
-                         fill=(0xff, 0xff, 0xff, 255))
-        d.text((txt_x_cards, txt_y_line1), line1, font=font_regular,
-                         fill=(0xff, 0xff, 0xff, 255))
-        d.text((txt_x_cards, txt_y_line2), line2, font=font_regular,
-                         fill=(0xff, 0xff, 0xff, 255))
-        d.text((txt_x_elixir, txt_y_line1), "Avg elixir", font=font_bold,
-               fill=(0xff, 0xff, 0xff, 200))
-        d.text((txt_x_elixir, txt_y_line2), average_elixir, font=font_bold,
-               fill=(0xff, 0xff, 0xff, 255))
-
-        image.paste(txt, (0,0), txt)
-        image.paste(txt_name, (0,0), txt_name)
-
-        # scale down and return
-        scale = 0.5
-        scaled_size = tuple([x * scale for x in image.size])
-        image.thumbnail(scaled_size)
-
-        return image
+        await ctx.bot.send_file(ctx.message.channel, io.BytesIO(png),
+            filename=filename, content=description)
 
+    def average_elixir(self, deck):
+        """Average elixir of deck as string."""
+        catalog = card_catalog(self.bot)
+        total_elixir = sum(catalog.elixir(card) for card in set(deck))
+        return "{:.3f}".format(total_elixir / 8)
 
     def normalize_deck_data(self, deck):
         """Return a deck list with normalized names."""
         deck = [c.lower() if c is not None else '' for c in deck]
 
         # replace abbreviations
+        catalog = card_catalog(self.bot)
         for i, card in enumerate(deck):
-            if card in self.cards_abbrev.keys():
-                deck[i] = self.cards_abbrev[card]
+            key = catalog.resolve(card)
+            if key is not None:
+                deck[i] = key
 
         return deck
 
@@ -26,18 +26,43 @@ DEALINGS IN THE SOFTWARE.
 
 import asyncio
 import datetime as dt
+import heapq
+import itertools
 import os
+import time
 from collections import defaultdict
 
 import aiohttp
 import async_timeout
 from __main__ import send_cmd_help
+from cogs.serverindex import emoji_str
+from cogs.utils import checks
+from cogs.utils.chat_formatting import box
 from cogs.utils.dataIO import dataIO
 from discord.ext import commands
 
+try:
+    from cogs.httpclient import client_session
+except ImportError:
+    def client_session(bot):
+        """One-off session when the HTTPClient cog is not installed."""
+        return aiohttp.ClientSession()
+
 PATH = os.path.join("data", "cr_api")
 JSON = os.path.join(PATH, "settings.json")
 
+# Requests per second shared by all cogs using the API token
+RATE_LIMIT = 5
+
+# Requests which can be sent at once after being idle
+RATE_BURST = 10
+
+# Seconds background requests back off after a 429 without Retry-After
+BACKOFF_BASE = 2
+
+# Max seconds background requests back off
+BACKOFF_MAX = 60
+
 CHESTS = dataIO.load_json(os.path.join(PATH, 'chests.json'))
 
 
@@ -713,16 +738,9 @@ class CRClanMemberModel:
         ).format(self.league)
 
     def league_emoji(self, bot):
-        """League emoji.
-
-        Goes through all servers the bot is on to find the emoji.
-        """
+        """League emoji."""
         name = 'league{}'.format(self.league)
-        for server in bot.servers:
-            for emoji in server.emojis:
-                if emoji.name == name:
-                    return '<:{}:{}>'.format(emoji.name, emoji.id)
-        return ''
+        return emoji_str(bot, name)
 
     @property
     def clan_name(self):
@@ -890,6 +908,122 @@ class Settings:
     timeout = 30
 
 
+class RequestScheduler:
+    """Token bucket rate limiter with priority queue.
+
+    All API requests sharing one auth token wait for a token here.
+    Interactive requests are served before background requests.
+    Background requests back off when the API answers 429.
+    """
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+    def __init__(self, loop, rate=RATE_LIMIT, burst=RATE_BURST):
+        """Init."""
+        self.loop = loop
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.queue = []
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.backoff_until = 0
+        self.throttled_count = 0
+        self.consecutive_throttled = 0
+        self.stats = {
+            self.INTERACTIVE: {'requests': 0, 'wait': 0, 'max_wait': 0},
+            self.BACKGROUND: {'requests': 0, 'wait': 0, 'max_wait': 0},
+        }
+
+    def refill(self):
+        """Add tokens for time passed since last refill."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, background=False):
+        """Wait until a request can be sent."""
+        priority = self.BACKGROUND if background else self.INTERACTIVE
+        start = time.monotonic()
+        self.refill()
+        if not self.queue and self.tokens >= 1 and not self.backing_off(priority):
+            self.tokens -= 1
+        else:
+            future = self.loop.create_future()
+            heapq.heappush(self.queue, (priority, next(self.counter), future))
+            self.wakeup.set()
+            if self.task is None:
+                self.task = asyncio.ensure_future(self.dispatch(), loop=self.loop)
+            await future
+        self.record(priority, time.monotonic() - start)
+
+    def backing_off(self, priority):
+        """True if requests of this priority are paused."""
+        return priority == self.BACKGROUND and time.monotonic() < self.backoff_until
+
+    async def dispatch(self):
+        """Release queued requests as tokens become available."""
+        try:
+            while self.queue:
+                priority, count, future = self.queue[0]
+                if future.done():
+                    heapq.heappop(self.queue)
+                    continue
+                self.refill()
+                if self.backing_off(priority):
+                    delay = self.backoff_until - time.monotonic()
+                elif self.tokens < 1:
+                    delay = (1 - self.tokens) / self.rate
+                else:
+                    heapq.heappop(self.queue)
+                    self.tokens -= 1
+                    future.set_result(None)
+                    continue
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.task = None
+
+    def record(self, priority, wait):
+        """Record wait time."""
+        stats = self.stats[priority]
+        stats['requests'] += 1
+        stats['wait'] += wait
+        stats['max_wait'] = max(stats['max_wait'], wait)
+
+    def report(self, status, headers=None):
+        """Report response status.
+
+        On 429, pause background requests for Retry-After seconds
+        or an exponential backoff if the header is missing.
+        """
+        if status != 429:
+            self.consecutive_throttled = 0
+            return
+        self.consecutive_throttled += 1
+        self.throttled_count += 1
+        delay = None
+        if headers is not None:
+            try:
+                delay = float(headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                delay = None
+        if delay is None:
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.consecutive_throttled - 1))
+        self.backoff_until = max(self.backoff_until, time.monotonic() + delay)
+        self.wakeup.set()
+
+    def queue_depth(self, priority):
+        """Number of requests waiting by priority."""
+        return len([item for item in self.queue if item[0] == priority and not item[2].done()])
+
+
 class ClashRoyaleAPI:
     """Clash Royale API.
     
@@ -905,6 +1039,13 @@ class ClashRoyaleAPI:
         def foo(self):
             api = self.bot.get_cog('ClashRoyaleAPI')
             profile = api.profile_model('C0G20PR2')
+
+        async def bar(self, url):
+            api = self.bot.get_cog('ClashRoyaleAPI')
+            scheduler = await api.request_slot(background=True)
+            async with client_session(self.bot) as session:
+                async with session.get(url) as resp:
+                    scheduler.report(resp.status, resp.headers)
     """
 
     def __init__(self, bot):
@@ -912,6 +1053,18 @@ class ClashRoyaleAPI:
         self.bot = bot
         self.settings = nested_dict()
         self.settings.update(dataIO.load_json(JSON))
+        self.scheduler = RequestScheduler(
+            bot.loop,
+            rate=self.settings.get("rate_limit", RATE_LIMIT),
+            burst=self.settings.get("rate_burst", RATE_BURST))
+
+    async def request_slot(self, background=False):
+        """Wait for a request slot from the shared scheduler.
+
+        Return the scheduler so the response status can be reported.
+        """
+        await self.scheduler.acquire(background=background)
+        return self.scheduler
 
     @commands.group(name="crapi", pass_context=True)
     async def crapi(self, ctx):
@@ -924,17 +1077,67 @@ class ClashRoyaleAPI:
         """Cog status."""
         await self.bot.say("Cog loaded.")
 
-    async def fetch(self, session, url):
+    @checks.is_owner()
+    @crapi.command(name="ratelimit", pass_context=True)
+    async def crapi_ratelimit(self, ctx, rate: float, burst: int = None):
+        """Set requests per second shared by all cogs.
+
+        burst: requests which can be sent at once after being idle.
+        """
+        if rate <= 0:
+            await self.bot.say("Rate must be greater than 0.")
+            return
+        if burst is None:
+            burst = self.scheduler.burst
+        self.settings["rate_limit"] = rate
+        self.settings["rate_burst"] = max(1, burst)
+        dataIO.save_json(JSON, self.settings)
+        self.scheduler.rate = rate
+        self.scheduler.burst = max(1, burst)
+        self.scheduler.wakeup.set()
+        await self.bot.say("Rate limit set to {} requests per second, burst {}.".format(
+            rate, self.scheduler.burst))
+
+    @crapi.command(name="scheduler", pass_context=True)
+    async def crapi_scheduler(self, ctx):
+        """Request scheduler queue depth and wait times."""
+        scheduler = self.scheduler
+        scheduler.refill()
+        out = [
+            "Rate: {} requests per second, burst {}".format(scheduler.rate, scheduler.burst),
+            "Tokens available: {:.1f}".format(scheduler.tokens),
+            "429 responses: {}".format(scheduler.throttled_count),
+        ]
+        backoff = scheduler.backoff_until - time.monotonic()
+        if backoff > 0:
+            out.append("Background backing off for {:.1f} seconds".format(backoff))
+        for name, priority in [("Interactive", scheduler.INTERACTIVE), ("Background", scheduler.BACKGROUND)]:
+            stats = scheduler.stats[priority]
+            avg_wait = stats['wait'] / stats['requests'] if stats['requests'] else 0
+            out.append(
+                "{}: {} queued, {} requests, "
+                "avg wait {:.0f} ms, max wait {:.0f} ms".format(
+                    name,
+                    scheduler.queue_depth(priority),
+                    stats['requests'],
+                    avg_wait * 1000,
+                    stats['max_wait'] * 1000))
+        await self.bot.say(box("\n".join(out)))
+
+    async def fetch(self, session, url, background=False):
         """Fetch URL.
         
         :param session: aiohttp.ClientSession
         :param url: URL
+        :param background: True for requests not made on behalf of a user
         :return: Response in JSON
         """
         print(url)
+        await self.scheduler.acquire(background=background)
         try:
             with async_timeout.timeout(Settings.timeout):
                 async with session.get(url) as response:
+                    self.scheduler.report(response.status, response.headers)
                     return await response.json()
         except asyncio.TimeoutError:
             return None
@@ -947,7 +1150,7 @@ class ClashRoyaleAPI:
         http://api.cr-api.com/profile/C0G20PR2
         """
         url = 'http://api.cr-api.com/profile/{}'.format(SCTag(tag).tag)
-        async with aiohttp.ClientSession() as session:
+        async with client_session(self.bot) as session:
             data = await self.fetch(session, url)
         return data
 
@@ -962,7 +1165,7 @@ class ClashRoyaleAPI:
         http://api.cr-api.com/clan/2CCCP 
         """
         url = 'http://api.cr-api.com/clan/{}'.format(SCTag(tag).tag)
-        async with aiohttp.ClientSession() as session:
+        async with client_session(self.bot) as session:
             data = await self.fetch(session, url)
         return data
 
@@ -975,7 +1178,7 @@ class ClashRoyaleAPI:
         """Clans as JSON."""
         sctags = [SCTag(t).tag for t in tags]
         url = 'http://api.cr-api.com/clan/{}'.format(','.join(sctags))
-        async with aiohttp.ClientSession() as session:
+        async with client_session(self.bot) as session:
             data = await self.fetch(session, url)
         return data
 
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 SML
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+
+from __main__ import send_cmd_help
+from cogs.utils import checks
+from cogs.utils.chat_formatting import box
+from cogs.utils.dataIO import dataIO
+from discord.ext import commands
+
+PATH = os.path.join("data", "crcards")
+CARDS_JSON = os.path.join(PATH, "cards.json")
+
+
+class CatalogMissing(commands.CheckFailure):
+    """Raised by catalog_required when the CRCards cog is not loaded."""
+    pass
+
+
+def card_catalog(bot):
+    """Shared card catalog. None if the CRCards cog is not loaded."""
+    cards = bot.get_cog('CRCards')
+    if cards is None:
+        return None
+    return cards.catalog
+
+
+def catalog_required():
+    """Command check for cogs which use the card catalog.
+
+    Raise CatalogMissing when the CRCards cog is not loaded. The help
+    formatter runs checks on every command it lists, so the check does not
+    reply itself; cogs tell the user in on_command_error.
+    """
+    def predicate(ctx):
+        if card_catalog(ctx.bot) is None:
+            raise CatalogMissing("CRCards cog is required to look up cards.")
+        return True
+    return commands.check(predicate)
+
+
+class CardCatalog:
+    """Read-only Clash Royale card catalog.
+
+    Cards are listed in data/crcards/cards.json. The position of a card in
+    the file is its ordinal, which is stable as new cards are appended and
+    can be used as a bit or column index.
+
+    Card fields:
+    + key: card key used by most cogs, e.g. xbow
+    + name: display name, e.g. X-Bow
+    + api_key: key used by cr-api, e.g. x-bow
+    + decklink: card id used in deck links
+    + cpid: card popularity snapshot id
+    + sfid: Starfire id
+    + api_id: player API card name
+    + elixir, rarity, type, tid
+    + aka: list of abbreviations
+    """
+
+    def __init__(self, data):
+        """Build lookup maps from cards.json data."""
+        self.cards = [dict(card) for card in data["cards"]]
+        self.rarities = list(data.get("rarities", []))
+
+        self.keys = [card["key"] for card in self.cards]
+        self.by_key = {card["key"]: card for card in self.cards}
+        self.ordinals = {key: i for i, key in enumerate(self.keys)}
+
+        self.name_keys = {}
+        self.api_key_keys = {}
+        self.decklink_keys = {}
+        self.cpid_keys = {}
+        self.sfid_keys = {}
+        self.api_id_keys = {}
+        self.aliases = {}
+
+        for card in self.cards:
+            key = card["key"]
+            self.name_keys[card["name"].lower()] = key
+            self.api_key_keys[card["api_key"]] = key
+            if card.get("decklink") is not None:
+                self.decklink_keys[str(card["decklink"])] = key
+            self.cpid_keys[card["cpid"]] = key
+            self.sfid_keys[card["sfid"]] = key
+            self.api_id_keys[card["api_id"]] = key
+
+            for alias in [key] + card["aka"]:
+                self.aliases.setdefault(alias, key)
+                self.aliases.setdefault(alias.replace('-', ''), key)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __contains__(self, key):
+        return key in self.by_key
+
+    def card(self, key):
+        """Card dict by key."""
+        return self.by_key.get(key)
+
+    def resolve(self, name):
+        """Card key from key, abbreviation or name. None if not found."""
+        if name is None:
+            return None
+        name = name.lower()
+        if name in self.aliases:
+            return self.aliases[name]
+        return self.name_keys.get(name)
+
+    def field(self, key, field, default=None):
+        """Card field by key."""
+        card = self.by_key.get(key)
+        if card is None:
+            return default
+        return card.get(field, default)
+
+    def name(self, key):
+        """Display name."""
+        return self.field(key, "name")
+
+    def elixir(self, key):
+        """Elixir. 0 for unknown cards."""
+        return self.field(key, "elixir", 0)
+
+    def rarity(self, key):
+        """Rarity in lower case."""
+        return self.field(key, "rarity")
+
+    def emoji_name(self, key):
+        """Name of the card emoji on the bot servers, e.g. goblinhut."""
+        return key.replace('-', '')
+
+    def ordinal(self, key):
+        """Ordinal id of card."""
+        return self.ordinals.get(key)
+
+    def key_to_api_key(self, key):
+        """cr-api key of card."""
+        return self.field(key, "api_key")
+
+    def api_key_to_key(self, api_key):
+        """Card key from cr-api key."""
+        return self.api_key_keys.get(api_key)
+
+    def key_to_decklink(self, key):
+        """Deck link id of card as str."""
+        decklink = self.field(key, "decklink")
+        return None if decklink is None else str(decklink)
+
+    def decklink_to_key(self, decklink):
+        """Card key from deck link id."""
+        return self.decklink_keys.get(str(decklink))
+
+    def key_to_cpid(self, key):
+        """Card popularity snapshot id of card."""
+        return self.field(key, "cpid")
+
+    def cpid_to_key(self, cpid):
+        """Card key from card popularity snapshot id."""
+        return self.cpid_keys.get(cpid)
+
+    def key_to_sfid(self, key):
+        """Starfire id of card."""
+        return self.field(key, "sfid")
+
+    def sfid_to_key(self, sfid):
+        """Card key from Starfire id."""
+        return self.sfid_keys.get(sfid)
+
+    def api_id_to_key(self, api_id):
+        """Card key from player API card name."""
+        return self.api_id_keys.get(api_id)
+
+    def bitset(self, keys):
+        """Int bitset of card ordinals. Unknown keys are ignored."""
+        bits = 0
+        for key in keys:
+            ordinal = self.ordinals.get(key)
+            if ordinal is not None:
+                bits |= 1 << ordinal
+        return bits
+
+    def bitset_keys(self, bits):
+        """Card keys of bitset."""
+        return [key for i, key in enumerate(self.keys) if bits >> i & 1]
+
+
+class CRCards:
+    """Shared Clash Royale card catalog.
+
+    This is a utility cog which loads the card catalog once per process.
+    Clash Royale cogs use it for card lookups instead of each loading and
+    indexing their own copy of the card data.
+
+    from cogs.crcards import CatalogMissing, card_catalog, catalog_required
+
+    class MyCog:
+
+        def __init__(self, bot):
+            self.bot = bot
+
+        async def on_command_error(self, error, ctx):
+            if isinstance(error, CatalogMissing) and ctx.command.instance is self:
+                await self.bot.send_message(ctx.message.channel, str(error))
+
+        @commands.command()
+        @catalog_required()
+        async def foo(self, name):
+            catalog = card_catalog(self.bot)
+            key = catalog.resolve(name)
+            await self.bot.say(catalog.elixir(key))
+    """
+
+    catalog = None
+
+    def __init__(self, bot):
+        """Init."""
+        self.bot = bot
+        if CRCards.catalog is None:
+            CRCards.catalog = CardCatalog(dataIO.load_json(CARDS_JSON))
+
+    @commands.group(pass_context=True)
+    async def crcards(self, ctx):
+        """Clash Royale card catalog."""
+        if ctx.invoked_subcommand is None:
+            await send_cmd_help(ctx)
+
+    @crcards.command(name="card", pass_context=True)
+    async def crcards_card(self, ctx, name):
+        """Show catalog entry of a card."""
+        key = self.catalog.resolve(name)
+        if key is None:
+            await self.bot.say("**{}** is not a valid card name.".format(name))
+            return
+        card = self.catalog.card(key)
+        out = ["{}: {}".format("ordinal", self.catalog.ordinal(key))]
+        out.extend("{}: {}".format(k, v) for k, v in card.items())
+        await self.bot.say(box("\n".join(out)))
+
+    @crcards.command(name="reload", pass_context=True)
+    @checks.is_owner()
+    async def crcards_reload(self, ctx):
+        """Reload card catalog from disk."""
+        CRCards.catalog = CardCatalog(dataIO.load_json(CARDS_JSON))
+        await self.bot.say("Loaded {} cards.".format(len(self.catalog)))
+
+
+def check_folder():
+    """Check data folder exists. Create if they’re not."""
+    if not os.path.exists(PATH):
+        print("Creating {} folder".format(PATH))
+        os.makedirs(PATH)
+
+
+def setup(bot):
+    """Setup."""
+    check_folder()
+    n = CRCards(bot)
+    bot.add_cog(n)
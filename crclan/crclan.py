@@ -30,6 +30,7 @@ import datetime as dt
 import itertools
 import json
 import os
+import time
 from collections import defaultdict, OrderedDict
 from datetime import timedelta
 from enum import Enum
@@ -38,20 +39,47 @@ from random import choice
 import aiohttp
 import discord
 from __main__ import send_cmd_help
+from cogs.serverindex import PlayerIndex, emoji_str, role_members
 from cogs.utils import checks
 from cogs.utils.chat_formatting import inline, pagify, box
 from cogs.utils.dataIO import dataIO
 from discord.ext import commands
 
+try:
+    from cogs.httpclient import client_session
+except ImportError:
+    def client_session(bot):
+        """One-off session when the HTTPClient cog is not installed."""
+        return aiohttp.ClientSession()
+
 PATH = os.path.join("data", "crclan")
 PATH_CLANS = os.path.join(PATH, "clans")
 JSON = os.path.join(PATH, "settings.json")
 BADGES_JSON = os.path.join(PATH, "badges.json")
 
+# Kind of clan snapshots in the SnapshotStore cog
+SNAPSHOT_KIND = "crclan.clan"
+
+# Kind of clan time series in the SnapshotStore cog
+HISTORY_KIND = "crclan.clan_history"
+
+# Number of delta records between full keyframes
+HISTORY_KEYFRAME_INTERVAL = 144
+
+# Clan and member fields kept in history
+HISTORY_CLAN_FIELDS = ['name', 'score', 'memberCount', 'donations', 'requiredScore', 'type']
+HISTORY_MEMBER_FIELDS = ['name', 'score', 'trophies', 'donations', 'roleName', 'expLevel']
+
 DATA_UPDATE_INTERVAL = timedelta(minutes=10).seconds
 
 API_FETCH_TIMEOUT = 15
 
+# Number of clan fetches running at the same time during refresh
+REFRESH_CONCURRENCY = 4
+
+# Number of clan tags per multi-tag API request
+REFRESH_CHUNK_SIZE = 10
+
 BOT_COMMANDER_ROLES = ["Bot Commander"]
 
 CREDITS = 'Selfish + SML'
@@ -200,14 +228,17 @@ class CRClanType(Enum):
 class CRClanModel:
     """Clash Royale Clan data."""
 
-    def __init__(self, data=None, is_cache=False, timestamp=None, loaded=True):
+    def __init__(self, data=None, is_cache=False, timestamp=None, loaded=True, fetch_time=None):
         """Init.
+
+        fetch_time: seconds spent on the API request which returned this clan.
         """
         # self.__dict__.update(kwargs)
         self.data = data
         self.is_cache = is_cache
         self.timestamp = timestamp
         self.loaded = loaded
+        self.fetch_time = fetch_time
         self._members = None
 
     @property
@@ -465,16 +496,193 @@ class CRClanMemberModel:
         ).format(self.league)
 
     def league_emoji(self, bot):
-        """League emoji.
+        """League emoji."""
+        name = 'league{}'.format(self.league)
+        return emoji_str(bot, name)
+
+
+class ClanHistory:
+    """Clan snapshot time series.
+
+    Each data update appends what changed since the previous update to the
+    SnapshotStore history. A full keyframe is written every
+    HISTORY_KEYFRAME_INTERVAL records so queries replay a bounded number of deltas.
+
+    State format:
+    - clan: dict of HISTORY_CLAN_FIELDS
+    - members: dict of member tag: dict of HISTORY_MEMBER_FIELDS
+
+    Delta format (keys omitted when empty):
+    - clan: changed clan fields
+    - joined: member tag: member fields
+    - left: list of member tags
+    - members: member tag: changed member fields
+    """
+
+    def __init__(self, bot):
+        """Init."""
+        self.bot = bot
+        # tag: {'state': state, 'count': deltas since keyframe}
+        self.states = {}
+
+    @property
+    def store(self):
+        """SnapshotStore cog, or None if not loaded."""
+        return self.bot.get_cog('SnapshotStore')
+
+    @staticmethod
+    def state(data):
+        """Compact state from clan data."""
+        return {
+            'clan': {k: data.get(k) for k in HISTORY_CLAN_FIELDS},
+            'members': {
+                m.get('tag'): {k: m.get(k) for k in HISTORY_MEMBER_FIELDS}
+                for m in data.get('members') or []}
+        }
+
+    @staticmethod
+    def delta(prev, cur):
+        """Changes from prev state to cur state."""
+        members = {}
+        for tag, member in cur['members'].items():
+            prev_member = prev['members'].get(tag)
+            if prev_member is None:
+                continue
+            changed = {k: v for k, v in member.items() if prev_member.get(k) != v}
+            if changed:
+                members[tag] = changed
+        delta = {
+            'clan': {k: v for k, v in cur['clan'].items() if prev['clan'].get(k) != v},
+            'joined': {t: m for t, m in cur['members'].items() if t not in prev['members']},
+            'left': [t for t in prev['members'] if t not in cur['members']],
+            'members': members,
+        }
+        return {k: v for k, v in delta.items() if v}
+
+    @staticmethod
+    def apply(state, delta):
+        """Apply delta to state in place."""
+        state['clan'].update(delta.get('clan', {}))
+        for tag in delta.get('left', []):
+            state['members'].pop(tag, None)
+        for tag, member in delta.get('joined', {}).items():
+            state['members'][tag] = dict(member)
+        for tag, changed in delta.get('members', {}).items():
+            state['members'].setdefault(tag, {}).update(changed)
+
+    def load(self, tag):
+        """Latest state of tag, rebuilt from the store on first use."""
+        if tag in self.states:
+            return self.states[tag]
+        records = self.store.history(HISTORY_KIND, tag, since=time.time())
+        if not records:
+            return None
+        state = None
+        for record in records:
+            if record.keyframe:
+                state = record.data
+            elif state is not None:
+                self.apply(state, record.data)
+        if state is None:
+            return None
+        self.states[tag] = {'state': state, 'count': len(records) - 1}
+        return self.states[tag]
 
-        Goes through all servers the bot is on to find the emoji.
+    def record(self, clans, timestamp=None):
+        """Append dict of tag: clan data to history."""
+        store = self.store
+        if store is None or not clans:
+            return
+        items = {}
+        for tag, data in clans.items():
+            cur = self.state(data)
+            entry = self.load(tag)
+            if entry is None or entry['count'] >= HISTORY_KEYFRAME_INTERVAL:
+                items[tag] = (cur, True)
+                self.states[tag] = {'state': cur, 'count': 0}
+                continue
+            delta = self.delta(entry['state'], cur)
+            if not delta:
+                continue
+            items[tag] = (delta, False)
+            entry['state'] = cur
+            entry['count'] += 1
+        if items:
+            store.append_history(HISTORY_KIND, items, timestamp=timestamp)
+
+    def summary(self, tag, days=7):
+        """Summarize history of a clan over the last days.
+
+        Return None if there is no history.
         """
-        name = 'league{}'.format(self.league)
-        for server in bot.servers:
-            for emoji in server.emojis:
-                if emoji.name == name:
-                    return '<:{}:{}>'.format(emoji.name, emoji.id)
-        return ''
+        since = dt.datetime.utcnow() - timedelta(days=days)
+        records = self.store.history(HISTORY_KIND, tag, since=time.time() - days * 86400)
+        if not records:
+            return None
+
+        state = None
+        start = None
+        snapshots = 0
+        scores = OrderedDict()
+        joined = []
+        left = []
+        donations = defaultdict(int)
+        names = {}
+
+        for record in records:
+            if record.keyframe:
+                delta = self.delta(state, record.data) if state is not None else {}
+            else:
+                if state is None:
+                    continue
+                delta = record.data
+
+            in_window = record.timestamp >= since
+            if in_window and state is not None:
+                if start is None:
+                    start = {'score': state['clan'].get('score'), 'members': len(state['members'])}
+                joined.extend(delta.get('joined', {}).keys())
+                left.extend(delta.get('left', []))
+                for member_tag, changed in delta.get('members', {}).items():
+                    if changed.get('donations') is None:
+                        continue
+                    old = state['members'].get(member_tag, {}).get('donations') or 0
+                    new = changed['donations']
+                    # donations reset weekly
+                    donations[member_tag] += new - old if new >= old else new
+
+            if record.keyframe:
+                state = record.data
+            else:
+                self.apply(state, delta)
+
+            for member_tag, member in state['members'].items():
+                names[member_tag] = member.get('name')
+            for member_tag in delta.get('left', []):
+                names.setdefault(member_tag, member_tag)
+
+            if in_window:
+                snapshots += 1
+                scores[record.timestamp.strftime('%Y-%m-%d')] = state['clan'].get('score')
+
+        if start is None:
+            start = {'score': state['clan'].get('score'), 'members': len(state['members'])}
+
+        return {
+            'name': state['clan'].get('name'),
+            'snapshots': snapshots,
+            'score_start': start['score'],
+            'score_end': state['clan'].get('score'),
+            'scores': scores,
+            'members_start': start['members'],
+            'members_end': len(state['members']),
+            'joined': [names.get(t, t) for t in joined],
+            'left': [names.get(t, t) for t in left],
+            'donations': sum(donations.values()),
+            'top_donors': [
+                (names.get(t, t), d) for t, d in
+                sorted(donations.items(), key=lambda x: -x[1])[:5] if d > 0],
+        }
 
 
 class ServerModel:
@@ -510,6 +718,8 @@ class ClanManager:
         self.settings = nested_dict()
         self.settings.update(dataIO.load_json(filepath))
         self.bot = bot
+        self.history = ClanHistory(bot)
+        self.player_index = PlayerIndex(self.server_players)
 
     def init_server(self, server):
         """Initialized server settings.
@@ -517,6 +727,7 @@ class ClanManager:
         This will wipe all clan data and player data.
         """
         self.settings["servers"][server.id] = ServerModel.DEFAULTS
+        self.player_index.clear()
         self.save()
 
     def init_clans(self, server):
@@ -528,6 +739,7 @@ class ClanManager:
         """Make sure server exists in settings."""
         if server.id not in self.settings["servers"]:
             self.settings["servers"][server.id] = ServerModel.DEFAULTS
+            self.player_index.clear()
         self.save()
 
     def get_clans(self, server):
@@ -538,6 +750,10 @@ class ClanManager:
         """CR Players settings by server."""
         return self.settings["servers"][server.id]["players"]
 
+    def server_players(self, server_id):
+        """CR Players settings by server id, empty if not set."""
+        return self.settings["servers"].get(server_id, {}).get("players", {})
+
     def get_player_tags(self, server):
         """All player tags known to the server."""
         return [player_tag for member_id, player_tag in self.get_players(server).items()]
@@ -592,6 +808,7 @@ class ClanManager:
         players = self.settings["servers"][server.id]["players"]
         players[member.id] = tag
         self.settings["servers"][server.id]["players"] = players
+        self.player_index.set(server.id, member.id, tag)
         self.save()
 
     def set_elder_role(self, server, role_name):
@@ -662,17 +879,6 @@ class ClanManager:
                 return clan["role_name"]
         return None
 
-    def tag2member(self, server, tag):
-        """Return Discord member from player tag."""
-        try:
-            players = self.settings["servers"][server.id]["players"]
-            for member_id, player_tag in players.items():
-                if player_tag == tag:
-                    return server.get_member(member_id)
-        except KeyError:
-            pass
-        return None
-
     async def get_clan_data(self, server, key=None, tag=None) -> CRClanModel:
         """Return data as CRClanData by key or tag
 
@@ -709,7 +915,10 @@ class ClanManager:
         tag = self.key2tag(server, key)
         clan = self.server_settings(server)["clans"][tag]
         role = discord.utils.get(server.roles, id=clan['role_id'])
-        members = [m for m in server.members if role in m.roles]
+        members = []
+        if role is not None:
+            members = [server.get_member(id) for id in role_members(self.bot, server, role)]
+            members = [m for m in members if m is not None]
         if sort:
             members = sorted(members, key=lambda x: x.display_name.lower())
         return members
@@ -723,8 +932,14 @@ class ClanManager:
         url = "{}{}".format(self.clan_api_url, tag)
 
         try:
-            async with aiohttp.ClientSession() as session:
+            scheduler = None
+            api = self.bot.get_cog('ClashRoyaleAPI')
+            if api is not None:
+                scheduler = await api.request_slot()
+            async with client_session(self.bot) as session:
                 async with session.get(url, timeout=API_FETCH_TIMEOUT) as resp:
+                    if scheduler is not None:
+                        scheduler.report(resp.status, resp.headers)
                     data = await resp.json()
         except json.decoder.JSONDecodeError:
             return False
@@ -732,64 +947,160 @@ class ClanManager:
             # return CRClanModel(loaded=False, tag=tag)
             return False
 
-        filepath = self.cached_filepath(tag)
-        dataIO.save_json(filepath, data)
+        self.save_cache({tag: data})
 
         is_cache = False
         timestamp = dt.datetime.utcnow()
 
         return CRClanModel(data=data, is_cache=is_cache, timestamp=timestamp)
 
+    @property
+    def store(self):
+        """SnapshotStore cog, or None if not loaded."""
+        return self.bot.get_cog('SnapshotStore')
+
+    def save_cache(self, clans):
+        """Save dict of tag: clan data as cache.
+
+        Use the SnapshotStore cog if loaded, otherwise one JSON file per tag.
+        """
+        store = self.store
+        if store is not None:
+            store.put_many(SNAPSHOT_KIND, clans)
+            return
+        for tag, data in clans.items():
+            dataIO.save_json(self.cached_filepath(tag), data)
+
     def cached_clan_data(self, tag):
         """Load cached clan data. Used when live update failed."""
-        filepath = self.cached_filepath(tag)
-        if os.path.exists(filepath):
-            is_cache = True
-            data = dataIO.load_json(filepath)
-            timestamp = dt.datetime.fromtimestamp(os.path.getmtime(filepath))
-            return CRClanModel(data=data, is_cache=is_cache, timestamp=timestamp)
-        return None
+        return self.cached_clans_data([tag]).get(tag)
+
+    def cached_clans_data(self, tags):
+        """Load cached clan data for multiple tags.
+
+        Return dict of tag: CRClanModel for tags found in cache.
+        """
+        out = {}
+        store = self.store
+        if store is not None:
+            for tag, snapshot in store.get_many(SNAPSHOT_KIND, tags).items():
+                out[tag] = CRClanModel(data=snapshot.data, is_cache=True, timestamp=snapshot.timestamp)
+        for tag in tags:
+            if tag in out:
+                continue
+            filepath = self.cached_filepath(tag)
+            if os.path.exists(filepath):
+                data = dataIO.load_json(filepath)
+                timestamp = dt.datetime.utcfromtimestamp(os.path.getmtime(filepath))
+                out[tag] = CRClanModel(data=data, is_cache=True, timestamp=timestamp)
+        return out
 
     @staticmethod
     def cached_filepath(tag):
         """Cached clan data file path"""
         return os.path.join(PATH_CLANS, '{}.json'.format(tag))
 
-    async def update_data(self):
-        """Update all data and save to disk."""
-        dataset = []
+    def clan_tags(self):
+        """Unique clan tags across all servers."""
+        tags = OrderedDict()
         for server_id in self.settings["servers"]:
             clans = self.settings["servers"][server_id]["clans"]
             for tag in clans.keys():
-                data = await self.update_clan_data(tag)
-                if not data:
-                    data = self.cached_clan_data(tag)
-                if data is None:
-                    data = CRClanModel(loaded=False, tag=tag)
-                dataset.append(data)
+                tags[SCTag(tag).tag] = True
+        return list(tags.keys())
+
+    async def fetch_clans(self, tags, background=False):
+        """Fetch multiple clans with the comma-separated API endpoint.
+
+        Return list of clan dicts.
+        Raise APIFetchError if API cannot be reached.
+        """
+        url = "{}{}".format(self.clan_api_url, ",".join(tags))
+        try:
+            scheduler = None
+            api = self.bot.get_cog('ClashRoyaleAPI')
+            if api is not None:
+                scheduler = await api.request_slot(background=background)
+            async with client_session(self.bot) as session:
+                async with session.get(url, timeout=API_FETCH_TIMEOUT) as resp:
+                    if scheduler is not None:
+                        scheduler.report(resp.status, resp.headers)
+                    data = await resp.json()
+        except (json.decoder.JSONDecodeError, aiohttp.ClientError, asyncio.TimeoutError):
+            raise APIFetchError
+
+        # API returns a single dict instead of a list for single tags
+        if isinstance(data, dict):
+            data = [data]
+        if not isinstance(data, list):
+            raise APIFetchError
+        return [clan for clan in data if isinstance(clan, dict)]
+
+    async def update_clans_chunk(self, tags, semaphore, background=False):
+        """Update and save a chunk of clans.
+
+        Fall back to cached data for clans not returned by the API.
+        Return list of CRClanModel.
+        """
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                clans = await self.fetch_clans(tags, background=background)
+            except APIFetchError:
+                clans = []
+            fetch_time = time.perf_counter() - start
+
+        timestamp = dt.datetime.utcnow()
+        clans = {clan.get('tag'): clan for clan in clans if clan.get('tag') in tags}
+        self.save_cache(clans)
+        self.history.record(clans)
+        cached = self.cached_clans_data([tag for tag in tags if tag not in clans])
+
+        dataset = []
+        for tag in tags:
+            data = clans.get(tag)
+            if data is not None:
+                model = CRClanModel(data=data, timestamp=timestamp)
+            else:
+                model = cached.get(tag)
+            if model is None:
+                model = CRClanModel(data={'tag': tag}, loaded=False)
+            model.fetch_time = fetch_time
+            dataset.append(model)
         return dataset
 
+    async def update_data(self, background=False):
+        """Update all data and save to disk.
+
+        Clan tags are deduplicated across servers and fetched
+        in chunks with the multi-tag endpoint, with at most
+        refresh_concurrency requests in flight.
+
+        background: True when not run on behalf of a user,
+        so that API requests yield to interactive commands.
+        """
+        tags = self.clan_tags()
+        size = self.refresh_chunk_size
+        chunks = [tags[i:i + size] for i in range(0, len(tags), size)]
+        semaphore = asyncio.Semaphore(self.refresh_concurrency)
+        results = await asyncio.gather(
+            *[self.update_clans_chunk(chunk, semaphore, background=background) for chunk in chunks])
+        return [data for dataset in results for data in dataset]
+
     def member2tag(self, server, member):
         """Return player tag from member."""
-        try:
-            players = self.settings["servers"][server.id]["players"]
-            for member_id, player_tag in players.items():
-                if member_id == member.id:
-                    return player_tag
-        except KeyError:
-            pass
-        return None
+        return self.player_index.tag(server.id, member.id)
+
+    def tag2member_id(self, server, tag):
+        """Return Discord member ID by player tag."""
+        member = self.tag2member(server, tag)
+        if member is None:
+            return None
+        return member.id
 
     def tag2member(self, server, tag):
         """Return Discord member by player tag."""
-        try:
-            players = self.settings["servers"][server.id]["players"]
-            for member_id, player_tag in players.items():
-                if player_tag == tag:
-                    return server.get_member(member_id)
-        except KeyError:
-            pass
-        return None
+        return self.player_index.member(server, tag)
 
     @property
     def clan_api_url(self):
@@ -807,6 +1118,28 @@ class ClanManager:
         self.settings["data_update_interval"] = int(value)
         self.save()
 
+    @property
+    def refresh_concurrency(self):
+        """Max number of concurrent API requests during refresh."""
+        return int(self.settings.get("refresh_concurrency", REFRESH_CONCURRENCY))
+
+    @refresh_concurrency.setter
+    def refresh_concurrency(self, value):
+        """Set refresh concurrency."""
+        self.settings["refresh_concurrency"] = max(1, int(value))
+        self.save()
+
+    @property
+    def refresh_chunk_size(self):
+        """Number of clan tags per API request during refresh."""
+        return int(self.settings.get("refresh_chunk_size", REFRESH_CHUNK_SIZE))
+
+    @refresh_chunk_size.setter
+    def refresh_chunk_size(self, value):
+        """Set refresh chunk size."""
+        self.settings["refresh_chunk_size"] = max(1, int(value))
+        self.save()
+
     @property
     def es_enabled(self):
         """Enable Elastic Search."""
@@ -978,7 +1311,7 @@ class CRClan:
     async def loop_task(self):
         """Loop task: update data daily."""
         await self.bot.wait_until_ready()
-        await self.manager.update_data()
+        await self.manager.update_data(background=True)
         await asyncio.sleep(self.manager.data_update_interval)
         if self is self.bot.get_cog('CRClan'):
             self.task = self.bot.loop.create_task(self.loop_task())
@@ -1016,18 +1349,47 @@ class CRClan:
         self.manager.data_update_interval = seconds
         await self.bot.say("Data update interval updated.")
 
+    @crclanset.command(name="refreshconcurrency", pass_context=True)
+    async def crclanset_refreshconcurrency(self, ctx, count: int):
+        """Max number of concurrent API requests during data update."""
+        self.manager.refresh_concurrency = count
+        await self.bot.say("Refresh concurrency set to {}.".format(self.manager.refresh_concurrency))
+
+    @crclanset.command(name="refreshchunksize", pass_context=True)
+    async def crclanset_refreshchunksize(self, ctx, count: int):
+        """Number of clan tags fetched per API request during data update."""
+        self.manager.refresh_chunk_size = count
+        await self.bot.say("Refresh chunk size set to {}.".format(self.manager.refresh_chunk_size))
+
     @crclanset.command(name="update", pass_context=True)
     async def crclanset_update(self, ctx):
-        """Update data from api."""
+        """Update data from api.
+
+        Report status and API request time for each clan tag.
+        """
         await self.bot.type()
+        start = time.perf_counter()
         dataset = await self.manager.update_data()
+        elapsed = time.perf_counter() - start
+
+        fmt = '{:<12} {:<8} {:>8} {}'
+        out = [fmt.format("Tag", "Status", "Time", "Name"), '-' * 40]
         for data in dataset:
             if not data.loaded:
-                await self.bot.send_message(ctx.message.channel, "Cannot load data for {}.".format(data.tag))
-            if data.is_cache:
-                await self.bot.send_message(ctx.message.channel, data.cache_message)
+                status = 'failed'
+            elif data.is_cache:
+                status = 'cached'
             else:
-                await self.bot.send_message(ctx.message.channel, "Data for {} updated".format(data.name))
+                status = 'updated'
+            out.append(fmt.format(
+                data.tag,
+                status,
+                '{:.0f} ms'.format(data.fetch_time * 1000),
+                data.name or ''))
+        out.append('-' * 40)
+        out.append('{} clans updated in {:.0f} ms.'.format(len(dataset), elapsed * 1000))
+        for page in pagify('\n'.join(out)):
+            await self.bot.say(box(page))
 
     @crclanset.command(name="add", pass_context=True)
     async def crclanset_add(self, ctx, tag, key=None, role_name=None, unique=True):
@@ -1371,6 +1733,72 @@ class CRClan:
         await self.roster_view.send(
             ctx, server, clan_data, cache_warning=data_is_cached, color=random_discord_color())
 
+    @crclan.command(name="history", pass_context=True, no_pm=True)
+    async def crclan_history(self, ctx, key, *args):
+        """Clan history by key.
+
+        Member joins / leaves, donations and score trend
+        from stored snapshots. Does not call the API.
+        Requires the SnapshotStore cog.
+
+        Optional arguments:
+        --days DAYS    Number of days to look back. Default: 7
+
+        Example: Display history of clan associated with key “alpha” for the past 7 days
+        [p]crclan history alpha --days 7
+        """
+        parser = argparse.ArgumentParser(prog='[p]crclan history')
+        parser.add_argument('--days', type=int, default=7, help='Number of days')
+
+        try:
+            p_args = parser.parse_args(args)
+        except SystemExit:
+            await send_cmd_help(ctx)
+            return
+
+        if self.manager.history.store is None:
+            await self.bot.say("The SnapshotStore cog is required for clan history.")
+            return
+
+        server = ctx.message.server
+        tag = self.manager.key2tag(server, key)
+        if tag is None:
+            await self.bot.say("Cannot find key {} in settings.".format(key))
+            return
+
+        summary = self.manager.history.summary(tag, days=p_args.days)
+        if summary is None:
+            await self.bot.say("No history found for #{}.".format(tag))
+            return
+
+        def signed(value):
+            return '{:+,}'.format(value) if value is not None else '--'
+
+        score_start = summary['score_start']
+        score_end = summary['score_end']
+        score_change = None
+        if score_start is not None and score_end is not None:
+            score_change = score_end - score_start
+
+        out = [
+            '{} #{} - last {} days ({} snapshots)'.format(
+                summary['name'], tag, p_args.days, summary['snapshots']),
+            'Score: {} → {} ({})'.format(score_start, score_end, signed(score_change)),
+            'Members: {} → {}'.format(summary['members_start'], summary['members_end']),
+            'Joined ({}): {}'.format(len(summary['joined']), ', '.join(summary['joined']) or '--'),
+            'Left ({}): {}'.format(len(summary['left']), ', '.join(summary['left']) or '--'),
+            'Donations: {:,}'.format(summary['donations']),
+        ]
+        if summary['top_donors']:
+            out.append('Top donors: {}'.format(', '.join(
+                '{} ({:,})'.format(name, count) for name, count in summary['top_donors'])))
+        out.append('Score by day:')
+        for day, score in summary['scores'].items():
+            out.append('  {} {}'.format(day, score))
+
+        for page in pagify('\n'.join(out)):
+            await self.bot.say(box(page))
+
     @commands.has_any_role(*BOT_COMMANDER_ROLES)
     @crclan.command(name="multiroster", pass_context=True, no_pm=True)
     async def crclan_multiroster(self, ctx, *keys):
@@ -24,12 +24,15 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
 
+import argparse
 import asyncio
 import datetime as dt
 import json
 import os
 import re
 import string
+import threading
+from collections import OrderedDict
 from collections import namedtuple
 from datetime import timedelta
 
@@ -37,6 +40,7 @@ from __main__ import send_cmd_help
 from discord.ext import commands
 from discord.ext.commands import Context
 
+from cogs.crcards import CatalogMissing, card_catalog, catalog_required
 from cogs.utils import checks
 from cogs.utils.chat_formatting import box
 from cogs.utils.chat_formatting import pagify
@@ -47,6 +51,11 @@ try:
 except ImportError:
     raise ImportError("Please install the aiohttp package.") from None
 
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("Please install the numpy package.") from None
+
 elasticsearch_available = False
 
 try:
@@ -64,19 +73,511 @@ except ImportError:
 
 PATH = os.path.join("data", "crdata")
 SETTINGS_JSON = os.path.join(PATH, "settings.json")
-CLASHROYALE_JSON = os.path.join(PATH, "clashroyale.json")
 CARDPOP_FILE = "cardpop-%Y-%m-%d-%H.json"
+CATALOG_JSON = os.path.join(PATH, "snapshots.json")
+TIMESERIES_PATH = os.path.join(PATH, "timeseries")
 SF_CREDITS = "Data provided by <http://starfi.re>"
 
 DATA_UPDATE_INTERVAL = timedelta(minutes=5).seconds
 
 RESULTS_MAX = 3
 PAGINATION_TIMEOUT = 20
+SIMILAR_MAX = 30
+SNAPSHOT_CACHE_SIZE = 8
+
+# Time series layout: max card columns and leaderboard rows per hour
+TIMESERIES_CARDS = 256
+TIMESERIES_RANKS = 200
+CARDPOP_FILE_P = re.compile('cardpop-\d{4}-\d{2}-\d{2}-\d{2}.json')
+
+def clean_deck(deck):
+    """Return deck sorted by card key, or None for empty rows.
+
+    When data is not clean, "key" may be missing.
+    """
+    if deck is None:
+        return None
+    cards = []
+    for card in deck:
+        if "key" not in card:
+            card = dict(card, key="soon", level=13)
+        cards.append(card)
+    return sorted(cards, key=lambda x: x["key"])
+
+
+def top_similar(matrix, sizes, query, k, candidates=None):
+    """Return rows and scores of the k decks most similar to query.
+
+    Jaccard similarity of all rows is computed in one pass.
+    Identical decks (similarity 1) are skipped.
+
+    Params
+    + matrix. Boolean deck by card matrix.
+    + sizes. Number of cards in each row.
+    + query. Boolean card vector.
+    + candidates. Boolean row mask of decks to consider.
+    """
+    columns = np.flatnonzero(query)
+    intersection = matrix[:, columns].sum(axis=1)
+    union = sizes + len(columns) - intersection
+    scores = intersection / np.maximum(union, 1)
+    valid = scores < 1
+    if candidates is not None:
+        valid &= candidates
+    rows = np.flatnonzero(valid)
+    if len(rows) > k:
+        rows = rows[np.argpartition(-scores[rows], k - 1)[:k]]
+    rows = rows[np.argsort(-scores[rows], kind='mergesort')]
+    return rows, scores[rows]
+
+
+class DeckTable:
+    """Normalized decks of one snapshot.
+
+    Built once per snapshot. Each row is a leaderboard deck with
+    + matrix: boolean row of the cards in the deck, one column per card.
+    + elixir: average elixir.
+    + group: id of the unique deck, shared by rows with the same cards.
+
+    Searches are numpy operations over the whole table.
+    """
+
+    def __init__(self, decks, columns, elixirs):
+        """Init.
+
+        Params
+        + decks []. Leaderboard decks as in the Starfire "decks" list.
+        + columns {}. Starfire ID: column index.
+        + elixirs {}. Starfire ID: elixir.
+        """
+        self.columns = columns
+        self.decks = []
+        ranks = []
+        for rank, deck in enumerate(decks, 1):
+            # for unknown reasons deck could sometimes be None in data src
+            deck = clean_deck(deck)
+            if deck is not None:
+                self.decks.append(deck)
+                ranks.append(rank)
+        n = len(self.decks)
+        self.ranks = np.array(ranks, dtype=np.int32)
+        self.matrix = np.zeros((n, max(columns.values(), default=-1) + 1), dtype=bool)
+        self.elixir = np.zeros(n)
+        self.group = np.zeros(n, dtype=np.int32)
+        self.group_rows = []
+
+        groups = {}
+        for row, deck in enumerate(self.decks):
+            keys = tuple(card["key"] for card in deck)
+            for key in keys:
+                if key in columns:
+                    self.matrix[row, columns[key]] = True
+            # count 1 less card if mirror
+            values = [elixirs.get(key, 0) for key in keys]
+            values = [v for v in values if v]
+            self.elixir[row] = sum(values) / len(values) if values else 0
+            if keys not in groups:
+                groups[keys] = len(self.group_rows)
+                self.group_rows.append([])
+            self.group[row] = groups[keys]
+            self.group_rows[groups[keys]].append(row)
+
+        self.first = np.zeros(n, dtype=bool)
+        self.first[[rows[0] for rows in self.group_rows]] = True
+        self.sizes = self.matrix.sum(axis=1)
+
+    def __len__(self):
+        return len(self.decks)
+
+    def row_by_rank(self, rank):
+        """Return row of deck at leaderboard rank, or None."""
+        rows = np.flatnonzero(self.ranks == rank)
+        if not len(rows):
+            return None
+        return int(rows[0])
+
+    def similar(self, query, k=SIMILAR_MAX):
+        """Return list of (row, similarity) of unique decks most similar to query."""
+        rows, scores = top_similar(self.matrix, self.sizes, query, k, candidates=self.first)
+        return list(zip(rows.tolist(), scores.tolist()))
+
+    def search(self, include=None, exclude=None, elixir_min=0, elixir_max=10):
+        """Return rows of unique decks matching query, in rank order.
+
+        include and exclude are lists of Starfire IDs.
+        Decks with the same cards as a higher ranked deck are skipped.
+        """
+        include = include or []
+        exclude = exclude or []
+        if any(sfid not in self.columns for sfid in include):
+            return []
+        mask = self.first & (self.elixir >= elixir_min) & (self.elixir <= elixir_max)
+        if include:
+            mask &= self.matrix[:, [self.columns[c] for c in include]].all(axis=1)
+        exclude = [self.columns[c] for c in exclude if c in self.columns]
+        if exclude:
+            mask &= ~self.matrix[:, exclude].any(axis=1)
+        return np.flatnonzero(mask).tolist()
+
+    def result(self, row):
+        """Return search result dict for row.
+
+        + deck: cards sorted by key.
+        + count: number of times the deck is on the leaderboard.
+        + ranks: list of ranks as strings.
+        """
+        rows = self.group_rows[self.group[row]]
+        deck = self.decks[row]
+        return {
+            "deck": deck,
+            "cards": set(card["key"] for card in deck),
+            "count": len(rows),
+            "ranks": [str(self.ranks[r]) for r in rows]
+        }
+
+
+class DeckArchive:
+    """Unique decks seen across all snapshots.
+
+    Snapshots are added once each. Each unique deck is one row of a
+    boolean card matrix with how many times and when it was last seen,
+    so similarity searches cover the whole archive in one pass.
+
+    Rows of new decks are buffered by add and stacked onto the matrix once
+    by commit, so adding many snapshots does not copy the matrix each time.
+    """
+
+    def __init__(self, columns):
+        """Init."""
+        self.columns = columns
+        self.paths = set()
+        self.rows = {}
+        self.decks = []
+        self.counts = []
+        self.last_seen = []
+        self.matrix = np.zeros((0, max(columns.values(), default=-1) + 1), dtype=bool)
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self.pending = []
+
+    def __len__(self):
+        return len(self.decks)
+
+    def add(self, path, decks, timestamp):
+        """Add decks of snapshot saved at path."""
+        if path in self.paths:
+            return
+        self.paths.add(path)
+        for deck in decks:
+            deck = clean_deck(deck)
+            if deck is None:
+                continue
+            keys = tuple(card["key"] for card in deck)
+            if keys in self.rows:
+                row = self.rows[keys]
+                self.counts[row] += 1
+                self.last_seen[row] = max(self.last_seen[row], timestamp)
+                continue
+            self.rows[keys] = len(self.decks)
+            self.decks.append(deck)
+            self.counts.append(1)
+            self.last_seen.append(timestamp)
+            row = np.zeros(self.matrix.shape[1], dtype=bool)
+            row[[self.columns[key] for key in keys if key in self.columns]] = True
+            self.pending.append(row)
+
+    def commit(self):
+        """Stack rows of decks added since last commit onto the matrix."""
+        if not self.pending:
+            return
+        new_rows = np.array(self.pending)
+        self.matrix = np.vstack([self.matrix, new_rows])
+        self.sizes = np.concatenate([self.sizes, new_rows.sum(axis=1)])
+        self.pending = []
+
+    def similar(self, query, k=SIMILAR_MAX):
+        """Return list of (row, similarity) of decks most similar to query."""
+        self.commit()
+        rows, scores = top_similar(self.matrix, self.sizes, query, k)
+        return list(zip(rows.tolist(), scores.tolist()))
+
+
+class SnapshotCatalog:
+    """Manifest of hourly snapshot files.
+
+    Records which files exist and whether they contain decks, and points
+    to the latest valid file, so lookups never walk or parse files.
+    Parsed snapshots are kept in a small LRU cache.
+
+    Manifest format:
+    {
+        "snapshots": {filename: {"valid": bool}},
+        "latest": filename of latest valid snapshot
+    }
+    """
+
+    def __init__(self, path=CATALOG_JSON, cache_size=SNAPSHOT_CACHE_SIZE):
+        """Init."""
+        self.path = path
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.snapshots = {}
+        self.latest = None
+        self.loaded = False
+        if dataIO.is_valid_json(path):
+            manifest = dataIO.load_json(path)
+            self.snapshots = manifest.get("snapshots", {})
+            self.latest = manifest.get("latest")
+            self.loaded = True
+
+    def save(self):
+        """Save manifest."""
+        dataIO.save_json(self.path, {
+            "snapshots": self.snapshots,
+            "latest": self.latest
+        })
+
+    def ensure(self):
+        """Build manifest from files if there is none yet."""
+        if not self.loaded:
+            self.rebuild()
+
+    def rebuild(self):
+        """Scan data folder and record every snapshot file.
+
+        Blocking. Reads every file once.
+        """
+        self.snapshots = {}
+        self.latest = None
+        for file in sorted(os.listdir(PATH)):
+            if CARDPOP_FILE_P.match(file):
+                data = dataIO.load_json(os.path.join(PATH, file))
+                self.record(file, data)
+        self.loaded = True
+        self.save()
+
+    def record(self, file, data):
+        """Record snapshot file and its data without saving."""
+        valid = data is not None and "decks" in data
+        self.snapshots[file] = {"valid": valid}
+        if valid and (self.latest is None or file >= self.latest):
+            self.latest = file
+            self.cache_put(file, data)
+
+    def add(self, file, data):
+        """Record newly saved snapshot."""
+        self.ensure()
+        self.record(file, data)
+        self.save()
+
+    def remove(self, file):
+        """Forget snapshot file."""
+        self.snapshots.pop(file, None)
+        self.cache.pop(file, None)
+        if file == self.latest:
+            valid = self.valid_files()
+            self.latest = valid[-1] if valid else None
+        self.save()
+
+    def valid_files(self):
+        """Sorted list of valid snapshot files."""
+        return sorted(f for f, v in self.snapshots.items() if v["valid"])
+
+    def invalid_files(self):
+        """Sorted list of snapshot files without decks."""
+        return sorted(f for f, v in self.snapshots.items() if not v["valid"])
+
+    def is_valid(self, file):
+        """True if file is a recorded valid snapshot."""
+        self.ensure()
+        return self.snapshots.get(file, {}).get("valid", False)
+
+    def cache_put(self, file, data):
+        """Put parsed snapshot in LRU cache."""
+        self.cache[file] = data
+        self.cache.move_to_end(file)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def load(self, file):
+        """Return parsed snapshot, or None if file is not a valid snapshot."""
+        if not self.is_valid(file):
+            return None
+        if file in self.cache:
+            self.cache.move_to_end(file)
+            return self.cache[file]
+        data = dataIO.load_json(os.path.join(PATH, file))
+        self.cache_put(file, data)
+        return data
+
+    def load_latest(self):
+        """Return latest valid snapshot, or None."""
+        self.ensure()
+        if self.latest is None:
+            return None
+        return self.load(self.latest)
+
+
+class TimeSeriesStore:
+    """Columnar store of hourly Global 200 snapshots.
+
+    Each snapshot is one row appended to flat binary files which are read
+    as memory-mapped numpy arrays:
+    + hours.bin: int64 epoch seconds of the snapshot hour.
+    + card_usage.bin: uint16 (hours x TIMESERIES_CARDS) number of decks
+      using each card.
+    + deck_ids.bin: int32 (hours x TIMESERIES_RANKS) deck id at each rank,
+      -1 for empty rows.
+    + decks.bin: uint8 (decks x 8) sorted card columns of each deck id,
+      255 for missing cards.
+    meta.json maps Starfire IDs to card columns. New cards get new columns.
+    """
+
+    def __init__(self, path=TIMESERIES_PATH):
+        """Init."""
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.meta_path = os.path.join(path, "meta.json")
+        self.columns = {}
+        if dataIO.is_valid_json(self.meta_path):
+            self.columns = dataIO.load_json(self.meta_path).get("columns", {})
+        self.files = {
+            "hours": (os.path.join(path, "hours.bin"), np.int64, None),
+            "card_usage": (os.path.join(path, "card_usage.bin"), np.uint16, TIMESERIES_CARDS),
+            "deck_ids": (os.path.join(path, "deck_ids.bin"), np.int32, TIMESERIES_RANKS),
+            "decks": (os.path.join(path, "decks.bin"), np.uint8, 8),
+        }
+        self.load()
+
+    def load(self):
+        """Load deck ids and hours from files."""
+        self.repair()
+        self.deck_ids = {tuple(row): i for i, row in enumerate(self.array("decks").tolist())}
+        self.hours = set(self.array("hours").tolist())
+
+    def __len__(self):
+        return len(self.hours)
+
+    def rows(self, name):
+        """Number of complete rows in file."""
+        path, dtype, width = self.files[name]
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // (np.dtype(dtype).itemsize * (width or 1))
+
+    def truncate(self, name, rows):
+        """Drop rows past rows, including a partially written row."""
+        path, dtype, width = self.files[name]
+        size = rows * np.dtype(dtype).itemsize * (width or 1)
+        if os.path.exists(path) and os.path.getsize(path) != size:
+            with open(path, 'r+b') as f:
+                f.truncate(size)
+
+    def repair(self):
+        """Drop rows of an append which did not complete.
+
+        Rows are appended to card_usage and deck_ids before hours, so rows
+        past the number of hours belong to a snapshot which was not stored.
+        """
+        hours = self.rows("hours")
+        for name in ("hours", "card_usage", "deck_ids"):
+            self.truncate(name, min(hours, self.rows(name)))
+        self.truncate("decks", self.rows("decks"))
+
+    def array(self, name):
+        """Return memory-mapped array, or an empty array if there is no data."""
+        path, dtype, width = self.files[name]
+        shape = (0,) if width is None else (0, width)
+        if not os.path.exists(path) or not os.path.getsize(path):
+            return np.zeros(shape, dtype=dtype)
+        rows = self.rows(name)
+        shape = (rows,) if width is None else (rows, width)
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+    def write(self, name, values):
+        """Append rows to file."""
+        path, dtype, width = self.files[name]
+        with open(path, 'ab') as f:
+            f.write(np.asarray(values, dtype=dtype).tobytes())
+
+    def column(self, sfid):
+        """Return card column, adding a new one for new cards."""
+        if sfid not in self.columns:
+            if len(self.columns) >= TIMESERIES_CARDS - 1:
+                return None
+            self.columns[sfid] = len(self.columns)
+            dataIO.save_json(self.meta_path, {"columns": self.columns})
+        return self.columns[sfid]
+
+    def append(self, timestamp, decks):
+        """Append snapshot. Snapshots already stored are skipped.
+
+        Return True if appended.
+        """
+        hour = int(timestamp.replace(minute=0, second=0, microsecond=0,
+                                     tzinfo=dt.timezone.utc).timestamp())
+        with self.lock:
+            if hour in self.hours:
+                return False
+            usage = np.zeros(TIMESERIES_CARDS, dtype=np.uint16)
+            ranks = np.full(TIMESERIES_RANKS, -1, dtype=np.int32)
+            new_decks = []
+            for rank, deck in enumerate(decks[:TIMESERIES_RANKS]):
+                deck = clean_deck(deck)
+                if deck is None:
+                    continue
+                cards = [self.column(card["key"]) for card in deck]
+                cards = sorted(set(c for c in cards if c is not None))
+                usage[cards] += 1
+                key = tuple((cards + [255] * 8)[:8])
+                if key not in self.deck_ids:
+                    self.deck_ids[key] = len(self.deck_ids)
+                    new_decks.append(key)
+                ranks[rank] = self.deck_ids[key]
+            try:
+                if new_decks:
+                    self.write("decks", new_decks)
+                self.write("card_usage", [usage])
+                self.write("deck_ids", [ranks])
+                # hours are written last so that repair() can drop a partial append
+                self.write("hours", [hour])
+            except Exception:
+                self.load()
+                raise
+            self.hours.add(hour)
+            return True
+
+    def card_usage(self, sfids, since):
+        """Return hours and usage of cards since datetime.
 
-def jaccard_similarity(x, y):
-    intersection_cardinality = len(set.intersection(*[set(x), set(y)]))
-    union_cardinality = len(set.union(*[set(x), set(y)]))
-    return intersection_cardinality / float(union_cardinality)
+        Return (hours, usage) where hours is a sorted array of epoch seconds
+        and usage is a (hours x cards) array of decks using each card.
+        """
+        hours = self.array("hours")
+        usage = self.array("card_usage")[:len(hours)]
+        since = int(since.replace(tzinfo=dt.timezone.utc).timestamp())
+        rows = np.flatnonzero(hours >= since)
+        rows = rows[np.argsort(hours[rows])]
+        columns = [self.columns.get(sfid) for sfid in sfids]
+        out = np.zeros((len(rows), len(sfids)), dtype=np.int64)
+        for i, column in enumerate(columns):
+            if column is not None:
+                out[:, i] = usage[rows, column]
+        return np.asarray(hours[rows]), out
+
+    def daily_usage(self, sfids, days):
+        """Return list of (date, average decks per hour for each card)."""
+        since = dt.datetime.utcnow() - dt.timedelta(days=days)
+        hours, usage = self.card_usage(sfids, since)
+        if not len(hours):
+            return []
+        day_index = hours // 86400
+        out = []
+        for day in np.unique(day_index):
+            rows = day_index == day
+            date = dt.datetime.utcfromtimestamp(int(day) * 86400).date()
+            out.append((date, usage[rows].mean(axis=0).tolist()))
+        return out
 
 
 class BarChart:
@@ -136,134 +637,6 @@ class BarChart:
         return out
 
 
-class BotEmoji:
-    """Emojis available in bot."""
-    def __init__(self, bot):
-        self.bot = bot
-
-    def name(self, name):
-        """Emoji by name."""
-        for server in self.bot.servers:
-            for emoji in server.emojis:
-                if emoji.name == name:
-                    return '<:{}:{}>'.format(emoji.name, emoji.id)
-        return ''
-
-    def key(self, key):
-        """Chest emojis by api key name or key.
-
-        name is used by this cog.
-        key is values returned by the api.
-        Use key only if name is not set
-        """
-        if key in self.map:
-            name = self.map[key]
-            return self.name(name)
-        return ''
-
-
-class ClashRoyale:
-    """Clash Royale Data."""
-    instance = None
-
-    class __ClashRoyale:
-        """Singleton."""
-
-        def __init__(self, *args, **kwargs):
-            """Init."""
-            self.data = dataIO.load_json(CLASH_ROYALE_JSON)
-
-    def __init__(self, *args, **kwargs):
-        """Init."""
-        if not ClashRoyale.instance:
-            ClashRoyale.instance = ClashRoyale.__ClashRoyale(*args, **kwargs)
-        else:
-            pass
-
-    def __getattr__(self, name):
-        return getattr(self.instance, name)
-
-    def card_elixir(self, card):
-        """"Elixir of a card."""
-        try:
-            return self.data["Cards"][card]["elixir"]
-        except KeyError:
-            return 0
-
-
-class Card():
-    """Clash Royale Card."""
-
-    def __init__(self, key=None, level=None):
-        """Init.
-
-        Params
-        + name (str). Key in the ClashRoyale.json
-        """
-        self.key = key
-        self.level = level
-
-    @property
-    def elixir(self):
-        """Elixir value."""
-        return ClashRoyale().card_elixir(self.key)
-
-    def emoji(self, be: BotEmoji):
-        """Emoji representation of the card."""
-        if self.key is None:
-            return ''
-        name = self.key.replace('-', '')
-        return be.name(name)
-
-
-class Deck():
-    """Clash Royale Deck.
-
-    Contains 8 cards.
-    """
-
-    def __init__(self, card_keys=None, card_levels=None, rank=0, usage=0):
-        """Init.
-
-        Params
-        + rank (int). Rank on the leaderboard.
-        + cards []. List of card ids (keys in ClashRoyale.json).
-        + card_levels []. List of card levels.
-        """
-        self.rank = rank
-        self.usage = usage
-        self.cards = [Card(key=key) for key in card_keys]
-        if card_levels is not None:
-            kl_zip = zip(card_keys, card_levels)
-            self.cards = [Card(key=k, level=l) for k, l in kl_zip]
-
-    @property
-    def avg_elixir(self):
-        """Average elixir of the deck."""
-        elixirs = [c.elixir for c in self.cards if c.elixir != 0]
-        return sum(elixirs) / len(elixirs)
-
-    @property
-    def avg_elixir_str(self):
-        """Average elixir with format."""
-        return 'Average Elixir: {:.3}'.format(self.avg_elixir)
-
-    def emoji_repr(self, be: BotEmoji, show_levels=False):
-        """Emoji representaion."""
-        out = []
-        for card in self.cards:
-            emoji = card.emoji(be)
-            level = card.level
-            level_str = ''
-            if show_levels and level is not None:
-                level_str = '`{:.<2}`'.format(level)
-            out.append('{}{}'.format(emoji, level_str))
-        return ''.join(out)
-
-    def __repr__(self):
-        return ' '.join([c.key for c in self.cards])
-
-
 class CRData:
     """Clash Royale Global 200 Decks."""
 
@@ -272,27 +645,53 @@ class CRData:
         self.bot = bot
         self.task = bot.loop.create_task(self.loop_task())
         self.settings = dataIO.load_json(SETTINGS_JSON)
-        self.clashroyale = dataIO.load_json(CLASHROYALE_JSON)
 
         if elasticsearch_available:
             self.es = Elasticsearch()
 
-        # init card data
-        self.cards = []
-        self.cards_abbrev = {}
+        # deck table columns and elixir by Starfire ID, built on first use
+        self._card_columns = None
+        self._card_elixirs = None
+
+        self.catalog = SnapshotCatalog()
+        self.timeseries = TimeSeriesStore()
+
+        # deck table of last known data
+        self.deck_table = None
+        self.deck_table_path = None
 
-        for card_key, card_value in self.clashroyale["Cards"].items():
-            self.cards.append(card_key)
-            self.cards_abbrev[card_key] = card_key
+        # unique decks of all snapshots, loaded on first use
+        self.deck_archive = None
+        self.deck_archive_lock = asyncio.Lock()
+        self.catalog_lock = asyncio.Lock()
 
-            if card_key.find('-'):
-                self.cards_abbrev[card_key.replace('-', '')] = card_key
+    async def on_command_error(self, error, ctx):
+        """Tell the user when a command needs the card catalog."""
+        if isinstance(error, CatalogMissing) and ctx.command.instance is self:
+            await self.bot.send_message(ctx.message.channel, str(error))
 
-            aka_list = card_value["aka"]
-            for aka in aka_list:
-                self.cards_abbrev[aka] = card_key
-                if aka.find('-'):
-                    self.cards_abbrev[aka.replace('-', '')] = card_key
+    @property
+    def card_columns(self):
+        """Deck table column of each card by Starfire ID.
+
+        Columns are card ordinals in the catalog.
+        """
+        if self._card_columns is None:
+            catalog = card_catalog(self.bot)
+            self._card_columns = {
+                catalog.key_to_sfid(key): catalog.ordinal(key)
+                for key in catalog.keys}
+        return self._card_columns
+
+    @property
+    def card_elixirs(self):
+        """Elixir of each card by Starfire ID."""
+        if self._card_elixirs is None:
+            catalog = card_catalog(self.bot)
+            self._card_elixirs = {
+                catalog.key_to_sfid(key): catalog.elixir(key)
+                for key in catalog.keys}
+        return self._card_elixirs
 
     def __unload(self):
         self.task.cancel()
@@ -300,6 +699,7 @@ class CRData:
     async def loop_task(self):
         """Loop task: update data daily."""
         await self.bot.wait_until_ready()
+        await self.ensure_catalog()
         await self.update_data()
         if elasticsearch_available:
             await self.eslog_update_data()
@@ -307,6 +707,18 @@ class CRData:
         if self is self.bot.get_cog('CRData'):
             self.task = self.bot.loop.create_task(self.loop_task())
 
+    async def ensure_catalog(self):
+        """Build snapshot catalog in an executor if there is no manifest yet.
+
+        Async callers use this before catalog lookups so that the first
+        scan of the data files does not block the event loop.
+        """
+        if self.catalog.loaded:
+            return
+        async with self.catalog_lock:
+            if not self.catalog.loaded:
+                await self.bot.loop.run_in_executor(None, self.catalog.rebuild)
+
     @commands.group(pass_context=True, no_pm=True)
     @checks.serverowner_or_permissions(manage_server=True)
     async def crdataset(self, ctx: Context):
@@ -359,15 +771,64 @@ class CRData:
     @crdataset.command(name="lastdata", pass_context=True)
     async def crdataset_lastdata(self, ctx):
         """Return last known data filename."""
-        time = dt.datetime.utcnow()
-        file = time.strftime(CARDPOP_FILE)
-        path = os.path.join(PATH, file)
-        while not os.path.exists(path):
-            time = time - dt.timedelta(hours=1)
-            file = time.strftime(CARDPOP_FILE)
-            path = os.path.join(PATH, file)
+        await self.ensure_catalog()
+        if self.catalog.latest is None:
+            await self.bot.say("No data found.")
+            return
+        path = os.path.join(PATH, self.catalog.latest)
         await self.bot.say("Last known data path: {}".format(path))
 
+    @crdataset.command(name="catalog", pass_context=True)
+    async def crdataset_catalog(self, ctx, rebuild: bool=False):
+        """Show snapshot catalog. Rebuild from data files if requested.
+
+        !crdataset catalog true
+        """
+        if rebuild:
+            await self.bot.type()
+            async with self.catalog_lock:
+                await self.bot.loop.run_in_executor(None, self.catalog.rebuild)
+        await self.ensure_catalog()
+        out = [
+            "Snapshots: {:,}".format(len(self.catalog.snapshots)),
+            "Valid: {:,}".format(len(self.catalog.valid_files())),
+            "Invalid: {:,}".format(len(self.catalog.invalid_files())),
+            "Latest valid: {}".format(self.catalog.latest),
+            "Cached: {} / {}".format(len(self.catalog.cache), self.catalog.cache_size),
+        ]
+        await self.bot.say(box("\n".join(out)))
+
+    @crdataset.command(name="backfill", pass_context=True)
+    async def crdataset_backfill(self, ctx):
+        """Import saved hourly data into the time series store.
+
+        Hours already in the store are skipped.
+        """
+        await self.bot.type()
+        async with self.catalog_lock:
+            count = await self.bot.loop.run_in_executor(None, self.backfill_timeseries)
+        await self.bot.say(
+            "Imported {:,} snapshots. Time series has {:,} hours.".format(
+                count, len(self.timeseries)))
+
+    def backfill_timeseries(self):
+        """Append all valid snapshot files to the time series store.
+
+        Blocking. Run in an executor while holding catalog_lock.
+        Return number of snapshots imported.
+        """
+        self.catalog.ensure()
+        count = 0
+        for file in self.catalog.valid_files():
+            timestamp = dt.datetime.strptime(file, CARDPOP_FILE)
+            hour = int(timestamp.replace(tzinfo=dt.timezone.utc).timestamp())
+            if hour in self.timeseries.hours:
+                continue
+            data = dataIO.load_json(os.path.join(PATH, file))
+            if self.timeseries.append(timestamp, data.get("decks", [])):
+                count += 1
+        return count
+
     @crdataset.command(name="cleandata", pass_context=True)
     async def crdataset_cleandata(self, ctx):
         """Remove all bad data files.
@@ -376,17 +837,14 @@ class CRData:
         Some files were saved when no data can be found.
         This command removes all data json files that are invalid.
         """
-        prog = re.compile('cardpop-\d{4}-\d{2}-\d{2}-\d{2}.json')
-        for root, dirs, files in os.walk(PATH):
-            for file in files:
-                result = prog.match(file)
-                if result is not None:
-                    path = os.path.join(PATH, file)
-                    data = dataIO.load_json(path)
-                    if "decks" not in data:
-                        os.remove(path)
-                        await self.bot.say(
-                            "Removed invalid JSON: {}".format(path))
+        await self.ensure_catalog()
+        for file in self.catalog.invalid_files():
+            path = os.path.join(PATH, file)
+            if os.path.exists(path):
+                os.remove(path)
+            self.catalog.remove(file)
+            await self.bot.say(
+                "Removed invalid JSON: {}".format(path))
 
     @crdataset.command(name="elasticsearch", pass_context=True)
     async def crdataset_elasticsearch(self, ctx, enable:bool):
@@ -409,6 +867,7 @@ class CRData:
 
     async def update_data(self, forceupdate=False):
         """Update data and return data."""
+        await self.ensure_catalog()
         now = dt.datetime.utcnow()
         now_file = now.strftime(CARDPOP_FILE)
         now_path = os.path.join(PATH, now_file)
@@ -431,6 +890,13 @@ class CRData:
                         data = None
         if data is not None:
             dataIO.save_json(now_path, data)
+            async with self.catalog_lock:
+                self.catalog.add(now_file, data)
+            if "decks" in data:
+                # built on first search when the CRCards cog is not loaded yet
+                if card_catalog(self.bot) is not None:
+                    self.set_deck_table(now_path, data)
+                self.timeseries.append(now, data["decks"])
 
             if self.elasticsearch_enabled:
                 self.eslog(data)
@@ -439,6 +905,7 @@ class CRData:
 
     async def get_now_data(self):
         """Return data at this hour."""
+        await self.ensure_catalog()
         now = dt.datetime.utcnow()
         data = self.get_data(now)
         if data is None:
@@ -446,35 +913,114 @@ class CRData:
         return data
 
     def get_last_data(self):
-        """Find and return last known data."""
-        time = dt.datetime.utcnow()
-        data = None
-        while data is None:
-            data = self.get_data(time)
-            time = time - dt.timedelta(hours=1)
-        return data
+        """Return last known data, or None if there is none."""
+        return self.catalog.load_latest()
 
     def get_data(self, datetime_):
         """Get data as json by date and hour."""
-        file = datetime_.strftime(CARDPOP_FILE)
-        path = os.path.join(PATH, file)
-        data = None
-        if os.path.exists(path):
+        return self.catalog.load(datetime_.strftime(CARDPOP_FILE))
+
+    def set_deck_table(self, path, data):
+        """Build deck table from data saved at path."""
+        self.deck_table = DeckTable(data["decks"], self.card_columns, self.card_elixirs)
+        self.deck_table_path = path
+        return self.deck_table
+
+    def update_deck_archive(self):
+        """Add snapshots not yet in the deck archive.
+
+        Blocking. Run in an executor while holding catalog_lock.
+        """
+        if self.deck_archive is None:
+            self.deck_archive = DeckArchive(self.card_columns)
+        self.catalog.ensure()
+        for file in self.catalog.valid_files():
+            path = os.path.join(PATH, file)
+            if path in self.deck_archive.paths:
+                continue
             data = dataIO.load_json(path)
-            if "decks" not in data:
-                data = None
-        return data
+            timestamp = dt.datetime.strptime(file, CARDPOP_FILE)
+            self.deck_archive.add(path, data.get("decks", []), timestamp)
+        self.deck_archive.commit()
+
+    async def get_deck_archive(self):
+        """Return deck archive updated with new snapshots."""
+        async with self.deck_archive_lock, self.catalog_lock:
+            await self.bot.loop.run_in_executor(None, self.update_deck_archive)
+        return self.deck_archive
+
+    def card_vector(self, card_ids):
+        """Return boolean card vector of deck table columns."""
+        query = np.zeros(len(self.card_columns), dtype=bool)
+        for card_id in card_ids:
+            sfid = self.id_to_sfid(card_id)
+            if sfid in self.card_columns:
+                query[self.card_columns[sfid]] = True
+        return query
+
+    async def similar_decks(self, card_ids, k=SIMILAR_MAX, archive=False):
+        """Return decks most similar to card_ids.
+
+        Search the last known data, or all saved snapshots if archive is True.
+        Return list of dicts with
+        + deck: list of card ids.
+        + similarity: Jaccard similarity.
+        + description: where the deck was seen.
+        """
+        await self.ensure_catalog()
+        query = self.card_vector(card_ids)
+        results = []
+        if archive:
+            deck_archive = await self.get_deck_archive()
+            for row, similarity in deck_archive.similar(query, k=k):
+                results.append({
+                    "deck": [self.sfid_to_id(c["key"]) for c in deck_archive.decks[row]],
+                    "similarity": similarity,
+                    "description": "Seen {} times, last on {:%Y-%m-%d %H:00} UTC".format(
+                        deck_archive.counts[row], deck_archive.last_seen[row])
+                })
+        else:
+            table = self.get_last_deck_table()
+            if table is None:
+                return results
+            for row, similarity in table.similar(query, k=k):
+                result = table.result(row)
+                results.append({
+                    "deck": [self.sfid_to_id(c["key"]) for c in result["deck"]],
+                    "similarity": similarity,
+                    "description": "Rank {}".format(", ".join(result["ranks"]))
+                })
+        return results
+
+    def get_last_deck_table(self):
+        """Return deck table of last known data, or None if there is none.
+
+        Data is only loaded when the catalog has a newer snapshot.
+        """
+        data = self.get_last_data()
+        if data is None:
+            return None
+        path = os.path.join(PATH, self.catalog.latest)
+        if path == self.deck_table_path:
+            return self.deck_table
+        return self.set_deck_table(path, data)
 
     @commands.group(pass_context=True, no_pm=True)
+    @catalog_required()
     async def crdata(self, ctx: Context):
         """Clash Royale Global 200 data."""
+        await self.ensure_catalog()
         if ctx.invoked_subcommand is None:
             await send_cmd_help(ctx)
 
     @crdata.command(name="decks", pass_context=True, no_pm=True)
     async def crdata_decks(self, ctx: Context):
         """List popular decks."""
+        await self.ensure_catalog()
         data = self.get_last_data()
+        if data is None:
+            await self.bot.say("No data available.")
+            return
         decks = data["popularDecks"]
         await self.bot.say(
             "**Top 200 Decks**: Found {} results.".format(len(decks)))
@@ -501,7 +1047,11 @@ class CRData:
     async def crdata_cards(self, ctx: Context):
         """List popular cards."""
         await self.bot.send_typing(ctx.message.channel)
+        await self.ensure_catalog()
         data = self.get_last_data()
+        if data is None:
+            await self.bot.say("No data available.")
+            return
         cards = data["popularCards"]
         await self.bot.say(
             "**Popular Cards** from Top 200 decks.")
@@ -516,7 +1066,11 @@ class CRData:
     async def crdata_leaderboard(self, ctx: Context):
         """List decks sorted by rank."""
         await self.bot.say("**Global 200 Leaderboard Decks**")
+        await self.ensure_catalog()
         data = self.get_last_data()
+        if data is None:
+            await self.bot.say("No data available.")
+            return
         decks = data["decks"]
         for i, deck in enumerate(decks):
             cards = [self.sfid_to_id(card["key"]) for card in deck]
@@ -541,11 +1095,64 @@ class CRData:
             if not show_next:
                 return
 
+    @crdata.command(name="trend", pass_context=True, no_pm=True)
+    async def crdata_trend(self, ctx, *args):
+        """Card usage trend on the Global 200.
+
+        Average number of decks using each card per hour, by day.
+
+        Optional arguments:
+        --days DAYS    Number of days to look back. Default: 30
+
+        Example: Hog Rider and Log usage over the past 30 days
+        !crdata trend hog log --days 30
+        """
+        parser = argparse.ArgumentParser(prog='[p]crdata trend')
+        parser.add_argument('cards', nargs='+', help='Cards')
+        parser.add_argument('--days', type=int, default=30, help='Number of days')
+
+        try:
+            p_args = parser.parse_args(args)
+        except SystemExit:
+            await send_cmd_help(ctx)
+            return
+
+        invalid_cards = self.get_invalid_cards(p_args.cards)
+        if len(invalid_cards) > 0:
+            await self.bot.say(
+                'Invalid card names: {}'.format(', '.join(invalid_cards)))
+            await self.bot.say(
+                'Type `!crdata cardnames` to see a list of valid input.')
+            return
+
+        cards = self.normalize_deck_data(p_args.cards)
+        sfids = [self.id_to_sfid(c) for c in cards]
+        days = self.timeseries.daily_usage(sfids, p_args.days)
+        if not days:
+            await self.bot.say("No data found for the past {} days.".format(p_args.days))
+            return
+
+        names = [self.id_to_name(c) for c in cards]
+        width = max(8, *[len(n) for n in names])
+        out = ['Decks using card per hour - last {} days'.format(p_args.days)]
+        out.append('{:<10} '.format('Date') + ' '.join('{:>{}}'.format(n, width) for n in names))
+        for date, usage in days:
+            out.append('{:<10} '.format(date.isoformat()) + ' '.join(
+                '{:>{}.1f}'.format(u, width) for u in usage))
+        changes = [last - first for first, last in zip(days[0][1], days[-1][1])]
+        out.append('{:<10} '.format('Change') + ' '.join(
+            '{:>+{}.1f}'.format(c, width) for c in changes))
+
+        for page in pagify('\n'.join(out), shorten_by=24):
+            await self.bot.say(box(page))
+        await self.bot.say(SF_CREDITS)
+
     @crdata.command(name="cardnames", pass_context=True, no_pm=True)
     async def crdata_cardnames(self, ctx):
         """Display valid card names and abbreviations."""
         out = []
-        for card_key, card_value in self.clashroyale["Cards"].items():
+        for card_value in card_catalog(self.bot).cards:
+            card_key = card_value["key"]
             names = [card_key]
             name = string.capwords(card_key.replace('-', ' '))
             for abbrev in card_value["aka"]:
@@ -586,6 +1193,7 @@ class CRData:
 
     async def search(self, ctx, *cards):
         """Perform the search and return found decks."""
+        await self.ensure_catalog()
         elixir_p = re.compile('elixir=([\d\.]*)-([\d\.]*)')
 
         elixir_min = 0
@@ -620,70 +1228,16 @@ class CRData:
         exclude_cards = self.normalize_deck_data(exclude_cards)
         exclude_sfids = [self.id_to_sfid(c) for c in exclude_cards]
 
-        data = self.get_last_data()
-        decks = data["decks"]
-
-        # sort card in decks
-        sorted_decks = []
-        for deck in decks:
-            # when data is not clean, "key" may be missing
-            # if this is the case, fix it
-            clean_deck = []
-
-            # data not clean = deck is None
-            if deck is not None:
-                for card in deck.copy():
-                    if not "key" in card:
-                        card["key"] = "soon"
-                        card["level"] = 13
-                    clean_deck.append(card)
-                deck = clean_deck
-
-                # for unknown reasons deck could sometimes be None in data src
-                if deck is not None:
-                    sorted_decks.append(
-                        sorted(
-                            deck.copy(),
-                            key=lambda x: x["key"]))
-        decks = sorted_decks
-
-        found_decks = []
-        unique_decks = []
-
-        # debug: to show uniques or not
-        unique_only = False
-
-        for rank, deck in enumerate(decks):
-            # in unknown instances, starfi.re returns empty rows
-            if deck is not None:
-                deck_cards = [card["key"] for card in deck]
-                deck_elixir = self.deck_elixir_by_sfid(deck_cards)
-                if set(include_sfids) <= set(deck_cards):
-                    include_deck = True
-                    if len(exclude_sfids):
-                        for sfid in exclude_sfids:
-                            if sfid in deck_cards:
-                                include_deck = False
-                                break
-                    if not elixir_min <= deck_elixir <= elixir_max:
-                        include_deck = False
-                    if include_deck:
-                        found_deck = {
-                            "deck": deck,
-                            "cards": set([c["key"] for c in deck]),
-                            "count": 1,
-                            "ranks": [str(rank + 1)]
-                        }
-                        if found_deck["cards"] in unique_decks:
-                            found_deck["count"] += 1
-                            found_deck["ranks"].append(str(rank + 1))
-                            if not unique_only:
-                                unique_decks.append(found_deck["cards"])
-                        else:
-                            found_decks.append(found_deck)
-                            unique_decks.append(found_deck["cards"])
-
-        return found_decks
+        table = self.get_last_deck_table()
+        if table is None:
+            await self.bot.say("No data found.")
+            return []
+        rows = table.search(
+            include=include_sfids,
+            exclude=exclude_sfids,
+            elixir_min=elixir_min,
+            elixir_max=elixir_max)
+        return [table.result(row) for row in rows]
 
     async def search_results(self, ctx, found_decks):
         """Show search results."""
@@ -716,6 +1270,25 @@ class CRData:
             if not show_next:
                 return
 
+    def similar_query_deck(self, cards):
+        """Return card ids and name of deck entered for similarity search.
+
+        cards is either a leaderboard rank or 8 cards.
+        Return None if input is invalid.
+        """
+        if len(cards) == 1 and cards[0].isdigit():
+            table = self.get_last_deck_table()
+            if table is None:
+                return None
+            row = table.row_by_rank(int(cards[0]))
+            if row is None:
+                return None
+            deck = [self.sfid_to_id(card["key"]) for card in table.decks[row]]
+            return deck, "Rank {}".format(cards[0]), "Top 200 Decks"
+        if len(cards) == 8 and not self.get_invalid_cards(cards):
+            return self.normalize_deck_data(cards), "User Deck", "Similarity Search"
+        return None
+
     @crdata.command(name="similar", pass_context=True)
     async def crdata_similar(self, ctx, *cards):
         """Find similar decks with specific deck or rank on leaderboard.
@@ -725,38 +1298,25 @@ class CRData:
 
         Find decks similar to what is entered:
         !crdata similar hog log barrel gg skarmy princess it knight
+
+        Add --archive to search all saved snapshots instead of the last one:
+        !crdata similar 2 --archive
         """
-        is_rank = len(cards) == 1 and cards[0].isdigit()
-        is_card = len(cards) == 8
-        if not is_rank and not is_card:
+        archive = '--archive' in cards
+        cards = [c for c in cards if c != '--archive']
+        query = self.similar_query_deck(cards)
+        if query is None:
             await send_cmd_help(ctx)
             return
-
-        data = self.get_last_data()
-        decks = data["decks"]
-
-        # sort card in decks
-        # extract card keys as list
-        sorted_decks = []
-        for deck in decks:
-            d = sorted(deck.copy(), key=lambda x: x["key"])
-            d = [self.sfid_to_id(card["key"]) for card in d]
-            sorted_decks.append(d)
-        decks = sorted_decks
-
-        if is_rank:
-            deck_name = "Rank {}".format(cards[0])
-            deck_author = "Top 200 Decks"
-            deck = decks[int(cards[0]) - 1]
-        else:
-            deck_name = "User Deck"
-            deck_author = "Similarity Search"
-            cards = self.normalize_deck_data(cards)
-            deck = [c for c in cards]
+        deck, deck_name, deck_author = query
 
         # Entered deck
-        await self.bot.say(
-            "Listing decks from Global 200 that is most similar to:")
+        if archive:
+            await self.bot.say(
+                "Listing decks from all saved Global 200 data that are most similar to:")
+        else:
+            await self.bot.say(
+                "Listing decks from Global 200 that is most similar to:")
         await self.show_result_row(
             ctx,
             deck,
@@ -765,28 +1325,10 @@ class CRData:
             deck_name=deck_name,
             author=deck_author)
 
-        # Similarity search
-        results = []
-        uniques = []
-        for candidate in decks:
-            similarity = jaccard_similarity(deck, candidate)
-            if similarity != 1.0:
-                result = {
-                    "deck": candidate,
-                    "similarity": similarity
-                }
-                if candidate not in uniques:
-                    uniques.append(candidate)
-                    results.append(result)
-
-        # Sort by similarity
-        results = sorted(results, key=lambda x: -x["similarity"])
-
-        # Remove same deck (similarity = 1)
-        results = [r for r in results if r["similarity"] != 1.0]
+        await self.bot.type()
+        results = await self.similar_decks(deck, archive=archive)
 
         # Output
-
         for i, data in enumerate(results):
             deck = data["deck"]
             desc = "Similarity: {:.3f}".format(data["similarity"])
@@ -798,7 +1340,7 @@ class CRData:
                 len(results),
                 deck_name=desc,
                 author="Top 200 Decks",
-                description=desc)
+                description="{} ({})".format(desc, data["description"]))
 
             if not show_next:
                 return
@@ -849,16 +1391,14 @@ class CRData:
 
     def sfid_to_id(self, sfid: str):
         """Convert Starfire ID to Card ID."""
+        key = card_catalog(self.bot).sfid_to_key(sfid)
+        if key is not None:
+            return key
         if sfid == 'x_bow':
             return 'xbow'
         if sfid == 'x-bow':
             return 'xbow'
         return sfid.replace('_', '-')
-        # cards = self.clashroyale["Cards"]
-        # for card_key, card_data in cards.items():
-        #     if card_data.get('sfid') == sfid:
-        #         return card_key
-        # return None
 
     def sfid_to_name(self, sfid: str):
         """Convert Starfire ID to Name."""
@@ -876,19 +1416,16 @@ class CRData:
 
     def id_to_sfid(self, id: str):
         """Convert Card ID to Starfire ID."""
-        cards = self.clashroyale["Cards"]
-        return cards[id]["sfid"]
+        return card_catalog(self.bot).key_to_sfid(id) or id.replace('-', '_')
 
     def normalize_deck_data(self, cards):
         """Return a deck list with normalized names."""
         deck = [c.lower() if c is not None else '' for c in cards]
 
         # replace abbreviations
+        catalog = card_catalog(self.bot)
         for i, card in enumerate(deck):
-            if card in self.cards_abbrev.keys():
-                deck[i] = self.cards_abbrev[card]
-            else:
-                deck[i] = None
+            deck[i] = catalog.resolve(card)
 
         return deck
 
@@ -898,14 +1435,14 @@ class CRData:
         Return list of cards which are invalid.
         """
         deck = [c.lower() if c is not None else '' for c in cards]
-        invalid_cards = [c for c in deck if c not in self.cards_abbrev.keys()]
+        catalog = card_catalog(self.bot)
+        invalid_cards = [c for c in deck if catalog.resolve(c) is None]
         return invalid_cards
 
     def deck_elixir_by_sfid(self, deck):
         """Return average elixir for a list of sfids."""
-        cards_data = self.clashroyale["Cards"]
-        cards = [self.sfid_to_id(c) for c in deck]
-        elixirs = [cards_data[key]["elixir"] for key in cards]
+        catalog = card_catalog(self.bot)
+        elixirs = [catalog.elixir(self.sfid_to_id(c)) for c in deck]
         # count 1 less card if mirror
         total = 0
         for elixir in elixirs:
@@ -30,10 +30,10 @@ import discord
 from __main__ import send_cmd_help
 from discord.ext import commands
 
-from cogs.utils.dataIO import dataIO
+from cogs.crcards import CatalogMissing, card_catalog, catalog_required
+from cogs.serverindex import emoji_str
 
 PATH = os.path.join("data", "crdatae")
-CLASH_ROYALE_JSON = os.path.join(PATH, "clashroyale.json")
 
 
 def grouper(n, iterable, fillvalue=None):
@@ -58,11 +58,7 @@ class BotEmoji:
 
     def name(self, name):
         """Emoji by name."""
-        for server in self.bot.servers:
-            for emoji in server.emojis:
-                if emoji.name == name:
-                    return '<:{}:{}>'.format(emoji.name, emoji.id)
-        return ''
+        return emoji_str(self.bot, name)
 
     def key(self, key):
         """Chest emojis by api key name or key.
@@ -77,50 +73,19 @@ class BotEmoji:
         return ''
 
 
-class ClashRoyale:
-    """Clash Royale Data."""
-    instance = None
-
-    class __ClashRoyale:
-        """Singleton."""
-        def __init__(self, *args, **kwargs):
-            """Init."""
-            self.data = dataIO.load_json(CLASH_ROYALE_JSON)
-
-    def __init__(self, *args, **kwargs):
-        """Init."""
-        if not ClashRoyale.instance:
-            ClashRoyale.instance = ClashRoyale.__ClashRoyale(*args, **kwargs)
-        else:
-            pass
-
-    def __getattr__(self, name):
-        return getattr(self.instance, name)
-
-    def card_elixir(self, card):
-        """"Elixir of a card."""
-        try:
-            return self.data["Cards"][card]["elixir"]
-        except KeyError:
-            return 0
-
-
 class Card():
     """Clash Royale Card."""
 
-    def __init__(self, key=None, level=None):
+    def __init__(self, key=None, level=None, elixir=0):
         """Init.
 
         Params
-        + name (str). Key in the ClashRoyale.json
+        + key (str). Card key in the card catalog
+        + elixir (int). Elixir value
         """
         self.key = key
         self.level = level
-
-    @property
-    def elixir(self):
-        """Elixir value."""
-        return ClashRoyale().card_elixir(self.key)
+        self.elixir = elixir
 
     def emoji(self, be: BotEmoji):
         """Emoji representation of the card."""
@@ -136,20 +101,22 @@ class Deck():
     Contains 8 cards.
     """
 
-    def __init__(self, card_keys=None, card_levels=None, rank=0, usage=0):
+    def __init__(self, card_keys=None, card_levels=None, rank=0, usage=0, catalog=None):
         """Init.
 
         Params
         + rank (int). Rank on the leaderboard.
-        + cards []. List of card ids (keys in ClashRoyale.json).
+        + cards []. List of card ids (keys in the card catalog).
         + card_levels []. List of card levels.
+        + catalog (CardCatalog). Card catalog for elixir values.
         """
         self.rank = rank
         self.usage = usage
-        self.cards = [Card(key=key) for key in card_keys]
-        if card_levels is not None:
-            kl_zip = zip(card_keys, card_levels)
-            self.cards = [Card(key=k, level=l) for k, l in kl_zip]
+        if card_levels is None:
+            card_levels = [None] * len(card_keys)
+        self.cards = [
+            Card(key=k, level=l, elixir=catalog.elixir(k) if catalog else 0)
+            for k, l in zip(card_keys, card_levels)]
 
     @property
     def avg_elixir(self):
@@ -195,10 +162,15 @@ class CRDataEnhanced:
         """Init."""
         self.bot = bot
         self.be = BotEmoji(bot)
-        self.clashroyale = ClashRoyale().data
         self.per_page = 10
 
+    async def on_command_error(self, error, ctx):
+        """Tell the user when a command needs the card catalog."""
+        if isinstance(error, CatalogMissing) and ctx.command.instance is self:
+            await self.bot.send_message(ctx.message.channel, str(error))
+
     @commands.group(pass_context=True, no_pm=True)
+    @catalog_required()
     async def crdatae(self, ctx):
         """Clash Royale Real-Time Global 200 Leaderboard."""
         if ctx.invoked_subcommand is None:
@@ -212,8 +184,11 @@ class CRDataEnhanced:
             await self.bot.say(self.error_msg["requires_crdata"])
             return
 
+        await crdata.ensure_catalog()
         data = crdata.get_last_data()
-        # decks = data["decks"]
+        if data is None:
+            await self.bot.say("No data found.")
+            return
 
         decks = []
         for rank, deck in enumerate(data["decks"], 1):
@@ -221,7 +196,9 @@ class CRDataEnhanced:
             if deck is not None:
                 cards = [crdata.sfid_to_id(card["key"]) for card in deck]
                 levels = [card["level"] for card in deck]
-                decks.append(Deck(card_keys=cards, card_levels=levels, rank=rank))
+                decks.append(Deck(
+                    card_keys=cards, card_levels=levels, rank=rank,
+                    catalog=card_catalog(self.bot)))
 
         # embeds
         per_page = self.per_page
@@ -314,7 +291,9 @@ class CRDataEnhanced:
         decks = []
         for fd in found_decks:
             card_keys = [crdata.sfid_to_id(card["key"]) for card in fd["deck"]]
-            deck = Deck(card_keys=card_keys, rank=fd["ranks"][0], usage=fd["count"])
+            deck = Deck(
+                card_keys=card_keys, rank=fd["ranks"][0], usage=fd["count"],
+                catalog=card_catalog(self.bot))
             decks.append(deck)
 
         per_page = self.per_page
@@ -341,6 +320,71 @@ class CRDataEnhanced:
                     await self.bot.say("Search results aborted.")
                     break
 
+    @crdatae.command(name="similar", pass_context=True, no_pm=True)
+    async def crdatae_similar(self, ctx, *cards):
+        """Find similar decks.
+
+        1. Decks similar to the 2nd deck on Global 200
+        !crdatae similar 2
+
+        2. Decks similar to what is entered
+        !crdatae similar hog log barrel gg skarmy princess it knight
+
+        3. Search all saved snapshots instead of the last one
+        !crdatae similar 2 --archive
+        """
+        crdata = self.bot.get_cog('CRData')
+        if crdata is None:
+            await self.bot.say(self.error_msg["requires_crdata"])
+            return
+
+        archive = '--archive' in cards
+        cards = [c for c in cards if c != '--archive']
+        await crdata.ensure_catalog()
+        query = crdata.similar_query_deck(cards)
+        if query is None:
+            await send_cmd_help(ctx)
+            return
+        card_keys, deck_name, _ = query
+
+        await self.bot.type()
+        results = await crdata.similar_decks(card_keys, archive=archive)
+
+        catalog = card_catalog(self.bot)
+        similarities = []
+        decks = []
+        for result in results:
+            decks.append(Deck(card_keys=result["deck"], catalog=catalog))
+            similarities.append(
+                "Similarity: {:.3f} ({})".format(result["similarity"], result["description"]))
+
+        per_page = self.per_page
+        decks_group = list(grouper(per_page, decks))
+        color = random_discord_color()
+        query_deck = Deck(card_keys=card_keys, catalog=catalog)
+
+        for page, decks_page in enumerate(decks_group):
+            em = discord.Embed(
+                title="Clash Royale: Decks similar to {}".format(deck_name),
+                description=query_deck.emoji_repr(self.be),
+                color=color)
+            for deck_id, deck in enumerate(decks_page):
+                if deck is None:
+                    continue
+                result_number = per_page * page + deck_id
+                em.add_field(
+                    name="{}: {}".format(result_number + 1, similarities[result_number]),
+                    value='{}\n{}'.format(deck.emoji_repr(self.be), deck.avg_elixir_str))
+            em.set_footer(text="Data provided by http://starfi.re")
+
+            await self.bot.say(embed=em)
+
+            if page < len(decks_group) - 1:
+                show_next = await self.show_next_page(ctx)
+                if not show_next:
+                    await self.bot.say("Search results aborted.")
+                    break
+
     def embed_decks_search(self, decks, **kwargs):
         """Show embed decks.
 
@@ -390,12 +434,7 @@ class CRDataEnhanced:
 
     def card_elixir(self, card):
         """Return elixir of a card."""
-        elixir = 0
-        try:
-            elixir = self.clashroyale["Cards"][card]["elixir"]
-        except KeyError:
-            pass
-        return elixir
+        return card_catalog(self.bot).elixir(card)
 
 
 def setup(bot):
@@ -29,6 +29,7 @@ import datetime as dt
 import itertools
 import json
 import os
+import time
 from collections import defaultdict, OrderedDict
 from datetime import timedelta
 from random import choice
@@ -37,20 +38,41 @@ import aiohttp
 import discord
 import inflect
 import requests
+from cogs.serverindex import PlayerIndex, emoji_str
 from cogs.utils import checks
+from cogs.utils.chat_formatting import box
 from cogs.utils.dataIO import dataIO
 from discord.ext import commands
 
+try:
+    from cogs.httpclient import client_session
+except ImportError:
+    def client_session(bot):
+        """One-off session when the HTTPClient cog is not installed."""
+        return aiohttp.ClientSession()
+
 PATH = os.path.join("data", "crprofile")
 PATH_PLAYERS = os.path.join(PATH, "players")
 JSON = os.path.join(PATH, "settings.json")
 BADGES_JSON = os.path.join(PATH, "badges.json")
+
+# Kind of player snapshots in the SnapshotStore cog
+SNAPSHOT_KIND = "crprofile.player"
 CHESTS = dataIO.load_json(os.path.join('data', 'crprofile', 'chests.json'))
 
 DATA_UPDATE_INTERVAL = timedelta(minutes=30).seconds
 
 API_FETCH_TIMEOUT = 10
 
+# Seconds player data is served from memory without refetching
+PLAYER_CACHE_TTL = 60
+
+# Seconds stale player data is served while it is refreshed in the background
+PLAYER_CACHE_STALE_TTL = 300
+
+# Number of cached players before expired entries are pruned
+PLAYER_CACHE_MAX_ENTRIES = 1000
+
 BOTCOMMANDER_ROLES = ["Bot Commander"]
 
 CREDITS = 'Selfish + SML'
@@ -152,10 +174,7 @@ class BotEmoji:
 
     def name(self, name):
         """Emoji by name."""
-        for emoji in self.bot.get_all_emojis():
-            if emoji.name == name:
-                return '<:{}:{}>'.format(emoji.name, emoji.id)
-        return ''
+        return emoji_str(self.bot, name)
 
     def key(self, key):
         """Chest emojis by api key name or key.
@@ -585,20 +604,6 @@ class CRPlayerModel:
     def decklink(self):
         return self.data.get('deckLink', '')
 
-    def api_cardname_to_emoji(self, name, bot_emoji: BotEmoji):
-        """Convert api card id to card emoji."""
-        cr = dataIO.load_json(os.path.join(PATH, "clashroyale.json"))
-        cards = cr["Cards"]
-        result = None
-        for crid, o in cards.items():
-            if o["sfid"] == name:
-                result = crid
-                break
-        if result is None:
-            return None
-        result = result.replace('-', '')
-        return bot_emoji.name(result)
-
     """
     Seasons
     """
@@ -683,6 +688,104 @@ class CRPlayerModel:
         }
 
 
+class PlayerCache:
+    """In-memory TTL cache for player data.
+
+    - Entries younger than ttl are returned directly.
+    - Entries younger than stale_ttl are returned and refreshed in the background.
+    - Concurrent fetches for the same tag await the same future.
+    - When full, expired and then least recently used entries are evicted.
+    """
+
+    def __init__(self, loop, ttl=PLAYER_CACHE_TTL, stale_ttl=PLAYER_CACHE_STALE_TTL):
+        """Init."""
+        self.loop = loop
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'errors': 0,
+        }
+
+    async def get(self, tag, fetch):
+        """Return data for tag.
+
+        fetch: coroutine function returning CRPlayerModel.
+        """
+        entry = self.entries.get(tag)
+        if entry is not None:
+            timestamp, data = entry
+            self.entries.move_to_end(tag)
+            age = time.monotonic() - timestamp
+            if age < self.ttl:
+                self.stats['hits'] += 1
+                return data
+            if age < self.stale_ttl:
+                self.stats['stale_hits'] += 1
+                if tag not in self.inflight:
+                    self.start(tag, fetch).add_done_callback(self.background_done)
+                return data
+
+        future = self.inflight.get(tag)
+        if future is not None:
+            self.stats['coalesced'] += 1
+        else:
+            self.stats['misses'] += 1
+            future = self.start(tag, fetch)
+        return await asyncio.shield(future)
+
+    def start(self, tag, fetch):
+        """Start fetch for tag and register it as in flight."""
+        future = asyncio.ensure_future(self.run(tag, fetch), loop=self.loop)
+        self.inflight[tag] = future
+        return future
+
+    async def run(self, tag, fetch):
+        """Fetch and store data. Error responses are not cached."""
+        try:
+            data = await fetch()
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self.inflight.pop(tag, None)
+        if data.error:
+            self.stats['errors'] += 1
+        else:
+            self.entries.pop(tag, None)
+            self.prune()
+            self.entries[tag] = (time.monotonic(), data)
+        return data
+
+    def background_done(self, future):
+        """Retrieve exception of background refresh so it is not logged as unhandled."""
+        if not future.cancelled():
+            future.exception()
+
+    def prune(self):
+        """Make room for one entry when cache is full.
+
+        Remove expired entries, then least recently used ones.
+        """
+        if len(self.entries) < PLAYER_CACHE_MAX_ENTRIES:
+            return
+        now = time.monotonic()
+        expired = [tag for tag, (timestamp, data) in self.entries.items() if now - timestamp >= self.stale_ttl]
+        for tag in expired:
+            del self.entries[tag]
+        while len(self.entries) >= PLAYER_CACHE_MAX_ENTRIES:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+        self.entries = OrderedDict()
+
+
 class Settings:
     """Cog settings.
 
@@ -705,6 +808,9 @@ class Settings:
         self.filepath = filepath
         self.settings = nested_dict()
         self.settings.update(dataIO.load_json(filepath))
+        self.player_cache = PlayerCache(
+            bot.loop, ttl=self.player_cache_ttl, stale_ttl=self.player_cache_stale_ttl)
+        self.player_index = PlayerIndex(self.server_players)
 
     def init_server(self, server):
         """Initialized server settings.
@@ -712,23 +818,30 @@ class Settings:
         This will wipe all clan data and player data.
         """
         self.settings["servers"][server.id] = self.SERVER_DEFAULTS
+        self.player_index.clear()
         self.save()
 
     def init_players(self, server):
         """Initialized clan settings."""
         self.settings["servers"][server.id]["players"] = {}
+        self.player_index.clear(server.id)
         self.save()
 
     def check_server(self, server):
         """Make sure server exists in settings."""
         if server.id not in self.settings["servers"]:
             self.settings["servers"][server.id] = self.SERVER_DEFAULTS
+            self.player_index.clear()
         self.save()
 
     def get_players(self, server):
         """CR Players settings by server."""
         return self.settings["servers"][server.id]["players"]
 
+    def server_players(self, server_id):
+        """CR Players settings by server id, empty if not set."""
+        return self.settings["servers"].get(server_id, {}).get("players", {})
+
     def save(self):
         """Save data to disk."""
         dataIO.save_json(self.filepath, self.settings)
@@ -745,6 +858,7 @@ class Settings:
         players = self.settings["servers"][server.id]["players"]
         players[member.id] = tag
         self.settings["servers"][server.id]["players"] = players
+        self.player_index.set(server.id, member.id, tag)
         self.save()
 
     def rm_player_tag(self, server, member):
@@ -754,26 +868,27 @@ class Settings:
             self.settings["servers"][server.id]["players"].pop(member.id, None)
         except KeyError:
             pass
+        self.player_index.remove(server.id, member.id)
         self.save()
 
     def tag2member(self, server, tag):
         """Return Discord member from player tag."""
-        try:
-            players = self.settings["servers"][server.id]["players"]
-            for member_id, player_tag in players.items():
-                if player_tag == tag:
-                    return server.get_member(member_id)
-        except KeyError:
-            pass
-        return None
+        return self.player_index.member(server, tag)
 
     def server_settings(self, server):
         """Return server settings."""
         return self.settings["servers"][server.id]
 
     async def player_data(self, tag):
-        """Return CRPlayerModel by tag."""
+        """Return CRPlayerModel by tag.
+
+        Served from the in-memory player cache when possible.
+        """
         tag = SCTag(tag).tag
+        return await self.player_cache.get(tag, lambda: self.fetch_player_data(tag))
+
+    async def fetch_player_data(self, tag):
+        """Fetch CRPlayerModel by tag from API and save to disk."""
         url = API.player(tag)
 
         error = False
@@ -782,14 +897,19 @@ class Settings:
         headers = {"auth": self.auth}
 
         try:
-            async with aiohttp.ClientSession() as session:
+            scheduler = None
+            api = self.bot.get_cog('ClashRoyaleAPI')
+            if api is not None:
+                scheduler = await api.request_slot()
+            async with client_session(self.bot) as session:
                 async with session.get(url, timeout=API_FETCH_TIMEOUT, headers=headers) as resp:
+                    if scheduler is not None:
+                        scheduler.report(resp.status, resp.headers)
                     if resp.status != 200:
                         error = True
                     else:
                         data = await resp.json()
-                        file_path = self.cached_filepath(tag)
-                        dataIO.save_json(file_path, data)
+                        self.save_cache(tag, data)
         except json.decoder.JSONDecodeError:
             raise
         except asyncio.TimeoutError:
@@ -797,20 +917,50 @@ class Settings:
 
         return CRPlayerModel(data=data, error=error)
 
-    def cached_player_data(self, tag):
-        """Return cached data by tag."""
+    @property
+    def store(self):
+        """SnapshotStore cog, or None if not loaded."""
+        return self.bot.get_cog('SnapshotStore')
+
+    def save_cache(self, tag, data):
+        """Save player data as cache.
+
+        Use the SnapshotStore cog if loaded, otherwise one JSON file per tag.
+        """
+        store = self.store
+        if store is not None:
+            store.put(SNAPSHOT_KIND, tag, data)
+        else:
+            dataIO.save_json(self.cached_filepath(tag), data)
+
+    def cached_snapshot(self, tag):
+        """Return cached (data, UTC timestamp) by tag, or None."""
+        tag = SCTag(tag).tag
+        store = self.store
+        if store is not None:
+            snapshot = store.get(SNAPSHOT_KIND, tag)
+            if snapshot is not None:
+                return snapshot.data, snapshot.timestamp
         file_path = self.cached_filepath(tag)
         if not os.path.exists(file_path):
             return None
         data = dataIO.load_json(file_path)
+        timestamp = dt.datetime.utcfromtimestamp(os.path.getmtime(file_path))
+        return data, timestamp
+
+    def cached_player_data(self, tag):
+        """Return cached data by tag."""
+        cached = self.cached_snapshot(tag)
+        if cached is None:
+            return None
+        data, timestamp = cached
         return CRPlayerModel(is_cache=True, data=data)
 
     def cached_player_data_timestamp(self, tag):
         """Return timestamp in days-since format of cached data."""
-        file_path = self.cached_filepath(tag)
-        timestamp = dt.datetime.fromtimestamp(os.path.getmtime(file_path))
+        data, timestamp = self.cached_snapshot(tag)
 
-        passed = dt.datetime.now() - timestamp
+        passed = dt.datetime.utcnow() - timestamp
 
         days = passed.days
         hours, remainder = divmod(passed.seconds, 3600)
@@ -840,14 +990,7 @@ class Settings:
 
     def member2tag(self, server, member):
         """Return player tag from member."""
-        try:
-            players = self.settings["servers"][server.id]["players"]
-            for member_id, player_tag in players.items():
-                if member_id == member.id:
-                    return player_tag
-        except KeyError:
-            pass
-        return None
+        return self.player_index.tag(server.id, member.id)
 
     def emoji(self, name=None, key=None):
         """Chest emojis by api key name or key.
@@ -868,11 +1011,7 @@ class Settings:
         if name is None:
             if key in emojis:
                 name = emojis[key]
-        for server in self.bot.servers:
-            for emoji in server.emojis:
-                if emoji.name == name:
-                    return '<:{}:{}>'.format(emoji.name, emoji.id)
-        return ''
+        return emoji_str(self.bot, name)
 
     @property
     def profile_api_url(self):
@@ -918,6 +1057,24 @@ class Settings:
         self.settings["auth"] = value
         self.save()
 
+    @property
+    def player_cache_ttl(self):
+        """Seconds player data is fresh in memory."""
+        return int(self.settings.get("player_cache_ttl", PLAYER_CACHE_TTL))
+
+    @property
+    def player_cache_stale_ttl(self):
+        """Seconds stale player data can be served while refreshing."""
+        return int(self.settings.get("player_cache_stale_ttl", PLAYER_CACHE_STALE_TTL))
+
+    def set_player_cache_ttl(self, ttl, stale_ttl):
+        """Set player cache TTLs."""
+        self.settings["player_cache_ttl"] = int(ttl)
+        self.settings["player_cache_stale_ttl"] = int(stale_ttl)
+        self.player_cache.ttl = self.player_cache_ttl
+        self.player_cache.stale_ttl = self.player_cache_stale_ttl
+        self.save()
+
     def set_resources(self, server, value):
         """Show gold/gems or not."""
         self.settings[server.id]["show_resources"] = value
@@ -992,6 +1149,50 @@ class CRProfile:
         self.model.profile_api_token = token
         await self.bot.say("API token save.")
 
+    @crprofileset.command(name="cache", pass_context=True)
+    async def crprofileset_cache(self, ctx):
+        """Player data cache statistics."""
+        cache = self.model.player_cache
+        stats = cache.stats
+        requests = stats['hits'] + stats['stale_hits'] + stats['misses'] + stats['coalesced']
+        hit_rate = 0
+        if requests:
+            hit_rate = (requests - stats['misses']) / requests * 100
+        out = [
+            "TTL: {} seconds".format(cache.ttl),
+            "Stale TTL: {} seconds".format(cache.stale_ttl),
+            "Entries: {}".format(len(cache.entries)),
+            "In flight: {}".format(len(cache.inflight)),
+            "Hits: {}".format(stats['hits']),
+            "Stale hits: {}".format(stats['stale_hits']),
+            "Coalesced: {}".format(stats['coalesced']),
+            "Misses: {}".format(stats['misses']),
+            "Errors: {}".format(stats['errors']),
+            "Hit rate: {:.1f}%".format(hit_rate),
+        ]
+        await self.bot.say(box("\n".join(out)))
+
+    @crprofileset.command(name="cachettl", pass_context=True)
+    async def crprofileset_cachettl(self, ctx, ttl: int, stale_ttl: int = None):
+        """Set player data cache TTL in seconds.
+
+        ttl: data is served from memory without refetching.
+        stale_ttl: stale data is served while it is refreshed in the background.
+        """
+        if stale_ttl is None:
+            stale_ttl = max(ttl, self.model.player_cache_stale_ttl)
+        if stale_ttl < ttl:
+            await self.bot.say("Stale TTL cannot be less than TTL.")
+            return
+        self.model.set_player_cache_ttl(ttl, stale_ttl)
+        await self.bot.say("Player cache TTL: {} seconds, stale TTL: {} seconds.".format(ttl, stale_ttl))
+
+    @crprofileset.command(name="cacheclear", pass_context=True)
+    async def crprofileset_cacheclear(self, ctx):
+        """Clear player data cache."""
+        self.model.player_cache.clear()
+        await self.bot.say("Player cache cleared.")
+
     @crprofileset.command(name="rmplayertag", pass_context=True)
     async def crprofileset_rmplayertag(self, ctx, member: discord.Member):
         """Remove player tag of a user."""
@@ -1161,6 +1362,9 @@ class CRProfile:
             player_data = self.model.cached_player_data(tag)
         except asyncio.TimeoutError:
             player_data = self.model.cached_player_data(tag)
+        else:
+            if player_data.error:
+                player_data = self.model.cached_player_data(tag)
 
         if player_data is None:
             await self.bot.send_message(ctx.message.channel, "Unable to load from API.")
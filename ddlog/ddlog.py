@@ -35,6 +35,7 @@ from discord import ChannelType
 from discord.ext.commands import Command
 from discord.ext.commands import Context
 
+from cogs.serverindex import channel_counts, member_counts, role_counts
 from cogs.utils.dataIO import dataIO
 
 try:
@@ -49,6 +50,7 @@ JSON = os.path.join(*PATH_LIST, "settings.json")
 HOST = '127.0.0.1'
 INTERVAL = 5
 
+
 class DataDogLog:
     """DataDog Logger.
 
@@ -263,9 +265,7 @@ class DataDogLog:
     def send_channels(self):
         if not self.tags:
             return
-        channels = list(self.bot.get_all_channels())
-        text_channels = sum(c.type == ChannelType.text for c in channels)
-        voice_channels = sum(c.type == ChannelType.voice for c in channels)
+        text_channels, voice_channels = channel_counts(self.bot)
         statsd.gauge('bot.channels', voice_channels,
                      tags=[*self.tags, 'channel_type:voice'])
         statsd.gauge('bot.channels', text_channels,
@@ -274,10 +274,9 @@ class DataDogLog:
     def send_members(self):
         if not self.tags:
             return
-        members = list(self.bot.get_all_members())
-        unique = set(m.id for m in members)
-        statsd.gauge('bot.members', len(members), tags=self.tags)
-        statsd.gauge('bot.unique_members', len(unique), tags=self.tags)
+        member_count, unique_count = member_counts(self.bot)
+        statsd.gauge('bot.members', member_count, tags=self.tags)
+        statsd.gauge('bot.unique_members', unique_count, tags=self.tags)
 
     def send_voice(self):
         if not self.tags:
@@ -296,15 +295,9 @@ class DataDogLog:
         """Log server roles on datadog."""
         if not self.tags:
             return
-        roles = {}
-        for role in server.roles:
-            roles[role.id] = {'role': role, 'count': 0}
-        for member in server.members:
-            for role in member.roles:
-                roles[role.id]['count'] += 1
-
+        counts = role_counts(self.bot, server)
         for role in server.roles:
-            role_count = roles[role.id]['count']
+            role_count = counts[role.id]
             statsd.gauge(
                 'bot.roles.{}'.format(server.id),
                 role_count,
@@ -28,23 +28,19 @@ import datetime
 import io
 import os
 import re
-import yaml
 import string
-from concurrent.futures import ThreadPoolExecutor
 
 import aiohttp
 import discord
-from PIL import Image
-from PIL import ImageDraw
-from PIL import ImageFont
+from cogs.crcards import CatalogMissing, card_catalog, catalog_required
+from cogs.serverindex import emoji_str
 from cogs.utils import checks
 from cogs.utils.chat_formatting import pagify
 from cogs.utils.dataIO import dataIO
 from discord.ext import commands
 
+DATA_PATH = os.path.join("data", "deck")
 SETTINGS_PATH = os.path.join("data", "deck", "settings.json")
-AKA_PATH = os.path.join("data", "deck", "cards_aka.yaml")
-CARDS_JSON_PATH = os.path.join("data", "deck", "cards.json")
 max_deck_per_user = 5
 
 PAGINATION_TIMEOUT = 20.0
@@ -66,10 +62,7 @@ class BotEmoji:
 
     def name(self, name):
         """Emoji by name."""
-        for emoji in self.bot.get_all_emojis():
-            if emoji.name == name:
-                return '<:{}:{}>'.format(emoji.name, emoji.id)
-        return ''
+        return emoji_str(self.bot, name)
 
 
 class Deck:
@@ -79,18 +72,6 @@ class Deck:
         """Init."""
         self.bot = bot
         self.settings = dataIO.load_json(SETTINGS_PATH)
-        self.cards = dataIO.load_json(CARDS_JSON_PATH)
-
-        # init card data
-        self.cards_abbrev = {}
-
-        with open(AKA_PATH) as f:
-            aka = yaml.load(f)
-
-        for k, v in aka.items():
-            for value in v:
-                self.cards_abbrev[value] = k
-            self.cards_abbrev[k.replace('-', '')] = k
 
         self.card_w = 302
         self.card_h = 363
@@ -107,13 +88,17 @@ class Deck:
 
         self._cards_json = None
 
-        # Used for Pillow blocking code
-        self.threadex = ThreadPoolExecutor(max_workers=2)
+    async def on_command_error(self, error, ctx):
+        """Tell the user when a command needs the card catalog."""
+        if isinstance(error, CatalogMissing) and ctx.command.instance is self:
+            await self.bot.send_message(ctx.message.channel, str(error))
 
     @property
     def valid_card_keys(self):
         """Valid card keys."""
-        return [card["key"] for card in self.cards]
+        return [
+            card["api_key"] for card in card_catalog(self.bot).cards
+            if card["decklink"] is not None]
 
     async def cards_json(self):
         url = CARDS_JSON_URL
@@ -160,6 +145,7 @@ class Deck:
         return decklink
 
     @commands.group(pass_context=True, no_pm=True)
+    @catalog_required()
     async def deck(self, ctx):
         """Clash Royale deck builder.
 
@@ -218,17 +204,13 @@ class Deck:
 
     async def card_decklink_to_key(self, decklink):
         """Decklink id to card."""
-        for card in self.cards:
-            if decklink == str(card["decklink"]):
-                return card["key"]
-        return None
+        catalog = card_catalog(self.bot)
+        return catalog.key_to_api_key(catalog.decklink_to_key(decklink))
 
     async def card_key_to_decklink(self, key):
         """Card key to decklink id."""
-        for card in self.cards:
-            if key == card["key"]:
-                return str(card["decklink"])
-        return None
+        catalog = card_catalog(self.bot)
+        return catalog.key_to_decklink(catalog.api_key_to_key(key))
 
     async def decklink_to_cards(self, url):
         """Convert decklink to cards."""
@@ -453,14 +435,16 @@ class Deck:
         """Display all available cards and acceptable abbreviations."""
         out = []
 
-        for card in sorted(self.cards, key=lambda x: x["name"].lower()):
-            key = card["key"]
-            names = [key]
+        cards = [
+            card for card in card_catalog(self.bot).cards
+            if card["decklink"] is not None]
+        for card in sorted(cards, key=lambda x: x["name"].lower()):
+            names = [card["api_key"]]
             name = card["name"]
-            for abbrev_k, abbrev_v in self.cards_abbrev.items():
-                if abbrev_v == key:
-                    names.append(abbrev_k)
-            rarity = card["rarity"]
+            for abbrev in card["aka"]:
+                if abbrev not in names:
+                    names.append(abbrev)
+            rarity = string.capwords(card["rarity"])
             elixir = card["elixir"]
             out.append(
                 "**{}** ({}, {} elixir): {}".format(
@@ -646,132 +630,51 @@ class Deck:
 
     async def upload_deck_image(self, ctx, deck, deck_name, author, description=""):
         """Upload deck image to the server."""
+        deck_image = self.bot.get_cog('DeckImage')
+        if deck_image is None:
+            await self.bot.say("DeckImage cog is required to display decks.")
+            return None
 
-        deck_image = await self.bot.loop.run_in_executor(
-            self.threadex,
-            self.get_deck_image,
-            deck, deck_name, author
-        )
+        png = await deck_image.render(
+            DATA_PATH, deck,
+            deck_name or "Deck",
+            author.name if author else "",
+            self.average_elixir(deck))
 
         # construct a filename using first three letters of each card
         filename = "deck-{}.png".format("-".join([card[:3] for card in deck]))
 
-        message = None
-
-        with io.BytesIO() as f:
-            deck_image.save(f, "PNG")
-            f.seek(0)
-            message = await ctx.bot.send_file(
-                ctx.message.channel, f,
-                filename=filename, content=description)
+        message = await ctx.bot.send_file(
+            ctx.message.channel, io.BytesIO(png),
+            filename=filename, content=description)
 
         return message
 
-    def get_deck_image(self, deck, deck_name=None, deck_author=None):
-        """Construct the deck with Pillow and return image."""
-        card_w = 302
-        card_h = 363
-        card_x = 30
-        card_y = 30
-        font_size = 50
-        txt_y_line1 = 430
-        txt_y_line2 = 500
-        txt_x_name = 50
-        txt_x_cards = 503
-        txt_x_elixir = 1872
-
-        bg_image = Image.open("data/deck/img/deck-bg-b.png")
-        size = bg_image.size
-
-        font_file_regular = "data/deck/fonts/OpenSans-Regular.ttf"
-        font_file_bold = "data/deck/fonts/OpenSans-Bold.ttf"
-
-        image = Image.new("RGBA", size)
-        image.paste(bg_image)
-
-        if not deck_name:
-            deck_name = "Deck"
-
-        # cards
-        for i, card in enumerate(deck):
-            card_image_file = "data/deck/img/cards/{}.png".format(card)
-            card_image = Image.open(card_image_file)
-            # size = (card_w, card_h)
-            # card_image.thumbnail(size)
-            box = (card_x + card_w * i,
-                   card_y,
-                   card_x + card_w * (i + 1),
-                   card_h + card_y)
-            image.paste(card_image, box, card_image)
-
-        # elixir
+    def average_elixir(self, deck):
+        """Average elixir of deck as string."""
+        catalog = card_catalog(self.bot)
         total_elixir = 0
         # total card exclude mirror (0-elixir cards)
         card_count = 0
 
-        for card in self.cards:
-            if card["key"] in deck:
-                total_elixir += card["elixir"]
-                if card["elixir"]:
-                    card_count += 1
-
-        average_elixir = "{:.3f}".format(total_elixir / card_count)
-
-        # text
-        # Take out hyphnens and capitlize the name of each card
-        card_names = [string.capwords(c.replace('-', ' ')) for c in deck]
-
-        txt = Image.new("RGBA", size)
-        txt_name = Image.new("RGBA", (txt_x_cards - 30, size[1]))
-        font_regular = ImageFont.truetype(font_file_regular, size=font_size)
-        font_bold = ImageFont.truetype(font_file_bold, size=font_size)
-
-        d = ImageDraw.Draw(txt)
-        d_name = ImageDraw.Draw(txt_name)
-
-        line1 = ', '.join(card_names[:4])
-        line2 = ', '.join(card_names[4:])
-        # card_text = '\n'.join([line0, line1])
-
-        deck_author_name = deck_author.name if deck_author else ""
-
-        d_name.text(
-            (txt_x_name, txt_y_line1), deck_name, font=font_bold,
-            fill=(0xff, 0xff, 0xff, 255))
-        d_name.text(
-            (txt_x_name, txt_y_line2), deck_author_name, font=font_regular,
-            fill=(0xff, 0xff, 0xff, 255))
-        d.text(
-            (txt_x_cards, txt_y_line1), line1, font=font_regular,
-            fill=(0xff, 0xff, 0xff, 255))
-        d.text(
-            (txt_x_cards, txt_y_line2), line2, font=font_regular,
-            fill=(0xff, 0xff, 0xff, 255))
-        d.text(
-            (txt_x_elixir, txt_y_line1), "Avg elixir", font=font_bold,
-            fill=(0xff, 0xff, 0xff, 200))
-        d.text(
-            (txt_x_elixir, txt_y_line2), average_elixir, font=font_bold,
-            fill=(0xff, 0xff, 0xff, 255))
-
-        image.paste(txt, (0, 0), txt)
-        image.paste(txt_name, (0, 0), txt_name)
-
-        # scale down and return
-        scale = 0.5
-        scaled_size = tuple([x * scale for x in image.size])
-        image.thumbnail(scaled_size)
-
-        return image
+        for card in deck:
+            elixir = catalog.elixir(catalog.api_key_to_key(card))
+            total_elixir += elixir
+            if elixir:
+                card_count += 1
+
+        return "{:.3f}".format(total_elixir / card_count)
 
     def normalize_deck_data(self, deck):
         """Return a deck list with normalized names."""
         deck = [c.lower() if c is not None else '' for c in deck]
 
         # replace abbreviations
+        catalog = card_catalog(self.bot)
         for i, card in enumerate(deck):
-            if card in self.cards_abbrev.keys():
-                deck[i] = self.cards_abbrev[card]
+            key = catalog.resolve(card)
+            if key is not None:
+                deck[i] = catalog.key_to_api_key(key)
 
         return deck
 
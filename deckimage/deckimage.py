@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 SML
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import io
+import os
+import string
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from __main__ import send_cmd_help
+from cogs.utils import checks
+from cogs.utils.chat_formatting import box
+from discord.ext import commands
+from PIL import Image
+from PIL import ImageDraw
+from PIL import ImageFont
+
+# Output scale relative to the full size assets
+SCALE = 0.5
+
+# Number of encoded deck images kept in memory
+CACHE_SIZE = 128
+
+# Layout of the full size assets
+CARD_W = 302
+CARD_H = 363
+CARD_X = 30
+CARD_Y = 30
+FONT_SIZE = 50
+TXT_Y_LINE1 = 430
+TXT_Y_LINE2 = 500
+TXT_X_NAME = 50
+TXT_X_CARDS = 503
+TXT_X_ELIXIR = 1872
+
+WHITE = (0xff, 0xff, 0xff, 255)
+WHITE_DIM = (0xff, 0xff, 0xff, 200)
+
+
+def scale(value):
+    """Scale layout value to output resolution."""
+    return int(value * SCALE)
+
+
+class DeckImageRenderer:
+    """Deck image renderer for one set of assets.
+
+    Background, fonts and card sprites are loaded once and kept at the
+    output resolution.
+
+    data_path is the cog data folder containing:
+        img/deck-bg-b.png
+        img/cards/<card>.png
+        fonts/OpenSans-Regular.ttf
+        fonts/OpenSans-Bold.ttf
+    """
+
+    def __init__(self, data_path):
+        """Init."""
+        self.data_path = data_path
+
+        bg_image = Image.open(
+            os.path.join(data_path, "img", "deck-bg-b.png")).convert("RGBA")
+        self.size = (scale(bg_image.size[0]), scale(bg_image.size[1]))
+        self.background = bg_image.resize(self.size, Image.LANCZOS)
+
+        fonts_path = os.path.join(data_path, "fonts")
+        self.font_regular = ImageFont.truetype(
+            os.path.join(fonts_path, "OpenSans-Regular.ttf"),
+            size=scale(FONT_SIZE))
+        self.font_bold = ImageFont.truetype(
+            os.path.join(fonts_path, "OpenSans-Bold.ttf"),
+            size=scale(FONT_SIZE))
+
+        self.sprite_size = (scale(CARD_W), scale(CARD_H))
+        self.sprites = {}
+        self.sprites_lock = threading.Lock()
+        cards_path = os.path.join(data_path, "img", "cards")
+        for filename in os.listdir(cards_path):
+            card, ext = os.path.splitext(filename)
+            if ext == ".png":
+                self.load_sprite(card)
+
+    def load_sprite(self, card):
+        """Load card image scaled to output resolution."""
+        card_image = Image.open(os.path.join(
+            self.data_path, "img", "cards", "{}.png".format(card)))
+        sprite = card_image.convert("RGBA").resize(
+            self.sprite_size, Image.LANCZOS)
+        with self.sprites_lock:
+            self.sprites[card] = sprite
+        return sprite
+
+    def sprite(self, card):
+        """Card sprite. Load cards added after init on first use."""
+        sprite = self.sprites.get(card)
+        if sprite is None:
+            sprite = self.load_sprite(card)
+        return sprite
+
+    def render(self, deck, deck_name, author_name, average_elixir):
+        """Compose deck image and return PNG bytes."""
+        image = self.background.copy()
+
+        # cards
+        for i, card in enumerate(deck):
+            sprite = self.sprite(card)
+            image.paste(
+                sprite,
+                (scale(CARD_X + CARD_W * i), scale(CARD_Y)),
+                sprite)
+
+        # text
+        # Take out hyphnens and capitlize the name of each card
+        card_names = [string.capwords(c.replace('-', ' ')) for c in deck]
+        line1 = ', '.join(card_names[:4])
+        line2 = ', '.join(card_names[4:])
+
+        txt = Image.new("RGBA", self.size)
+        txt_name = Image.new("RGBA", (scale(TXT_X_CARDS - 30), self.size[1]))
+
+        d = ImageDraw.Draw(txt)
+        d_name = ImageDraw.Draw(txt_name)
+
+        d_name.text(
+            (scale(TXT_X_NAME), scale(TXT_Y_LINE1)), deck_name,
+            font=self.font_bold, fill=WHITE)
+        d_name.text(
+            (scale(TXT_X_NAME), scale(TXT_Y_LINE2)), author_name,
+            font=self.font_regular, fill=WHITE)
+        d.text(
+            (scale(TXT_X_CARDS), scale(TXT_Y_LINE1)), line1,
+            font=self.font_regular, fill=WHITE)
+        d.text(
+            (scale(TXT_X_CARDS), scale(TXT_Y_LINE2)), line2,
+            font=self.font_regular, fill=WHITE)
+        d.text(
+            (scale(TXT_X_ELIXIR), scale(TXT_Y_LINE1)), "Avg elixir",
+            font=self.font_bold, fill=WHITE_DIM)
+        d.text(
+            (scale(TXT_X_ELIXIR), scale(TXT_Y_LINE2)), average_elixir,
+            font=self.font_bold, fill=WHITE)
+
+        image.paste(txt, (0, 0), txt)
+        image.paste(txt_name, (0, 0), txt_name)
+
+        with io.BytesIO() as f:
+            image.save(f, "PNG")
+            return f.getvalue()
+
+
+class DeckImage:
+    """Deck image rendering service.
+
+    This is a utility cog which renders deck images for the deck and
+    clashroyale cogs. Rendering runs in a thread pool. Encoded PNGs are
+    cached by (assets, cards, name, author).
+
+    class MyCog:
+
+        def __init__(self, bot):
+            self.bot = bot
+
+        async def foo(self, deck):
+            deck_image = self.bot.get_cog('DeckImage')
+            png = await deck_image.render(
+                "data/mycog", deck, "Deck", "SML", "3.500")
+    """
+
+    def __init__(self, bot):
+        """Init."""
+        self.bot = bot
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.renderers = {}
+        self.renderers_lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.stats = {
+            'hits': 0,
+            'renders': 0,
+        }
+
+    def __unload(self):
+        self.executor.shutdown(wait=False)
+
+    def renderer(self, data_path):
+        """Renderer for assets in data_path, created on first use."""
+        with self.renderers_lock:
+            renderer = self.renderers.get(data_path)
+            if renderer is None:
+                renderer = DeckImageRenderer(data_path)
+                self.renderers[data_path] = renderer
+        return renderer
+
+    def render_job(self, data_path, deck, deck_name, author_name, average_elixir):
+        """Render deck image in executor."""
+        return self.renderer(data_path).render(
+            deck, deck_name, author_name, average_elixir)
+
+    async def render(self, data_path, deck, deck_name, author_name, average_elixir):
+        """Return PNG bytes of deck image."""
+        key = (data_path, tuple(deck), deck_name, author_name)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.stats['hits'] += 1
+            return self.cache[key]
+
+        png = await self.bot.loop.run_in_executor(
+            self.executor, self.render_job,
+            data_path, deck, deck_name, author_name, average_elixir)
+        self.stats['renders'] += 1
+
+        self.cache[key] = png
+        while len(self.cache) > CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return png
+
+    @commands.group(pass_context=True)
+    @checks.is_owner()
+    async def deckimage(self, ctx):
+        """Deck image rendering service."""
+        if ctx.invoked_subcommand is None:
+            await send_cmd_help(ctx)
+
+    @deckimage.command(name="stats", pass_context=True)
+    async def deckimage_stats(self, ctx):
+        """Show render and cache stats."""
+        out = [
+            "Assets loaded: {}".format(", ".join(self.renderers.keys()) or "None"),
+            "Card sprites: {:,}".format(
+                sum(len(r.sprites) for r in self.renderers.values())),
+            "Cached images: {} / {}".format(len(self.cache), CACHE_SIZE),
+            "Cache size: {:,} bytes".format(sum(len(png) for png in self.cache.values())),
+            "Cache hits: {:,}".format(self.stats['hits']),
+            "Renders: {:,}".format(self.stats['renders']),
+        ]
+        await self.bot.say(box("\n".join(out)))
+
+    @deckimage.command(name="clear", pass_context=True)
+    async def deckimage_clear(self, ctx):
+        """Clear image cache and reload assets."""
+        self.cache.clear()
+        with self.renderers_lock:
+            self.renderers.clear()
+        await self.bot.say("Deck image cache cleared.")
+
+
+def setup(bot):
+    """Setup."""
+    n = DeckImage(bot)
+    bot.add_cog(n)
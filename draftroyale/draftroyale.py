@@ -34,12 +34,12 @@ import itertools
 
 from .utils.dataIO import dataIO
 from __main__ import send_cmd_help
+from cogs.crcards import CatalogMissing, card_catalog, catalog_required
 from cogs.utils.chat_formatting import pagify
 from discord.ext import commands
 from discord.ext.commands import Context
 
 
-CRDATA_PATH = os.path.join("data", "draftroyale", "clashroyale.json")
 SETTINGS_PATH = os.path.join("data", "draftroyale", "settings.json")
 EMOJI_JSON = os.path.join("data", "draftroyale", "emojis.json")
 
@@ -103,7 +103,7 @@ class DraftRoyale:
 
     Required files
     --------------
-    - data/clashroyale.json: card data
+    - data/emojis.json: card emoji ids, saved with draftutil emojis
     - data/settings.json: technically not needed but good to
                           have a human-readable history log
     """
@@ -111,39 +111,27 @@ class DraftRoyale:
     def __init__(self, bot):
         """Constructor."""
         self.bot = bot
-        self.crdata_path = CRDATA_PATH
         self.settings_path = SETTINGS_PATH
 
-        self.crdata = dataIO.load_json(self.crdata_path)
         self.settings = dataIO.load_json(self.settings_path)
         self.emojis = dataIO.load_json(EMOJI_JSON)
 
-        # init card data
-        self.cards = []
-        self.cards_abbrev = {}
-
         self.min_players = 2
         self.max_players = 8
 
         self.prompt_timeout = 60.0
 
         self.init()
-        self.init_card_data()
-
-    def init_card_data(self):
-        """Initialize card data and popularize acceptable abbreviations."""
-        for card_key, card_value in self.crdata["Cards"].items():
-            self.cards.append(card_key)
-            self.cards_abbrev[card_key] = card_key
 
-            if card_key.find('-'):
-                self.cards_abbrev[card_key.replace('-', '')] = card_key
+    async def on_command_error(self, error, ctx):
+        """Tell the user when a command needs the card catalog."""
+        if isinstance(error, CatalogMissing) and ctx.command.instance is self:
+            await self.bot.send_message(ctx.message.channel, str(error))
 
-            aka_list = card_value["aka"]
-            for aka in aka_list:
-                self.cards_abbrev[aka] = card_key
-                if aka.find('-'):
-                    self.cards_abbrev[aka.replace('-', '')] = card_key
+    @property
+    def cards(self):
+        """Card keys from the shared card catalog."""
+        return card_catalog(self.bot).keys
 
     def init(self):
         """Abort all operations."""
@@ -158,6 +146,7 @@ class DraftRoyale:
         self.pick_direction_is_forward = True
 
     @commands.group(pass_context=True, no_pm=True)
+    @catalog_required()
     async def draft(self, ctx: Context):
         """Clash Royale Draft System.
 
@@ -384,7 +373,9 @@ class DraftRoyale:
 
     def card_key_to_emoji(self, card_key):
         """Return card emoji from id."""
-        name = self.crdata["Cards"][card_key]["emoji"]
+        name = card_catalog(self.bot).emoji_name(card_key)
+        if name not in self.emojis:
+            return ''
         return '<:{}:{}>'.format(name, self.emojis[name])
 
     def get_available_card_names(self):
@@ -394,6 +385,7 @@ class DraftRoyale:
             for card in self.get_available_cards()]
 
     @commands.group(pass_context=True)
+    @catalog_required()
     async def draftutil(self, ctx):
         """Draft utilities."""
         if ctx.invoked_subcommand is None:
@@ -402,7 +394,9 @@ class DraftRoyale:
     @draftutil.command(name="cards", pass_context=True)
     async def draftutil_cards(self, ctx):
         """List available cards by emojis."""
-        emojis = [v["emoji"] for k, v in self.crdata["Cards"].items()]
+        emojis = [
+            name for name in map(card_catalog(self.bot).emoji_name, self.cards)
+            if name in self.emojis]
 
         groups = grouper(emojis, 25)
         for group in groups:
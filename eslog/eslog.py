@@ -29,7 +29,10 @@ import datetime as dt
 import itertools
 import os
 import pprint
+import queue
 import re
+import threading
+import time
 from collections import Counter, OrderedDict, defaultdict
 from datetime import timedelta
 from random import choice
@@ -39,6 +42,8 @@ from __main__ import send_cmd_help
 from discord import Member
 from discord import Message
 from discord.ext import commands
+from elasticsearch.exceptions import ElasticsearchException
+from elasticsearch.helpers import bulk
 from elasticsearch_dsl import DocType, Date, Nested, Boolean, \
     analyzer, Keyword, Text, Integer
 from elasticsearch_dsl import FacetedSearch, TermsFacet
@@ -54,6 +59,21 @@ connections.create_connection(hosts=['localhost'], timeout=20)
 
 INTERVAL = timedelta(hours=4).seconds
 
+# Max docs waiting to be indexed. Docs are dropped when full.
+BULK_QUEUE_SIZE = 10000
+
+# Docs per bulk request
+BULK_SIZE = 500
+
+# Seconds before a partial bulk request is sent
+BULK_FLUSH_INTERVAL = 5
+
+# Attempts per bulk request before the batch is dropped
+BULK_RETRY_MAX = 5
+
+# Seconds to wait before first retry, doubled on each attempt
+BULK_RETRY_BACKOFF = 1
+
 PATH = os.path.join('data', 'keenlog')
 JSON = os.path.join(PATH, 'settings.json')
 
@@ -183,9 +203,9 @@ class MessageDoc(DocType):
         doc_type = 'message'
 
     @classmethod
-    def log(cls, message, **kwargs):
-        """Log all."""
-        doc = MessageDoc(
+    def create(cls, message):
+        """Return doc from message."""
+        doc = cls(
             content=message.content,
             embeds=message.embeds,
             attachments=message.attachments,
@@ -196,7 +216,12 @@ class MessageDoc(DocType):
         doc.set_channel(message.channel)
         doc.set_author(message.author)
         doc.set_mentions(message.mentions)
-        doc.save(**kwargs)
+        return doc
+
+    @classmethod
+    def log(cls, message, **kwargs):
+        """Log all."""
+        cls.create(message).save(**kwargs)
 
     def set_author(self, author):
         """Set author."""
@@ -232,22 +257,6 @@ class MessageDeleteDoc(MessageDoc):
     class Meta:
         doc_type = 'message_delete'
 
-    @classmethod
-    def log(cls, message, **kwargs):
-        """Log all."""
-        doc = MessageDeleteDoc(
-            content=message.content,
-            embeds=message.embeds,
-            attachments=message.attachments,
-            id=message.id,
-            timestamp=dt.datetime.utcnow()
-        )
-        doc.set_server(message.server)
-        doc.set_channel(message.channel)
-        doc.set_author(message.author)
-        doc.set_mentions(message.mentions)
-        doc.save(**kwargs)
-
     def save(self, **kwargs):
         return super(MessageDeleteDoc, self).save(**kwargs)
 
@@ -260,6 +269,98 @@ class MessageAuthorSearch(FacetedSearch):
     }
 
 
+class BulkIndexer:
+    """Buffered bulk indexing.
+
+    Docs are put in a bounded queue by event handlers.
+    A worker thread sends them with the bulk helper when BULK_SIZE docs
+    are waiting or BULK_FLUSH_INTERVAL seconds have passed.
+    Failed requests are retried with exponential backoff.
+    """
+
+    def __init__(self):
+        """Init."""
+        self.queue = queue.Queue(maxsize=BULK_QUEUE_SIZE)
+        self.stop_event = threading.Event()
+        self.started = time.time()
+        self.stats = {
+            'queued': 0,
+            'indexed': 0,
+            'dropped': 0,
+            'failed': 0,
+            'errors': 0,
+            'retries': 0,
+            'requests': 0,
+            'last_throughput': 0,
+        }
+        self.thread = threading.Thread(target=self.run, name='eslog-bulk', daemon=True)
+        self.thread.start()
+
+    def add(self, doc, index):
+        """Queue doc for indexing."""
+        doc.meta.index = index
+        try:
+            self.queue.put_nowait(doc.to_dict(include_meta=True))
+        except queue.Full:
+            self.stats['dropped'] += 1
+        else:
+            self.stats['queued'] += 1
+
+    def stop(self):
+        """Stop worker after indexing what is left in the queue."""
+        self.stop_event.set()
+
+    def next_batch(self):
+        """Block until BULK_SIZE docs are waiting or flush interval passed."""
+        batch = []
+        deadline = time.monotonic() + BULK_FLUSH_INTERVAL
+        while len(batch) < BULK_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or (self.stop_event.is_set() and self.queue.empty()):
+                break
+            try:
+                batch.append(self.queue.get(timeout=min(timeout, 1)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def run(self):
+        """Worker thread."""
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            batch = self.next_batch()
+            if batch:
+                self.send(batch)
+
+    def send(self, batch):
+        """Send batch with bulk helper, retrying on errors."""
+        backoff = BULK_RETRY_BACKOFF
+        for attempt in range(BULK_RETRY_MAX):
+            if attempt:
+                self.stats['retries'] += 1
+                time.sleep(backoff)
+                backoff *= 2
+            start = time.monotonic()
+            try:
+                success, errors = bulk(
+                    connections.get_connection(), batch, raise_on_error=False)
+            except ElasticsearchException:
+                self.stats['errors'] += 1
+                continue
+            elapsed = time.monotonic() - start
+            self.stats['requests'] += 1
+            self.stats['indexed'] += success
+            self.stats['failed'] += len(errors)
+            if elapsed:
+                self.stats['last_throughput'] = success / elapsed
+            return
+        self.stats['failed'] += len(batch)
+
+    @property
+    def throughput(self):
+        """Average docs indexed per second since start."""
+        return self.stats['indexed'] / max(1, time.time() - self.started)
+
+
 class ESLogger:
     """Elastic Search Logging v2.
     
@@ -268,6 +369,7 @@ class ESLogger:
 
     def __init__(self, index_name_fmt=None):
         self.index_name_fmt = index_name_fmt
+        self.indexer = BulkIndexer()
 
     @property
     def index_name(self):
@@ -287,11 +389,11 @@ class ESLogger:
 
     def log_message(self, message: Message):
         """Log message v2."""
-        MessageDoc.log(message, index=self.index_name)
+        self.indexer.add(MessageDoc.create(message), self.index_name)
 
     def log_message_delete(self, message: Message):
         """Log deleted message."""
-        MessageDeleteDoc.log(message, index=self.index_name)
+        self.indexer.add(MessageDeleteDoc.create(message), self.index_name)
 
     @staticmethod
     def parser():
@@ -651,12 +753,34 @@ class ESLog:
         self.eslogger = ESLogger(index_name_fmt='discord-{}')
         self.view = ESLogView(bot)
 
+    def __unload(self):
+        self.eslogger.indexer.stop()
+
     @commands.group(pass_context=True, no_pm=True)
     async def eslogset(self, ctx):
         """ES Log settings."""
         if ctx.invoked_subcommand is None:
             await send_cmd_help(ctx)
 
+    @eslogset.command(name="stats", pass_context=True, no_pm=True)
+    async def eslogset_stats(self, ctx):
+        """Indexing queue depth, throughput and errors."""
+        indexer = self.eslogger.indexer
+        stats = indexer.stats
+        out = [
+            "Queue depth: {:,} / {:,}".format(indexer.queue.qsize(), BULK_QUEUE_SIZE),
+            "Docs queued: {:,}".format(stats['queued']),
+            "Docs indexed: {:,}".format(stats['indexed']),
+            "Docs dropped (queue full): {:,}".format(stats['dropped']),
+            "Docs failed: {:,}".format(stats['failed']),
+            "Bulk requests: {:,}".format(stats['requests']),
+            "Request errors: {:,}".format(stats['errors']),
+            "Retries: {:,}".format(stats['retries']),
+            "Throughput (last request): {:,.0f} docs/s".format(stats['last_throughput']),
+            "Throughput (average): {:,.2f} docs/s".format(indexer.throughput),
+        ]
+        await self.bot.say(box("\n".join(out)))
+
     @eslogset.command(name="logall", pass_context=True, no_pm=True)
     async def eslogset_logall(self, ctx):
         """Log all gauges."""
@@ -25,11 +25,18 @@ DEALINGS IN THE SOFTWARE.
 """
 
 
+import asyncio
+import logging
 import os
+import random
 import re
+import time
 import uuid
 
 from collections import OrderedDict
+from urllib.parse import urlencode
+
+import aiohttp
 
 from discord import Message
 from discord import Member
@@ -42,25 +49,69 @@ from discord.ext.commands import Context
 
 from cogs.utils import checks
 
-from __main__ import send_cmd_help
+from cogs.utils.chat_formatting import box
 
-import google_measurement_protocol as gmp
+from __main__ import send_cmd_help
 
 from cogs.utils.dataIO import dataIO
 
+try:
+    from cogs.httpclient import client_session
+except ImportError:
+    def client_session(bot):
+        """One-off session when the HTTPClient cog is not installed."""
+        return aiohttp.ClientSession()
+
 PATH = os.path.join('data', 'ga')
 JSON = os.path.join(PATH, 'settings.json')
 
 ALPHANUM_PROG = re.compile('\W')
 
+# Measurement Protocol batch endpoint, max 20 hits per request
+BATCH_URL = 'https://www.google-analytics.com/batch'
+BATCH_SIZE = 20
+
+# Seconds to wait for more hits before sending a partial batch
+BATCH_WAIT = 1
+
+# Max hits waiting to be sent. Hits are dropped when full.
+QUEUE_SIZE = 2000
+
+# Fraction of the queue above which hits are sampled
+QUEUE_HIGH_WATER = 0.8
+
+# Fraction of hits kept above the high water mark
+SAMPLE_RATE = 0.5
+
+SEND_TIMEOUT = 10
+
 
 class GA:
-    """Send activity of Discord using Google Analytics."""
+    """Send activity of Discord using Google Analytics.
+
+    Hits are queued by event handlers and sent in batches
+    by a background worker, so message handling never waits on Google.
+    """
 
     def __init__(self, bot):
         """Init."""
         self.bot = bot
         self.settings = dataIO.load_json(JSON)
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.stats = {
+            'queued': 0,
+            'sent': 0,
+            'batches': 0,
+            'dropped': 0,
+            'sampled_out': 0,
+            'errors': 0,
+            'last_latency': 0,
+            'total_latency': 0,
+        }
+        self.task = bot.loop.create_task(self.send_task())
+
+    def __unload(self):
+        self.task.cancel()
 
     @checks.serverowner_or_permissions(manage_server=True)
     @commands.group(pass_context=True)
@@ -77,6 +128,111 @@ class GA:
         await self.bot.say("Google Analaytics TID saved.")
         await self.bot.delete_message(ctx.message)
 
+    @setga.command(name="samplerate", pass_context=True)
+    async def setga_samplerate(self, ctx, rate: float):
+        """Fraction of hits kept when the queue is nearly full.
+
+        1.0 keeps all hits until the queue is full.
+        """
+        if not 0 <= rate <= 1:
+            await self.bot.say("Sample rate must be between 0 and 1.")
+            return
+        self.settings["SAMPLE_RATE"] = rate
+        dataIO.save_json(JSON, self.settings)
+        await self.bot.say("Sample rate set to {}.".format(rate))
+
+    @setga.command(name="stats", pass_context=True)
+    async def setga_stats(self, ctx):
+        """Queue and send statistics."""
+        stats = self.stats
+        avg_latency = 0
+        if stats['batches']:
+            avg_latency = stats['total_latency'] / stats['batches']
+        out = [
+            "Queue depth: {} / {}".format(self.queue.qsize(), QUEUE_SIZE),
+            "Hits queued: {:,}".format(stats['queued']),
+            "Hits sent: {:,}".format(stats['sent']),
+            "Batches sent: {:,}".format(stats['batches']),
+            "Hits dropped (queue full): {:,}".format(stats['dropped']),
+            "Hits sampled out: {:,}".format(stats['sampled_out']),
+            "Send errors: {:,}".format(stats['errors']),
+            "Last send latency: {:.0f} ms".format(stats['last_latency'] * 1000),
+            "Avg send latency: {:.0f} ms".format(avg_latency * 1000),
+        ]
+        await self.bot.say(box("\n".join(out)))
+
+    @property
+    def sample_rate(self):
+        """Fraction of hits kept above the high water mark."""
+        return self.settings.get("SAMPLE_RATE", SAMPLE_RATE)
+
+    def enqueue(self, client_id, payload):
+        """Queue hit for the background worker."""
+        if self.queue.qsize() >= QUEUE_SIZE * QUEUE_HIGH_WATER:
+            if random.random() >= self.sample_rate:
+                self.stats['sampled_out'] += 1
+                return
+        hit = OrderedDict([
+            ('v', 1),
+            ('tid', self.settings["TID"]),
+            ('cid', str(client_id)),
+        ])
+        hit.update((k, v) for k, v in payload.items() if v is not None)
+        try:
+            self.queue.put_nowait(hit)
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+        else:
+            self.stats['queued'] += 1
+
+    async def next_batch(self):
+        """Wait for hits and return up to BATCH_SIZE of them."""
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + BATCH_WAIT
+        while len(batch) < BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def send_batch(self, batch):
+        """Send hits with the batch endpoint."""
+        body = '\n'.join(urlencode(hit) for hit in batch)
+        start = time.monotonic()
+        try:
+            async with client_session(self.bot) as session:
+                async with session.post(BATCH_URL, data=body, timeout=SEND_TIMEOUT) as resp:
+                    await resp.read()
+                    if resp.status != 200:
+                        self.stats['errors'] += 1
+                        return
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.stats['errors'] += 1
+            return
+        latency = time.monotonic() - start
+        self.stats['sent'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['last_latency'] = latency
+        self.stats['total_latency'] += latency
+
+    async def send_task(self):
+        """Background worker: send queued hits in batches."""
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                batch = await self.next_batch()
+                await self.send_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # keep the worker alive so the queue keeps draining
+                self.stats['errors'] += 1
+                logging.getLogger("red").exception("GA: failed to send batch")
+
     def get_member_uuid(self, member: Member):
         """Get member uuid."""
         client_id = uuid.uuid4()
@@ -144,27 +300,25 @@ class GA:
             self, client_id,
             path=None, title=None):
         """Send GMP Pageview."""
-        tid = self.settings["TID"]
-        gmp.report(
-            tid,
+        self.enqueue(
             client_id,
-            gmp.PageView(
-                path=path,
-                title=title))
+            OrderedDict([
+                ('t', 'pageview'),
+                ('dp', path),
+                ('dt', title)]))
 
     def gmp_report_event(
             self, client_id,
             category, action, label=None, value=None):
         """Send GMP event."""
-        tid = self.settings["TID"]
-        gmp.report(
-            tid,
+        self.enqueue(
             client_id,
-            gmp.Event(
-                category,
-                action,
-                label=label,
-                value=value))
+            OrderedDict([
+                ('t', 'event'),
+                ('ec', category),
+                ('ea', action),
+                ('el', label),
+                ('ev', value)]))
 
     def log_channel(
             self, client_id,
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 SML
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import os
+from collections import defaultdict
+
+import aiohttp
+from __main__ import send_cmd_help
+from cogs.utils import checks
+from cogs.utils.chat_formatting import box
+from cogs.utils.dataIO import dataIO
+from discord.ext import commands
+
+PATH = os.path.join("data", "httpclient")
+JSON = os.path.join(PATH, "settings.json")
+
+# Max number of open connections
+LIMIT = 100
+
+# Max number of open connections per host
+LIMIT_PER_HOST = 10
+
+# Seconds to keep idle connections alive
+KEEPALIVE_TIMEOUT = 30
+
+# Seconds to cache DNS lookups
+DNS_TTL = 300
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'SML-Cogs'
+}
+
+
+def nested_dict():
+    """Recursively nested defaultdict."""
+    return defaultdict(nested_dict)
+
+
+def client_session(bot):
+    """Shared pooled session from the HTTPClient cog.
+
+    Fall back to a one-off aiohttp.ClientSession if the cog is not loaded.
+    Cogs guard the import so that this cog stays optional:
+
+    try:
+        from cogs.httpclient import client_session
+    except ImportError:
+        def client_session(bot):
+            return aiohttp.ClientSession()
+
+    async with client_session(self.bot) as session:
+        async with session.get(url) as resp:
+            data = await resp.json()
+    """
+    http = bot.get_cog('HTTPClient')
+    if http is not None:
+        return http.session()
+    return aiohttp.ClientSession()
+
+
+class SharedSession:
+    """Session context for the shared client.
+
+    Used in place of aiohttp.ClientSession:
+
+    async with http.session() as session:
+        async with session.get(url) as resp:
+            data = await resp.json()
+
+    The pooled session is not closed when the context exits.
+    """
+
+    def __init__(self, client):
+        """Init."""
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+    def request(self, method, url, **kwargs):
+        """Request using the pooled connections."""
+        self.client.requests += 1
+        return self.client.client_session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        """GET request."""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """POST request."""
+        return self.request('POST', url, **kwargs)
+
+
+class HTTPClient:
+    """Shared pooled HTTP client.
+
+    This is a utility cog so that API cogs reuse keep-alive connections
+    instead of opening a new session per request. Cogs use the
+    client_session helper of this module, which falls back to a
+    one-off session when this cog is not loaded.
+
+    try:
+        from cogs.httpclient import client_session
+    except ImportError:
+        def client_session(bot):
+            return aiohttp.ClientSession()
+
+    class MyCog:
+
+        def __init__(self, bot):
+            self.bot = bot
+
+        async def foo(self):
+            async with client_session(self.bot) as session:
+                async with session.get(url, headers=headers) as resp:
+                    data = await resp.json()
+    """
+
+    def __init__(self, bot):
+        """Init."""
+        self.bot = bot
+        self.settings = nested_dict()
+        self.settings.update(dataIO.load_json(JSON))
+        self.requests = 0
+        self._session = None
+
+    def __unload(self):
+        self.close()
+
+    @property
+    def limit(self):
+        return int(self.settings.get("limit", LIMIT))
+
+    @property
+    def limit_per_host(self):
+        return int(self.settings.get("limit_per_host", LIMIT_PER_HOST))
+
+    @property
+    def keepalive_timeout(self):
+        return int(self.settings.get("keepalive_timeout", KEEPALIVE_TIMEOUT))
+
+    @property
+    def dns_ttl(self):
+        return int(self.settings.get("dns_ttl", DNS_TTL))
+
+    @property
+    def connector(self):
+        """Connector of the shared session."""
+        if self._session is None:
+            return None
+        return self._session.connector
+
+    @property
+    def client_session(self):
+        """Pooled aiohttp.ClientSession. Created on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+                loop=self.bot.loop)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=DEFAULT_HEADERS,
+                loop=self.bot.loop)
+        return self._session
+
+    def session(self):
+        """Session context which uses the pooled connections."""
+        return SharedSession(self)
+
+    def close(self):
+        """Close pooled session and its connections."""
+        if self._session is not None and not self._session.closed:
+            result = self._session.close()
+            if asyncio.iscoroutine(result):
+                self.bot.loop.create_task(result)
+        self._session = None
+
+    def save(self):
+        """Save settings."""
+        dataIO.save_json(JSON, self.settings)
+
+    @commands.group(pass_context=True)
+    @checks.is_owner()
+    async def httpclientset(self, ctx):
+        """Shared HTTP client settings.
+
+        Changes close open connections and apply to new requests.
+        """
+        if ctx.invoked_subcommand is None:
+            await send_cmd_help(ctx)
+
+    async def update_setting(self, key, value):
+        """Save setting and recreate pool."""
+        self.settings[key] = int(value)
+        self.save()
+        self.close()
+        await self.bot.say("Updated {} to {}.".format(key, value))
+
+    @httpclientset.command(name="limit", pass_context=True)
+    async def httpclientset_limit(self, ctx, value: int):
+        """Max number of open connections."""
+        await self.update_setting("limit", value)
+
+    @httpclientset.command(name="limitperhost", pass_context=True)
+    async def httpclientset_limitperhost(self, ctx, value: int):
+        """Max number of open connections per host."""
+        await self.update_setting("limit_per_host", value)
+
+    @httpclientset.command(name="keepalive", pass_context=True)
+    async def httpclientset_keepalive(self, ctx, seconds: int):
+        """Seconds to keep idle connections open."""
+        await self.update_setting("keepalive_timeout", seconds)
+
+    @httpclientset.command(name="dnsttl", pass_context=True)
+    async def httpclientset_dnsttl(self, ctx, seconds: int):
+        """Seconds to cache DNS lookups."""
+        await self.update_setting("dns_ttl", seconds)
+
+    @httpclientset.command(name="status", pass_context=True)
+    async def httpclientset_status(self, ctx):
+        """Pool status."""
+        out = [
+            "Limit: {}".format(self.limit),
+            "Limit per host: {}".format(self.limit_per_host),
+            "Keep-alive timeout: {} seconds".format(self.keepalive_timeout),
+            "DNS cache TTL: {} seconds".format(self.dns_ttl),
+            "Requests: {:,}".format(self.requests),
+        ]
+        connector = self.connector
+        if connector is None:
+            out.append("Session: not started")
+        elif connector.closed:
+            out.append("Session: closed")
+        else:
+            out.append("Session: open")
+        await self.bot.say(box("\n".join(out)))
+
+
+def check_folder():
+    """Check folder."""
+    os.makedirs(PATH, exist_ok=True)
+
+
+def check_file():
+    """Check files."""
+    if not dataIO.is_valid_json(JSON):
+        dataIO.save_json(JSON, {})
+
+
+def setup(bot):
+    """Setup."""
+    check_folder()
+    check_file()
+    n = HTTPClient(bot)
+    bot.add_cog(n)
@@ -25,17 +25,20 @@ DEALINGS IN THE SOFTWARE.
 """
 
 import argparse
+import asyncio
 import datetime as dt
 import itertools
 import os
 import pprint
 import re
+import time
 from collections import Counter, defaultdict
 from datetime import timedelta
 from random import choice
 
 import discord
 import keen
+from keen.client import KeenClient
 from __main__ import send_cmd_help
 from discord import Member
 from discord import Message
@@ -49,6 +52,11 @@ from cogs.utils.dataIO import dataIO
 
 INTERVAL = timedelta(hours=4).seconds
 
+FLUSH_INTERVAL = 10
+EVENT_BUFFER_MAX = 5000
+RETRY_MAX = 3
+RETRY_BACKOFF = 1
+
 PATH = os.path.join('data', 'keenlog')
 JSON = os.path.join(PATH, 'settings.json')
 
@@ -206,7 +214,7 @@ class BaseEventModel:
     def event_dict(self):
         return {}
 
-    def save(self):
+    def save(self, collector):
         """Save to keen"""
         print("please overwrite")
 
@@ -225,7 +233,7 @@ class MemberEventModel(BaseEventModel):
             "member": MemberModel(self.member).to_dict()
         }
 
-    def save(self):
+    def save(self, collector):
         """Save to Keen."""
         pass
 
@@ -233,17 +241,17 @@ class MemberEventModel(BaseEventModel):
 class MemberJoinEventModel(MemberEventModel):
     """Discord member joins server."""
 
-    def save(self):
+    def save(self, collector):
         """Save to Keen."""
-        keen.add_event("member_join", self.event_dict)
+        collector.add("member_join", self.event_dict)
 
 
 class MemberRemoveEventModel(MemberEventModel):
     """Discord member leaves server."""
 
-    def save(self):
+    def save(self, collector):
         """Save to Keen."""
-        keen.add_event("member_remove", self.event_dict)
+        collector.add("member_remove", self.event_dict)
 
 
 class MemberUpdateEventModel(BaseEventModel):
@@ -262,9 +270,9 @@ class MemberUpdateEventModel(BaseEventModel):
             "after": MemberModel(self.after).to_dict()
         }
 
-    def save(self):
+    def save(self, collector):
         """Save to Keen."""
-        keen.add_event("member_update", self.event_dict)
+        collector.add("member_update", self.event_dict)
 
 
 class MessageEventModel(BaseEventModel):
@@ -313,17 +321,17 @@ class MessageEventModel(BaseEventModel):
             "attachments": self.message.attachments
         }
 
-    def save(self, **kwargs):
+    def save(self, collector, **kwargs):
         """Save to Keen."""
-        keen.add_event("message", self.event_dict)
+        collector.add("message", self.event_dict)
 
 
 class MessageDeleteEventModel(MessageEventModel):
     """Discord Message Delete."""
 
-    def save(self, **kwargs):
+    def save(self, collector, **kwargs):
         """Save to Keen."""
-        keen.add_event("message_delete", self.event_dict)
+        collector.add("message_delete", self.event_dict)
 
 
 class MessageEditEventModel(BaseEventModel):
@@ -341,9 +349,9 @@ class MessageEditEventModel(BaseEventModel):
             "after": self.after.event_dict
         }
 
-    def save(self):
+    def save(self, collector):
         """Save Keen event."""
-        keen.add_event("message_edit", self.event_dict)
+        collector.add("message_edit", self.event_dict)
 
 
 class ServerStatsModel(BaseEventModel):
@@ -371,9 +379,126 @@ class ServerStatsModel(BaseEventModel):
             d["channels"][channel.position] = ChannelModel(channel).to_dict()
         return d
 
-    def save(self):
+    def save(self, collector):
         """Save keen event."""
-        keen.add_event("server_stats", self.event_dict)
+        collector.add("server_stats", self.event_dict)
+
+
+class EventCollector:
+    """Buffered Keen event submission.
+
+    Event handlers add events grouped by collection. The cog flushes
+    the buffer every flush interval with a single multi-collection
+    add_events request, run in an executor so the event loop is never
+    blocked on HTTP. Failed requests are retried with exponential backoff
+    and then put back in the buffer. The buffer holds at most
+    EVENT_BUFFER_MAX events; newer events are dropped when it is full.
+    """
+
+    def __init__(self, project_id=None, write_key=None, base_url=None):
+        """Init."""
+        self.events = defaultdict(list)
+        self.count = 0
+        self.client = None
+        self.stats = {
+            'queued': 0,
+            'sent': 0,
+            'dropped': 0,
+            'failed': 0,
+            'errors': 0,
+            'retries': 0,
+            'requests': 0,
+            'last_latency': 0,
+        }
+        self.configure(project_id, write_key, base_url=base_url)
+
+    def configure(self, project_id, write_key, base_url=None):
+        """Create write client.
+
+        base_url can point to a local server for testing.
+        """
+        if not project_id or not write_key:
+            self.client = None
+            return
+        self.client = KeenClient(
+            project_id, write_key=write_key, base_url=base_url or None)
+
+    def add(self, collection, event):
+        """Buffer event for collection."""
+        if self.count >= EVENT_BUFFER_MAX:
+            self.stats['dropped'] += 1
+            return
+        self.events[collection].append(event)
+        self.count += 1
+        self.stats['queued'] += 1
+
+    def requeue(self, events):
+        """Put unsent events back in front of the buffer."""
+        for collection, items in events.items():
+            room = EVENT_BUFFER_MAX - self.count
+            if room <= 0:
+                self.stats['dropped'] += len(items)
+                continue
+            self.stats['dropped'] += max(0, len(items) - room)
+            items = items[:room]
+            self.events[collection][:0] = items
+            self.count += len(items)
+
+    def take(self):
+        """Remove and return buffered events."""
+        events = dict(self.events)
+        self.events = defaultdict(list)
+        self.count = 0
+        return events
+
+    def send(self, events):
+        """Send events with add_events, retrying on errors.
+
+        Blocking. Run in an executor. Return True if request succeeded.
+        """
+        backoff = RETRY_BACKOFF
+        for attempt in range(RETRY_MAX):
+            if attempt:
+                self.stats['retries'] += 1
+                time.sleep(backoff)
+                backoff *= 2
+            start = time.monotonic()
+            try:
+                resp = self.client.add_events(events)
+            except Exception:
+                self.stats['errors'] += 1
+                continue
+            self.stats['requests'] += 1
+            self.stats['last_latency'] = time.monotonic() - start
+            self.count_results(events, resp)
+            return True
+        return False
+
+    def count_results(self, events, resp):
+        """Update sent and failed counts from add_events response."""
+        for collection, items in events.items():
+            results = resp.get(collection) if isinstance(resp, dict) else None
+            if not isinstance(results, list):
+                self.stats['sent'] += len(items)
+                continue
+            failed = sum(1 for r in results if not r.get('success', True))
+            self.stats['sent'] += len(items) - failed
+            self.stats['failed'] += failed
+
+    async def flush(self, loop):
+        """Send buffered events from an executor.
+
+        Return number of events sent.
+        """
+        if self.client is None or not self.count:
+            return 0
+        events = self.take()
+        count = sum(len(items) for items in events.values())
+        ok = await loop.run_in_executor(None, self.send, events)
+        if not ok:
+            self.requeue(events)
+            return 0
+        return count
 
 
 class KeenLogger:
@@ -585,6 +710,32 @@ class KeenLog:
         keen.project_id = self.settings["keen_project_id"]
         keen.read_key = self.settings["keen_read_key"]
         keen.write_key = self.settings["keen_write_key"]
+        self.collector = EventCollector()
+        self.configure_collector()
+        self.task = self.bot.loop.create_task(self.loop_task())
+
+    def __unload(self):
+        """Stop flush task and send what is left in the buffer."""
+        self.task.cancel()
+        self.bot.loop.create_task(self.collector.flush(self.bot.loop))
+
+    def configure_collector(self):
+        """Point event collector at settings."""
+        self.collector.configure(
+            self.settings.get("keen_project_id"),
+            self.settings.get("keen_write_key"),
+            base_url=self.settings.get("keen_base_url"))
+
+    @property
+    def flush_interval(self):
+        """Seconds between event flushes."""
+        return self.settings.get("flush_interval", FLUSH_INTERVAL)
+
+    async def loop_task(self):
+        """Flush buffered events on interval."""
+        while self is self.bot.get_cog("KeenLog"):
+            await self.collector.flush(self.bot.loop)
+            await asyncio.sleep(self.flush_interval)
 
     @commands.group(pass_context=True)
     async def keenlogset(self, ctx):
@@ -618,14 +769,68 @@ class KeenLog:
         keen.project_id = self.settings["keen_project_id"]
         keen.write_key = self.settings["keen_write_key"]
         keen.read_key = self.settings["keen_read_key"]
+        self.configure_collector()
         dataIO.save_json(JSON, self.settings)
         await self.bot.say("Keen.IO settings updated.")
         await self.bot.delete_message(ctx.message)
 
+    @checks.is_owner()
+    @keenlogset.command(name="baseurl", pass_context=True)
+    async def keenlogset_baseurl(self, ctx, url=None):
+        """Set Keen API base URL for event writes.
+
+        Leave blank to use the default Keen.IO API.
+        Useful for testing against a local server.
+        """
+        self.settings["keen_base_url"] = url
+        self.configure_collector()
+        dataIO.save_json(JSON, self.settings)
+        await self.bot.say("Keen API base URL: {}".format(url or "default"))
+
+    @checks.is_owner()
+    @keenlogset.command(name="flushinterval", pass_context=True)
+    async def keenlogset_flushinterval(self, ctx, seconds: int):
+        """Set seconds between event flushes."""
+        if seconds < 1:
+            await self.bot.say("Flush interval must be at least 1 second.")
+            return
+        self.settings["flush_interval"] = seconds
+        dataIO.save_json(JSON, self.settings)
+        await self.bot.say("Flush interval set to {} seconds.".format(seconds))
+
+    @keenlogset.command(name="flush", pass_context=True)
+    async def keenlogset_flush(self, ctx):
+        """Send buffered events now."""
+        count = await self.collector.flush(self.bot.loop)
+        await self.bot.say("Sent {:,} events.".format(count))
+
+    @keenlogset.command(name="stats", pass_context=True)
+    async def keenlogset_stats(self, ctx):
+        """Event buffer size, throughput and errors."""
+        collector = self.collector
+        stats = collector.stats
+        out = [
+            "Buffered: {:,} / {:,}".format(collector.count, EVENT_BUFFER_MAX),
+        ]
+        for collection, items in sorted(collector.events.items()):
+            out.append("  {}: {:,}".format(collection, len(items)))
+        out.extend([
+            "Events queued: {:,}".format(stats['queued']),
+            "Events sent: {:,}".format(stats['sent']),
+            "Events dropped (buffer full): {:,}".format(stats['dropped']),
+            "Events failed: {:,}".format(stats['failed']),
+            "Requests: {:,}".format(stats['requests']),
+            "Request errors: {:,}".format(stats['errors']),
+            "Retries: {:,}".format(stats['retries']),
+            "Last request: {:.3f}s".format(stats['last_latency']),
+            "Flush interval: {}s".format(self.flush_interval),
+        ])
+        await self.bot.say(box("\n".join(out)))
+
     @keenlogset.command(name="test", pass_context=True)
     async def keenlogset_test(self, ctx, a, b):
         """Test keen"""
-        keen.add_event("test", {
+        self.collector.add("test", {
             "a": a,
             "b": b
         })
@@ -634,7 +839,7 @@ class KeenLog:
     async def keenlogset_logall(self, ctx):
         """Log all gauges."""
         for server in self.bot.servers:
-            ServerStatsModel(server).save()
+            ServerStatsModel(server).save(self.collector)
 
         await self.bot.say("Logged all server stats")
 
@@ -928,27 +1133,27 @@ class KeenLog:
 
     async def on_message(self, message: Message):
         """Track on message."""
-        MessageEventModel(message).save()
+        MessageEventModel(message).save(self.collector)
 
     async def on_message_delete(self, message: Message):
         """Track message deletion."""
-        MessageDeleteEventModel(message).save()
+        MessageDeleteEventModel(message).save(self.collector)
 
     async def on_message_edit(self, before: Message, after: Message):
         """Track message editing."""
-        MessageEditEventModel(before, after).save()
+        MessageEditEventModel(before, after).save(self.collector)
 
     async def on_member_join(self, member: Member):
         """Track members joining server."""
-        MemberJoinEventModel(member).save()
+        MemberJoinEventModel(member).save(self.collector)
 
     async def on_member_update(self, before: Member, after: Member):
         """Called when a Member updates their profile."""
-        MemberUpdateEventModel(before, after).save()
+        MemberUpdateEventModel(before, after).save(self.collector)
 
     async def on_member_remove(self, member: Member):
         """Track members leaving server."""
-        MemberRemoveEventModel(member).save()
+        MemberRemoveEventModel(member).save(self.collector)
 
 
 
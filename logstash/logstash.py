@@ -25,8 +25,12 @@ DEALINGS IN THE SOFTWARE.
 import asyncio
 import logging
 import os
+import queue
 import re
 import json
+import socket
+import threading
+import time
 from datetime import timedelta
 
 import logstash
@@ -43,7 +47,9 @@ from discord.ext import commands
 from discord.ext.commands import Command
 from discord.ext.commands import Context
 
+from cogs.serverindex import member_counts, role_counts
 from cogs.utils import checks
+from cogs.utils.chat_formatting import box
 from cogs.utils.dataIO import dataIO
 
 from elasticsearch import Elasticsearch
@@ -53,6 +59,15 @@ from elasticsearch_dsl.query import Range
 
 HOST = 'localhost'
 PORT = 5959
+PROTOCOL = 'udp'
+PROTOCOLS = ['tcp', 'udp']
+QUEUE_SIZE = 10000
+GAUGE_HIGH_WATER = 0.5
+BATCH_SIZE = 100
+BATCH_WAIT = 1
+UDP_MAX_SIZE = 8192
+RECONNECT_BACKOFF = 1
+RECONNECT_BACKOFF_MAX = 30
 INTERVAL = timedelta(hours=4).seconds
 DB_PATH = os.path.join('data', 'logstash', 'logstash.db')
 
@@ -68,6 +83,164 @@ UEMOJI_P = re.compile(u'['
                       re.UNICODE)
 
 
+class QueuedLogstashHandler(logging.Handler):
+    """Queued Logstash transport.
+
+    emit only puts the record in a bounded queue. A sender thread formats
+    records as Logstash v1 JSON and writes them newline-delimited over one
+    persistent TCP connection or connected UDP socket, BATCH_SIZE records
+    or BATCH_WAIT seconds at a time.
+
+    Drop policy: gauge records are dropped once the queue is more than
+    GAUGE_HIGH_WATER full, so bursts from log_all_gauges cannot crowd out
+    events. Any record is dropped when the queue is full.
+    """
+
+    def __init__(self, host=HOST, port=PORT, protocol=PROTOCOL, maxsize=QUEUE_SIZE):
+        """Init."""
+        super().__init__()
+        self.address = (host, port)
+        self.protocol = protocol
+        self.maxsize = maxsize
+        self.formatter = logstash.LogstashFormatterVersion1()
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.sock = None
+        self.stop_event = threading.Event()
+        self.stats = {
+            'queued': 0,
+            'sent': 0,
+            'dropped': 0,
+            'dropped_gauges': 0,
+            'batches': 0,
+            'errors': 0,
+            'connects': 0,
+        }
+        self.thread = threading.Thread(target=self.run, name='logstash-sender', daemon=True)
+        self.thread.start()
+
+    @property
+    def queue_depth(self):
+        """Records waiting to be sent."""
+        return self.queue.qsize()
+
+    def emit(self, record):
+        """Queue record without blocking."""
+        if hasattr(record, 'discord_gauge') and \
+                self.queue.qsize() >= self.maxsize * GAUGE_HIGH_WATER:
+            self.stats['dropped'] += 1
+            self.stats['dropped_gauges'] += 1
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.stats['dropped'] += 1
+        else:
+            self.stats['queued'] += 1
+
+    def close(self):
+        """Stop sender after sending what is left in the queue."""
+        self.stop_event.set()
+        super().close()
+
+    def next_batch(self):
+        """Block until BATCH_SIZE records are waiting or BATCH_WAIT passed."""
+        batch = []
+        deadline = time.monotonic() + BATCH_WAIT
+        while len(batch) < BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or (self.stop_event.is_set() and self.queue.empty()):
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        """Sender thread."""
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            batch = self.next_batch()
+            if batch:
+                self.send(batch)
+        self.disconnect()
+
+    def format_batch(self, batch):
+        """Format records as newline-delimited JSON lines."""
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record) + b'\n')
+            except Exception:
+                self.stats['errors'] += 1
+        return lines
+
+    def packets(self, lines):
+        """Group lines into payloads.
+
+        TCP sends the batch as one write. UDP packs lines into datagrams
+        of at most UDP_MAX_SIZE bytes.
+        """
+        if self.protocol == 'tcp':
+            return [b''.join(lines)]
+        packets = []
+        packet = b''
+        for line in lines:
+            if packet and len(packet) + len(line) > UDP_MAX_SIZE:
+                packets.append(packet)
+                packet = b''
+            packet += line
+        if packet:
+            packets.append(packet)
+        return packets
+
+    def send(self, batch):
+        """Send batch, reconnecting with backoff until sent or stopped."""
+        lines = self.format_batch(batch)
+        if not lines:
+            return
+        backoff = RECONNECT_BACKOFF
+        while True:
+            try:
+                sock = self.connect()
+                for packet in self.packets(lines):
+                    if self.protocol == 'tcp':
+                        sock.sendall(packet)
+                    else:
+                        sock.send(packet)
+            except OSError:
+                self.stats['errors'] += 1
+                self.disconnect()
+                if self.stop_event.is_set():
+                    self.stats['dropped'] += len(lines)
+                    return
+                time.sleep(backoff)
+                backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+                continue
+            self.stats['sent'] += len(lines)
+            self.stats['batches'] += 1
+            return
+
+    def connect(self):
+        """Return persistent socket, opening it if needed."""
+        if self.sock is None:
+            if self.protocol == 'tcp':
+                self.sock = socket.create_connection(self.address, timeout=10)
+            else:
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.sock.connect(self.address)
+            self.stats['connects'] += 1
+        return self.sock
+
+    def disconnect(self):
+        """Close socket."""
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
 class Logstash:
     """Send activity of Discord using Google Analytics."""
 
@@ -78,7 +251,10 @@ class Logstash:
         self.extra = {}
         self.task = bot.loop.create_task(self.loop_task())
 
-        self.handler = logstash.LogstashHandler(HOST, PORT, version=1)
+        self.handler = QueuedLogstashHandler(
+            host=self.settings.get('host', HOST),
+            port=self.settings.get('port', PORT),
+            protocol=self.settings.get('protocol', PROTOCOL))
 
         self.logger = logging.getLogger('discord.logger')
         self.logger.setLevel(logging.INFO)
@@ -94,6 +270,7 @@ class Logstash:
         """
         self.logger.removeHandler(self.handler)
         logging.getLogger("red").removeHandler(self.handler)
+        self.handler.close()
 
     async def loop_task(self):
         """Loop task."""
@@ -124,6 +301,47 @@ class Logstash:
         self.log_all_gauges()
         await self.bot.say("Logged all.")
 
+    @logstash.command(name="stats", pass_context=True)
+    async def logstash_stats(self, ctx):
+        """Transport queue depth and counters."""
+        handler = self.handler
+        stats = handler.stats
+        out = [
+            "Transport: {} {}:{}".format(handler.protocol, *handler.address),
+            "Queue depth: {:,} / {:,}".format(handler.queue_depth, handler.maxsize),
+            "Records queued: {:,}".format(stats['queued']),
+            "Records sent: {:,}".format(stats['sent']),
+            "Records dropped: {:,}".format(stats['dropped']),
+            "Gauges dropped (high water): {:,}".format(stats['dropped_gauges']),
+            "Batches: {:,}".format(stats['batches']),
+            "Errors: {:,}".format(stats['errors']),
+            "Connects: {:,}".format(stats['connects']),
+        ]
+        await self.bot.say(box("\n".join(out)))
+
+    @checks.is_owner()
+    @logstash.command(name="transport", pass_context=True)
+    async def logstash_transport(self, ctx, protocol, host=HOST, port: int=PORT):
+        """Set Logstash protocol (tcp or udp), host and port."""
+        protocol = protocol.lower()
+        if protocol not in PROTOCOLS:
+            await self.bot.say("Protocol must be one of: {}".format(", ".join(PROTOCOLS)))
+            return
+        self.settings.update({
+            'protocol': protocol,
+            'host': host,
+            'port': port
+        })
+        dataIO.save_json(JSON, self.settings)
+
+        handler = QueuedLogstashHandler(host=host, port=port, protocol=protocol)
+        for logger in [self.logger, logging.getLogger("red")]:
+            logger.removeHandler(self.handler)
+            logger.addHandler(handler)
+        self.handler.close()
+        self.handler = handler
+        await self.bot.say("Logstash transport: {} {}:{}".format(protocol, host, port))
+
     @logstash.command(name="log", pass_context=True)
     async def logstash_log(self, ctx, key, *, json_str):
         """Log an arbitrary event with key an json input.
@@ -500,10 +718,10 @@ class Logstash:
     def log_members(self):
         """Log members."""
         members = list(self.bot.get_all_members())
-        unique = set(m.id for m in members)
+        _, unique_count = member_counts(self.bot)
         extra = {
             'member_count': len(members),
-            'unique_member_count': len(unique)
+            'unique_member_count': unique_count
         }
         self.log_discord_gauge('all_members', extra=extra)
 
@@ -537,8 +755,10 @@ class Logstash:
             roles = server.role_hierarchy
 
             # count number of members with a particular role
+            counts = role_counts(self.bot, server)
+
             for index, role in enumerate(roles):
-                count = sum([1 for m in server.members if role in m.roles])
+                count = counts[role.id]
 
                 role_params = self.get_role_params(role)
                 role_params['count'] = count
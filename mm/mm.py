@@ -32,6 +32,7 @@ from random import choice
 
 import discord
 from __main__ import send_cmd_help
+from cogs.serverindex import members_with_roles, role_counts
 from cogs.utils import checks
 from cogs.utils.chat_formatting import box
 from cogs.utils.chat_formatting import pagify
@@ -253,14 +254,17 @@ class MemberManagement:
         if len(plus):
             # include roles with '+' flag
             # exclude roles with '-' flag
-            out_members = set()
-            for m in server.members:
-                roles = set([r.name.lower() for r in m.roles])
-                if option_everyone:
-                    roles.add('@everyone')
-                exclude = len(roles & minus)
-                if not exclude and roles >= plus:
-                    out_members.add(m)
+            # role names are not unique so match any role with the name
+            roles_by_name = defaultdict(set)
+            for r in server.roles:
+                roles_by_name[r.name.lower()].add(r)
+            member_ids = members_with_roles(
+                self.bot,
+                server,
+                include=[roles_by_name[name] for name in plus if name != '@everyone'],
+                exclude=[roles_by_name[name] for name in minus])
+            out_members = set(server.get_member(id) for id in member_ids)
+            out_members.discard(None)
 
             # only role
             if option_only_role:
@@ -390,10 +394,9 @@ class MemberManagement:
         out_roles = {}
         for role in roles_to_list:
             out_roles[role.id] = {'role': role, 'count': 0}
-        for member in server.members:
-            for role in member.roles:
-                if role in roles_to_list:
-                    out_roles[role.id]['count'] += 1
+        counts = role_counts(self.bot, server)
+        for role in roles_to_list:
+            out_roles[role.id]['count'] = counts[role.id]
         for role in server.role_hierarchy:
             if role in roles_to_list:
                 out.append(
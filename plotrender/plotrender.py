@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 SML
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import io
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+
+from __main__ import send_cmd_help
+from cogs.utils import checks
+from cogs.utils.chat_formatting import box
+from discord.ext import commands
+from matplotlib import pyplot as plt
+
+# Number of worker processes
+WORKERS = 2
+
+# Number of rendered plots kept in memory
+CACHE_SIZE = 64
+
+FACECOLOR = '#32363b'
+SPINECOLOR = '#999999'
+FOOTERCOLOR = '#999999'
+LABELCOLOR = '#cccccc'
+TICKCOLOR = '#999999'
+TITLECOLOR = '#ffffff'
+
+CARDPOP_CREDITS = 'Compiled with data from Woody’s popularity snapshots'
+
+
+def style_axes(ax, spinecolor=SPINECOLOR):
+    """Apply dark theme to axes."""
+    for spine in ax.spines.values():
+        spine.set_edgecolor(spinecolor)
+    ax.xaxis.label.set_color(LABELCOLOR)
+    ax.yaxis.label.set_color(LABELCOLOR)
+    ax.tick_params(axis='x', colors=TICKCOLOR)
+    ax.tick_params(axis='y', colors=TICKCOLOR)
+
+
+def style_legend(ax, spinecolor=SPINECOLOR):
+    """Add legend with dark theme."""
+    leg = ax.legend(facecolor=FACECOLOR, edgecolor=spinecolor)
+    for text in leg.get_texts():
+        text.set_color(LABELCOLOR)
+
+
+def annotate_credits(ax, text=CARDPOP_CREDITS):
+    """Add data credits to bottom left of figure."""
+    ax.annotate(
+        text,
+        xy=(0, 0),
+        xycoords=('figure fraction'),
+        xytext=(15, 10),
+        textcoords='offset points',
+        size=8, ha='left', va='bottom', color=FOOTERCOLOR)
+
+
+def save_png(fig, edgecolor):
+    """Return figure as PNG bytes and close it."""
+    with io.BytesIO() as f:
+        fig.savefig(f, format="png", facecolor=FACECOLOR,
+                    edgecolor=edgecolor, transparent=True)
+        png = f.getvalue()
+    plt.close(fig)
+    return png
+
+
+def plot_cardtrend(x, labels, series):
+    """Card usage by popularity snapshot.
+
+    series: list of (label, usage) for each card.
+    """
+    edgecolor = '#eeeeee'
+    fig = plt.figure(figsize=(8, 6), dpi=192, facecolor=FACECOLOR, edgecolor=edgecolor)
+    ax = fig.add_subplot(111)
+    ax.grid(True, alpha=0.3)
+    ax.set_title('Clash Royale Card Trends', color=TITLECOLOR)
+    ax.set_xlabel('Snapshots')
+    ax.set_ylabel('Usage')
+    style_axes(ax)
+
+    for label, y in series:
+        ax.plot(x, y, 'o-', label=label)
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels, rotation=70, fontsize=8, ha='right')
+
+    style_legend(ax)
+    annotate_credits(ax)
+    fig.subplots_adjust(left=0.1, right=0.96, top=0.9, bottom=0.2)
+    return save_png(fig, edgecolor)
+
+
+def plot_elixirtrend(x, labels, elixirs, counts, stats):
+    """Deck elixir by popularity snapshot.
+
+    x, elixirs, counts: one point per deck, sized by count.
+    labels: tick label for each snapshot in x.
+    stats: list of (name, snapshot ids, values) drawn as lines.
+    """
+    edgecolor = '#333333'
+    spinecolor = '#666666'
+    fig = plt.figure(figsize=(8, 6), dpi=192, facecolor=FACECOLOR, edgecolor=edgecolor)
+    ax = fig.add_subplot(111)
+    ax.set_title('Clash Royale Decks: Average Elixir Trends', color=TITLECOLOR)
+    ax.set_xlabel('Snapshots')
+    ax.set_ylabel('Elixir')
+    style_axes(ax, spinecolor=spinecolor)
+
+    ax.scatter(x, elixirs, s=[c * 2 for c in counts], c="yellow")
+    ticks = sorted(set(x))
+    ax.set_xticks(ticks)
+    ax.set_xticklabels(labels, rotation=70, fontsize=8, ha='right')
+
+    for name, stat_x, stat_y in stats:
+        ax.plot(stat_x, stat_y, 'o-', label=name)
+
+    style_legend(ax, spinecolor=spinecolor)
+    annotate_credits(ax)
+    fig.subplots_adjust(left=0.1, right=0.96, top=0.9, bottom=0.2)
+    return save_png(fig, edgecolor)
+
+
+def plot_activity(days):
+    """Messages by hour, one row per day of the week.
+
+    days: list of (hours, counts) or None for days without data.
+    """
+    edgecolor = '#eeeeee'
+    fig, axes = plt.subplots(7, sharex=True, sharey=True)
+    for ax in axes:
+        for spine in ax.spines.values():
+            spine.set_edgecolor(SPINECOLOR)
+    for ax, day in zip(axes, days):
+        if day is None:
+            continue
+        x, y = day
+        ax.plot(x, y, 'o-')
+        ax.tick_params(axis='x', colors=TICKCOLOR)
+        ax.tick_params(axis='y', colors=TICKCOLOR)
+    axes[-1].set_xticks(range(0, 24, 4))
+    fig.subplots_adjust(hspace=0)
+    plt.setp([a.get_xticklabels() for a in fig.axes[:-1]], visible=False)
+    return save_png(fig, edgecolor)
+
+
+PLOTS = {
+    'cardtrend': plot_cardtrend,
+    'elixirtrend': plot_elixirtrend,
+    'activity': plot_activity,
+}
+
+
+def render_job(kind, data):
+    """Render plot in worker process. Return PNG bytes."""
+    return PLOTS[kind](**data)
+
+
+class PlotRender:
+    """Plot rendering service.
+
+    This is a utility cog which renders matplotlib plots in a process pool
+    so drawing never blocks the event loop. Rendered PNGs are cached by
+    (kind, args, version). Cogs pass a callable which builds plot data,
+    so data is only computed on a cache miss.
+
+    class MyCog:
+
+        def __init__(self, bot):
+            self.bot = bot
+
+        async def foo(self, cards):
+            render = self.bot.get_cog('PlotRender')
+            png = await render.render(
+                'cardtrend', tuple(sorted(cards)), version,
+                lambda: self.cardtrend_data(cards))
+    """
+
+    def __init__(self, bot):
+        """Init."""
+        self.bot = bot
+        self.executor = ProcessPoolExecutor(max_workers=WORKERS)
+        self.cache = OrderedDict()
+        self.inflight = {}
+        self.stats = {
+            'hits': 0,
+            'renders': 0,
+            'errors': 0,
+            'render_time': 0,
+        }
+
+    def __unload(self):
+        self.executor.shutdown(wait=False)
+
+    async def render(self, kind, args, version, data_fn):
+        """Return PNG bytes of plot.
+
+        kind: plot kind in PLOTS.
+        args: hashable normalized plot arguments.
+        version: hashable version of the source data.
+        data_fn: callable returning keyword arguments of the plot function.
+        """
+        key = (kind, args, version)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.stats['hits'] += 1
+            return self.cache[key]
+        if key in self.inflight:
+            self.stats['hits'] += 1
+            return await asyncio.shield(self.inflight[key])
+
+        future = asyncio.Future(loop=self.bot.loop)
+        self.inflight[key] = future
+        try:
+            start = time.monotonic()
+            png = await self.bot.loop.run_in_executor(
+                self.executor, render_job, kind, data_fn())
+            self.stats['renders'] += 1
+            self.stats['render_time'] += time.monotonic() - start
+        except Exception as e:
+            self.stats['errors'] += 1
+            future.set_exception(e)
+            # mark retrieved so failures without waiters are not logged
+            future.exception()
+            raise
+        else:
+            future.set_result(png)
+            self.cache[key] = png
+            while len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+            return png
+        finally:
+            del self.inflight[key]
+
+    @commands.group(pass_context=True)
+    @checks.is_owner()
+    async def plotrender(self, ctx):
+        """Plot rendering service."""
+        if ctx.invoked_subcommand is None:
+            await send_cmd_help(ctx)
+
+    @plotrender.command(name="stats", pass_context=True)
+    async def plotrender_stats(self, ctx):
+        """Show render and cache stats."""
+        stats = self.stats
+        renders = stats['renders']
+        out = [
+            "Workers: {}".format(WORKERS),
+            "Cached plots: {} / {}".format(len(self.cache), CACHE_SIZE),
+            "Cache size: {:,} bytes".format(sum(len(png) for png in self.cache.values())),
+            "Cache hits: {:,}".format(stats['hits']),
+            "Renders: {:,}".format(renders),
+            "Errors: {:,}".format(stats['errors']),
+            "Average render: {:.3f}s".format(stats['render_time'] / renders if renders else 0),
+        ]
+        await self.bot.say(box("\n".join(out)))
+
+    @plotrender.command(name="clear", pass_context=True)
+    async def plotrender_clear(self, ctx):
+        """Clear plot cache."""
+        self.cache.clear()
+        await self.bot.say("Plot cache cleared.")
+
+
+def setup(bot):
+    """Setup."""
+    n = PlotRender(bot)
+    bot.add_cog(n)
@@ -42,6 +42,13 @@ from cogs.utils.chat_formatting import pagify
 from discord.ext import commands
 from discord.ext.commands import Context
 
+try:
+    from cogs.httpclient import client_session
+except ImportError:
+    def client_session(bot):
+        """One-off session when the HTTPClient cog is not installed."""
+        return aiohttp.ClientSession()
+
 CHANGECLAN_ROLES = ["Leader", "Co-Leader", "Elder", "High Elder", "Member"]
 BS_CHANGECLAN_ROLES = ["Member", "Brawl-Stars"]
 DISALLOWED_ROLES = ["SUPERMOD", "MOD", "AlphaBot"]
@@ -321,8 +328,14 @@ class RACF:
         headers = {'Authorization': 'Bearer {}'.format(self.auth)}
 
         try:
-            async with aiohttp.ClientSession() as session:
+            scheduler = None
+            api = self.bot.get_cog('ClashRoyaleAPI')
+            if api is not None:
+                scheduler = await api.request_slot()
+            async with client_session(self.bot) as session:
                 async with session.get(url, headers=headers, timeout=30) as resp:
+                    if scheduler is not None:
+                        scheduler.report(resp.status, resp.headers)
                     data = await resp.json()
         except json.decoder.JSONDecodeError:
             raise
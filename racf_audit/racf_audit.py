@@ -32,6 +32,7 @@ from collections import defaultdict, OrderedDict
 import discord
 import unidecode
 import yaml
+from cogs.serverindex import role_members
 from cogs.utils import checks
 from cogs.utils.chat_formatting import pagify, box, bold
 from cogs.utils.dataIO import dataIO
@@ -49,6 +50,9 @@ import asyncio
 PATH = os.path.join("data", "racf_audit")
 JSON = os.path.join(PATH, "settings.json")
 
+# Kind of clan snapshots in the SnapshotStore cog
+SNAPSHOT_KIND = "racf_audit.clan"
+
 
 def nested_dict():
     """Recursively nested defaultdict."""
@@ -65,6 +69,21 @@ def member_has_role(server, member, role_name):
     role = discord.utils.get(server.roles, name=role_name)
     return role in member.roles
 
+
+def api_error_status(error):
+    """HTTP status carried by a crapipy.APIError, or None if unknown."""
+    status = getattr(error, 'status', None)
+    if status is None:
+        status = getattr(error, 'code', None)
+    if status is None and '429' in str(error):
+        status = 429
+    return status
+
+
+def role_member_ids(bot, server, roles):
+    """Return dict of role id: set of ids of members with the role."""
+    return {r.id: role_members(bot, server, r) for r in roles if r is not None}
+
 class RACFAuditException(Exception):
     pass
 
@@ -136,26 +155,43 @@ class DiscordUsers:
 
     def tag_to_member(self, tag):
         """Return Discord member from tag."""
-        for u in self.user_list:
-            if u.tag == tag:
-                return u.user
-        return None
+        return self.crclan_cog.manager.tag2member(self.server, tag)
 
     def tag_to_member_id(self, tag):
-        """Return Discord member from tag."""
-        for u in self.user_list:
-            if u.tag == tag:
-                return u.user
-        return None
+        """Return Discord member ID from tag."""
+        return self.crclan_cog.manager.tag2member_id(self.server, tag)
 
 
 class MemberAudit:
     """Member audit object associates API model with discord model."""
 
-    def __init__(self, member_model, server, clans):
+    def __init__(self, member_model, server, clans, roles=None, role_members=None):
+        """Init.
+
+        roles: dict of role name: role, to skip looking up roles by name.
+        role_members: dict of role id: set of member ids from role_member_ids.
+        Used instead of checking member roles when it includes the role.
+        """
         self.member_model = member_model
         self.server = server
         self.clans = clans
+        self.roles = roles or {}
+        self.role_members = role_members or {}
+
+    def has_role(self, role):
+        """Return True if discord member has role."""
+        if role is None or self.discord_member is None:
+            return False
+        if role.id in self.role_members:
+            return self.discord_member.id in self.role_members[role.id]
+        return role in self.discord_member.roles
+
+    def has_role_name(self, role_name):
+        """Return True if discord member has role by name."""
+        role = self.roles.get(role_name)
+        if role is None:
+            role = server_role(self.server, role_name)
+        return self.has_role(role)
 
     @property
     def discord_member(self):
@@ -187,25 +223,25 @@ class MemberAudit:
 
     @property
     def discord_role_member(self):
-        return member_has_role(self.server, self.discord_member, "Member")
+        return self.has_role_name("Member")
 
     @property
     def discord_role_elder(self):
-        return member_has_role(self.server, self.discord_member, "Elder")
+        return self.has_role_name("Elder")
 
     @property
     def discord_role_coleader(self):
-        return member_has_role(self.server, self.discord_member, "Co-Leader")
+        return self.has_role_name("Co-Leader")
 
     @property
     def discord_role_leader(self):
-        return member_has_role(self.server, self.discord_member, "Leader")
+        return self.has_role_name("Leader")
 
     @property
     def discord_clan_roles(self):
         if self.discord_member is None:
             return []
-        return [c.role for c in self.clans if c.role in self.discord_member.roles]
+        return [c.role for c in self.clans if self.has_role(c.role)]
 
 
 class RACFAudit:
@@ -230,20 +266,31 @@ class RACFAudit:
         """Return cache path by clan tag."""
         return os.path.join(PATH, "clans", clan_tag + ".json")
 
+    @property
+    def store(self):
+        """SnapshotStore cog, or None if not loaded."""
+        return self.bot.get_cog("SnapshotStore")
+
     def save_to_cache(self, clan_models):
         """Save clan models to cache."""
+        if self.store is not None:
+            self.store.put_many(SNAPSHOT_KIND, {c.tag: c.to_dict() for c in clan_models})
+            return
         for clan_model in clan_models:
             dataIO.save_json(self.cache_file_path(clan_model.tag), clan_model.to_dict())
 
     def load_from_cache(self, clan_tags):
         """Return clan models from cache."""
+        snapshots = {}
+        if self.store is not None:
+            snapshots = self.store.get_many(SNAPSHOT_KIND, clan_tags)
         clan_models = []
-        fp_timestamp = None
         for clan_tag in clan_tags:
-            fp = self.cache_file_path(clan_tag)
-            if fp_timestamp is None:
-                fp_timestamp = os.path.getmtime(fp)
-            clan_model = crapipy.models.Clan(dataIO.load_json(fp))
+            if clan_tag in snapshots:
+                data = snapshots[clan_tag].data
+            else:
+                data = dataIO.load_json(self.cache_file_path(clan_tag))
+            clan_model = crapipy.models.Clan(data)
             clan_models.append(clan_model)
         return clan_models
 
@@ -270,7 +317,11 @@ class RACFAudit:
         clan_tags = [c.tag for c in clans]
         clan_models = []
 
+        scheduler = None
         try:
+            # Audits yield to interactive commands sharing the API token
+            if self.api is not None:
+                scheduler = await self.api.request_slot(background=True)
             client = crapipy.AsyncClient(token=self.auth)
             clan_models = await client.get_clans(clan_tags)
 
@@ -279,7 +330,11 @@ class RACFAudit:
             dataIO.save_json(JSON, self.settings)
             # TODO purely for testing
             # raise crapipy.APIError
-        except crapipy.APIError:
+        except crapipy.APIError as e:
+            # report only a known status so other errors do not trigger backoff
+            status = api_error_status(e)
+            if scheduler is not None and status is not None:
+                scheduler.report(status)
             raise crapipy.APIError
 
         return clan_models
@@ -544,7 +599,6 @@ class RACFAudit:
         --debug        Show debug in console 
         """
         server = ctx.message.server
-        family_tags = self.crclan.manager.get_bands(server).keys()
 
         option_exec = '--exec' in options
         option_debug = '--debug' in options
@@ -560,7 +614,7 @@ class RACFAudit:
         discord_users = DiscordUsers(crclan_cog=self.crclan, server=server)
 
         # Member models from API
-        member_models = await self.family_member_models(server)
+        member_models, is_cache = await self.family_member_models(server)
 
         # associate Discord user to member
         for member_model in member_models:
@@ -585,12 +639,19 @@ class RACFAudit:
         def update_clan(clan_name, field, member_model):
             clans_out[clan_name][field].append(member_model)
 
+        audit_roles = {
+            name: server_role(server, name)
+            for name in ["Member", "Elder", "Co-Leader", "Leader"]}
+        role_members = role_member_ids(
+            self.bot, server, [*audit_roles.values(), *[c.role for c in clans]])
+
         out = []
         for i, member_model in enumerate(member_models):
             if i % 20 == 0:
                 await self.bot.type()
 
-            ma = MemberAudit(member_model, server, clans)
+            ma = MemberAudit(
+                member_model, server, clans, roles=audit_roles, role_members=role_members)
             clan_name = member_model.clan_name
             m_out = []
             if ma.has_discord:
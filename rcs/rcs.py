@@ -27,10 +27,10 @@ DEALINGS IN THE SOFTWARE.
 import os
 from collections import defaultdict
 
+import aiohttp
 import discord
 from __main__ import send_cmd_help
 from discord.ext import commands
-import aiohttp
 import json
 import asyncio
 
@@ -38,6 +38,13 @@ from cogs.utils import checks
 from cogs.utils.dataIO import dataIO
 from cogs.utils.chat_formatting import pagify, box
 
+try:
+    from cogs.httpclient import client_session
+except ImportError:
+    def client_session(bot):
+        """One-off session when the HTTPClient cog is not installed."""
+        return aiohttp.ClientSession()
+
 BOTCOMMANDER_ROLES = ['Bot Commander']
 
 TOGGLE_ROLES = ["Trusted", "Visitor"]
@@ -272,7 +279,7 @@ class RCS:
         url = "{}{}".format('http://api.cr-api.com/profile/', tag)
 
         try:
-            async with aiohttp.ClientSession() as session:
+            async with client_session(self.bot) as session:
                 async with session.get(url, timeout=30) as resp:
                     data = await resp.json()
         except json.decoder.JSONDecodeError:
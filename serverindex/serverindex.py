@@ -0,0 +1,572 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 SML
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from collections import Counter
+from collections import defaultdict
+
+from __main__ import send_cmd_help
+from cogs.utils import checks
+from cogs.utils.chat_formatting import box
+from discord import ChannelType
+from discord.ext import commands
+
+
+class ServerGauges:
+    """Gauge state of one server.
+
+    member_ids: ids of all members.
+    role_members: role id: set of ids of members with the role.
+    voice_members: ids of members connected to a voice channel.
+    """
+
+    def __init__(self, server):
+        """Init."""
+        self.server_id = server.id
+        self.member_ids = set()
+        self.role_members = defaultdict(set)
+        self.text_channels = 0
+        self.voice_channels = 0
+        self.voice_members = set()
+        for channel in server.channels:
+            self.add_channel(channel)
+        for member in server.members:
+            self.add_member(member)
+
+    @property
+    def member_count(self):
+        """Number of members."""
+        return len(self.member_ids)
+
+    @property
+    def role_counts(self):
+        """Return dict of role id: number of members with the role."""
+        return Counter({k: len(v) for k, v in self.role_members.items()})
+
+    def add_member(self, member):
+        """Index member."""
+        self.member_ids.add(member.id)
+        for role in member.roles:
+            self.role_members[role.id].add(member.id)
+        if member.voice.voice_channel is not None:
+            self.voice_members.add(member.id)
+
+    def remove_member(self, member):
+        """Remove member from index."""
+        self.member_ids.discard(member.id)
+        for role in member.roles:
+            self.role_members[role.id].discard(member.id)
+        self.voice_members.discard(member.id)
+
+    def update_member(self, before, after):
+        """Apply role changes."""
+        before_ids = set(r.id for r in before.roles)
+        after_ids = set(r.id for r in after.roles)
+        for role_id in after_ids - before_ids:
+            self.role_members[role_id].add(after.id)
+        for role_id in before_ids - after_ids:
+            self.role_members[role_id].discard(after.id)
+
+    def update_voice(self, member):
+        """Track member joining or leaving voice."""
+        if member.voice.voice_channel is not None:
+            self.voice_members.add(member.id)
+        else:
+            self.voice_members.discard(member.id)
+
+    def add_channel(self, channel, n=1):
+        """Count channel by type."""
+        if channel.type == ChannelType.text:
+            self.text_channels += n
+        elif channel.type == ChannelType.voice:
+            self.voice_channels += n
+
+    def remove_channel(self, channel):
+        """Uncount channel."""
+        self.add_channel(channel, n=-1)
+
+    def remove_role(self, role):
+        """Forget deleted role."""
+        self.role_members.pop(role.id, None)
+
+
+class PlayerIndex:
+    """Bidirectional player tag / Discord member ID index by server.
+
+    Used by cogs which associate game player tags with Discord members.
+    Built from the players settings of a server on first lookup and kept
+    in sync when tags are set or removed, so lookups never scan players.
+
+    from cogs.serverindex import PlayerIndex
+
+    class MyModel:
+
+        def __init__(self):
+            self.player_index = PlayerIndex(self.server_players)
+
+        def server_players(self, server_id):
+            return self.settings["servers"].get(server_id, {}).get("players", {})
+
+        def tag2member(self, server, tag):
+            return self.player_index.member(server, tag)
+    """
+
+    def __init__(self, players_fn):
+        """Init.
+
+        players_fn: returns the players settings (member id: tag) of a server id.
+        """
+        self.players_fn = players_fn
+        self.tags = {}
+        self.members = {}
+
+    def load(self, server_id):
+        """Build index of server if needed."""
+        if server_id not in self.tags:
+            players = self.players_fn(server_id)
+            members = defaultdict(list)
+            for member_id, tag in players.items():
+                members[tag].append(member_id)
+            self.tags[server_id] = dict(players)
+            self.members[server_id] = members
+
+    def tag(self, server_id, member_id):
+        """Player tag of member id."""
+        self.load(server_id)
+        return self.tags[server_id].get(member_id)
+
+    def member_ids(self, server_id, tag):
+        """Ids of members who registered player tag, in registration order."""
+        self.load(server_id)
+        return self.members[server_id].get(tag, [])
+
+    def member(self, server, tag):
+        """First member on server who registered player tag, or None.
+
+        Members who have left the server are skipped.
+        """
+        for member_id in self.member_ids(server.id, tag):
+            member = server.get_member(member_id)
+            if member is not None:
+                return member
+        return None
+
+    def set(self, server_id, member_id, tag):
+        """Associate player tag with member id."""
+        self.remove(server_id, member_id)
+        self.tags[server_id][member_id] = tag
+        self.members[server_id][tag].append(member_id)
+
+    def remove(self, server_id, member_id):
+        """Remove player tag of member id."""
+        self.load(server_id)
+        tag = self.tags[server_id].pop(member_id, None)
+        if tag is None:
+            return
+        members = self.members[server_id]
+        members[tag].remove(member_id)
+        if not members[tag]:
+            del members[tag]
+
+    def clear(self, server_id=None):
+        """Drop index so it is rebuilt from settings."""
+        if server_id is None:
+            self.tags = {}
+            self.members = {}
+        else:
+            self.tags.pop(server_id, None)
+            self.members.pop(server_id, None)
+
+
+class ServerIndex:
+    """Incrementally maintained server state.
+
+    This is a utility cog which keeps per-server gauges and a
+    role to member id index current from member, channel, role and voice
+    events, so cogs can count and filter members without rescanning every
+    member. State is rebuilt on ready, resume and when a server becomes
+    available.
+
+    It also keeps a bot-wide emoji name index, built on first use and
+    dropped when server emojis change or servers join or leave.
+
+    Cogs use the module level helpers, which fall back to scanning
+    servers when this cog is not loaded:
+
+    from cogs.serverindex import emoji_str, members_with_roles, role_counts
+
+    class MyCog:
+
+        def __init__(self, bot):
+            self.bot = bot
+
+        def foo(self, server, alpha, elder, visitor):
+            counts = role_counts(self.bot, server)
+            ids = members_with_roles(
+                self.bot, server, include=[alpha, elder], exclude=[visitor])
+            emoji = emoji_str(self.bot, 'chestgold')
+    """
+
+    def __init__(self, bot):
+        """Init."""
+        self.bot = bot
+        self.servers = {}
+        self.member_servers = Counter()
+        self._emojis = None
+        self.ready = False
+        if bot.is_logged_in and bot.servers:
+            self.rebuild()
+
+    def rebuild(self):
+        """Rebuild state of all servers."""
+        self.servers = {}
+        self.member_servers = Counter()
+        self._emojis = None
+        for server in self.bot.servers:
+            self.add_server(server)
+        self.ready = True
+
+    def add_server(self, server):
+        """Index server."""
+        if server.id in self.servers:
+            self.remove_server(server)
+        self.servers[server.id] = ServerGauges(server)
+        self._emojis = None
+        for member in server.members:
+            self.member_servers[member.id] += 1
+
+    def remove_server(self, server):
+        """Forget server."""
+        gauges = self.servers.pop(server.id, None)
+        self._emojis = None
+        if gauges is None:
+            return
+        for member_id in gauges.member_ids:
+            self.member_servers[member_id] -= 1
+            if self.member_servers[member_id] <= 0:
+                del self.member_servers[member_id]
+
+    def gauges(self, server):
+        """Return ServerGauges for server."""
+        if server.id not in self.servers:
+            self.add_server(server)
+        return self.servers[server.id]
+
+    def role_counts(self, server):
+        """Return dict of role id: member count."""
+        return self.gauges(server).role_counts
+
+    def member_ids(self, server):
+        """Return set of ids of all members on server.
+
+        The set is live index state and must not be modified.
+        """
+        return self.gauges(server).member_ids
+
+    def role_members(self, server, role):
+        """Return set of ids of members with role.
+
+        The set is live index state and must not be modified.
+        """
+        gauges = self.gauges(server)
+        if role.id not in gauges.role_members:
+            return set()
+        return gauges.role_members[role.id]
+
+    def members_with_roles(self, server, include=None, exclude=None):
+        """Return set of ids of members with all include roles and no exclude roles.
+
+        include and exclude are lists of roles or of sets of roles.
+        A set matches members with any role in it, so roles which share
+        a name can be passed together. With no include, start from all
+        members.
+        """
+        def ids(item):
+            if isinstance(item, (set, frozenset, list, tuple)):
+                return set().union(*[self.role_members(server, r) for r in item])
+            return self.role_members(server, item)
+
+        include = include or []
+        exclude = exclude or []
+        if include:
+            sets = sorted([ids(i) for i in include], key=len)
+            result = set(sets[0]).intersection(*sets[1:])
+        else:
+            result = set(self.member_ids(server))
+        for item in exclude:
+            result -= ids(item)
+        return result
+
+    @property
+    def member_count(self):
+        """Members across all servers, counting each server separately."""
+        return sum(g.member_count for g in self.servers.values())
+
+    @property
+    def unique_member_count(self):
+        """Distinct members across all servers."""
+        return len(self.member_servers)
+
+    @property
+    def channel_counts(self):
+        """Return text and voice channel counts across all servers."""
+        text = sum(g.text_channels for g in self.servers.values())
+        voice = sum(g.voice_channels for g in self.servers.values())
+        return text, voice
+
+    @property
+    def voice_member_count(self):
+        """Members connected to voice across all servers."""
+        return sum(len(g.voice_members) for g in self.servers.values())
+
+    @property
+    def emojis(self):
+        """Return dict of emoji name: (emoji, emoji string) of all servers.
+
+        When servers share an emoji name, the first one found is used.
+        """
+        if self._emojis is None:
+            emojis = {}
+            for emoji in self.bot.get_all_emojis():
+                if emoji.name not in emojis:
+                    emojis[emoji.name] = (
+                        emoji, '<:{}:{}>'.format(emoji.name, emoji.id))
+            self._emojis = emojis
+        return self._emojis
+
+    def emoji(self, name):
+        """Return emoji by name. None if not found."""
+        if name in self.emojis:
+            return self.emojis[name][0]
+        return None
+
+    def emoji_str(self, name):
+        """Return emoji string by name for use in messages. '' if not found."""
+        if name in self.emojis:
+            return self.emojis[name][1]
+        return ''
+
+    @commands.group(pass_context=True)
+    @checks.is_owner()
+    async def serverindex(self, ctx):
+        """Server index."""
+        if ctx.invoked_subcommand is None:
+            await send_cmd_help(ctx)
+
+    @serverindex.command(name="rebuild", pass_context=True)
+    async def serverindex_rebuild(self, ctx):
+        """Rebuild index from server state."""
+        self.rebuild()
+        await self.bot.say("Indexed {} servers.".format(len(self.servers)))
+
+    @serverindex.command(name="stats", pass_context=True)
+    async def serverindex_stats(self, ctx):
+        """Show indexed gauges."""
+        text, voice = self.channel_counts
+        out = [
+            "Servers: {:,}".format(len(self.servers)),
+            "Members: {:,}".format(self.member_count),
+            "Unique members: {:,}".format(self.unique_member_count),
+            "Text channels: {:,}".format(text),
+            "Voice channels: {:,}".format(voice),
+            "Voice members: {:,}".format(self.voice_member_count),
+            "Emojis: {:,}".format(len(self.emojis)),
+        ]
+        await self.bot.say(box("\n".join(out)))
+
+    async def on_ready(self):
+        """Bot ready."""
+        self.rebuild()
+
+    async def on_resumed(self):
+        """Bot resume."""
+        self.rebuild()
+
+    async def on_server_join(self, server):
+        """Index new server."""
+        self.add_server(server)
+
+    async def on_server_available(self, server):
+        """Reindex server when it comes back."""
+        self.add_server(server)
+
+    async def on_server_remove(self, server):
+        """Forget server."""
+        self.remove_server(server)
+
+    async def on_server_unavailable(self, server):
+        """Drop emojis of unavailable server."""
+        self._emojis = None
+
+    async def on_server_emojis_update(self, before, after):
+        """Drop emoji index."""
+        self._emojis = None
+
+    async def on_member_join(self, member):
+        """Count member."""
+        gauges = self.servers.get(member.server.id)
+        if gauges is None or member.id in gauges.member_ids:
+            return
+        gauges.add_member(member)
+        self.member_servers[member.id] += 1
+
+    async def on_member_remove(self, member):
+        """Uncount member."""
+        gauges = self.servers.get(member.server.id)
+        if gauges is None or member.id not in gauges.member_ids:
+            return
+        gauges.remove_member(member)
+        self.member_servers[member.id] -= 1
+        if self.member_servers[member.id] <= 0:
+            del self.member_servers[member.id]
+
+    async def on_member_update(self, before, after):
+        """Apply role changes."""
+        if after.server.id in self.servers:
+            self.servers[after.server.id].update_member(before, after)
+
+    async def on_voice_state_update(self, before, after):
+        """Track voice members."""
+        if after.server.id in self.servers:
+            self.servers[after.server.id].update_voice(after)
+
+    async def on_channel_create(self, channel):
+        """Count channel."""
+        if not channel.is_private and channel.server.id in self.servers:
+            self.servers[channel.server.id].add_channel(channel)
+
+    async def on_channel_delete(self, channel):
+        """Uncount channel."""
+        if not channel.is_private and channel.server.id in self.servers:
+            self.servers[channel.server.id].remove_channel(channel)
+
+    async def on_server_role_delete(self, role):
+        """Forget deleted role."""
+        if role.server.id in self.servers:
+            self.servers[role.server.id].remove_role(role)
+
+
+def server_index(bot):
+    """ServerIndex cog if loaded and built, otherwise None."""
+    index = bot.get_cog('ServerIndex')
+    if index is not None and index.ready:
+        return index
+    return None
+
+
+def get_emoji(bot, name):
+    """Return emoji by name. None if not found."""
+    index = bot.get_cog('ServerIndex')
+    if index is not None:
+        return index.emoji(name)
+    for e in bot.get_all_emojis():
+        if e.name == name:
+            return e
+    return None
+
+
+def emoji_str(bot, name):
+    """Return emoji string by name for use in messages. '' if not found."""
+    index = bot.get_cog('ServerIndex')
+    if index is not None:
+        return index.emoji_str(name)
+    e = get_emoji(bot, name)
+    if e is None:
+        return ''
+    return '<:{}:{}>'.format(e.name, e.id)
+
+
+def role_counts(bot, server):
+    """Return dict of role id: member count."""
+    index = server_index(bot)
+    if index is not None:
+        return index.role_counts(server)
+    counts = Counter()
+    for member in server.members:
+        for role in member.roles:
+            counts[role.id] += 1
+    return counts
+
+
+def role_members(bot, server, role):
+    """Return set of ids of members with role.
+
+    The set may be live index state and must not be modified.
+    """
+    index = server_index(bot)
+    if index is not None:
+        return index.role_members(server, role)
+    return set(m.id for m in server.members if role in m.roles)
+
+
+def members_with_roles(bot, server, include=None, exclude=None):
+    """Return set of ids of members with all include roles and no exclude roles.
+
+    See ServerIndex.members_with_roles.
+    """
+    index = server_index(bot)
+    if index is not None:
+        return index.members_with_roles(server, include=include, exclude=exclude)
+
+    def ids(item):
+        if isinstance(item, (set, frozenset, list, tuple)):
+            return set(r.id for r in item)
+        return {item.id}
+
+    include = [ids(i) for i in include or []]
+    exclude = [ids(i) for i in exclude or []]
+    result = set()
+    for member in server.members:
+        role_ids = set(r.id for r in member.roles)
+        if all(role_ids & i for i in include) and \
+                not any(role_ids & e for e in exclude):
+            result.add(member.id)
+    return result
+
+
+def channel_counts(bot):
+    """Return text and voice channel counts across all servers."""
+    index = server_index(bot)
+    if index is not None:
+        return index.channel_counts
+    channels = list(bot.get_all_channels())
+    text = sum(c.type == ChannelType.text for c in channels)
+    voice = sum(c.type == ChannelType.voice for c in channels)
+    return text, voice
+
+
+def member_counts(bot):
+    """Return member count, counting each server separately, and unique member count."""
+    index = server_index(bot)
+    if index is not None:
+        return index.member_count, index.unique_member_count
+    members = list(bot.get_all_members())
+    return len(members), len(set(m.id for m in members))
+
+
+def setup(bot):
+    """Setup."""
+    n = ServerIndex(bot)
+    bot.add_cog(n)
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2017 SML
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import datetime as dt
+import glob
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from __main__ import send_cmd_help
+from cogs.utils import checks
+from cogs.utils.chat_formatting import box
+from cogs.utils.dataIO import dataIO
+from discord.ext import commands
+
+PATH = os.path.join("data", "snapshotstore")
+DB = os.path.join(PATH, "snapshots.db")
+
+# Legacy per-tag JSON caches by kind, imported with [p]snapshotstore import
+LEGACY_PATHS = {
+    "crclan.clan": os.path.join("data", "crclan", "clans"),
+    "crprofile.player": os.path.join("data", "crprofile", "players"),
+    "racf_audit.clan": os.path.join("data", "racf_audit", "clans"),
+}
+
+# SQLite limits the number of bound parameters per statement
+BULK_CHUNK_SIZE = 500
+
+
+class Snapshot:
+    """Stored snapshot."""
+
+    def __init__(self, kind=None, tag=None, data=None, timestamp=None):
+        """Init.
+
+        timestamp: UTC datetime when data was fetched.
+        """
+        self.kind = kind
+        self.tag = tag
+        self.data = data
+        self.timestamp = timestamp
+
+
+class HistoryRecord:
+    """Time series record."""
+
+    def __init__(self, timestamp=None, keyframe=False, data=None):
+        """Init.
+
+        timestamp: UTC datetime.
+        keyframe: True if data is a full state instead of a delta.
+        """
+        self.timestamp = timestamp
+        self.keyframe = keyframe
+        self.data = data
+
+
+class SnapshotDB:
+    """SQLite snapshot storage.
+
+    snapshots: one row per (kind, tag) holding the latest zlib compressed
+    JSON payload and the time it was fetched.
+
+    history: append-only time series per (kind, tag). Rows are either
+    keyframes (full state) or deltas from the previous row.
+    """
+
+    def __init__(self, filepath):
+        """Init."""
+        self.filepath = filepath
+        self.conn = sqlite3.connect(filepath)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "kind TEXT NOT NULL, "
+            "tag TEXT NOT NULL, "
+            "timestamp REAL NOT NULL, "
+            "data BLOB NOT NULL, "
+            "PRIMARY KEY (kind, tag))")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "kind TEXT NOT NULL, "
+            "tag TEXT NOT NULL, "
+            "timestamp REAL NOT NULL, "
+            "keyframe INTEGER NOT NULL, "
+            "data BLOB NOT NULL)")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS history_kind_tag_timestamp "
+            "ON history (kind, tag, timestamp)")
+        self.conn.commit()
+
+    def close(self):
+        """Close connection."""
+        self.conn.close()
+
+    @staticmethod
+    def encode(data):
+        """Compress data."""
+        return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+    @staticmethod
+    def decode(blob):
+        """Decompress data."""
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+    def put_many(self, kind, items, timestamp=None):
+        """Save dict of tag: data."""
+        if timestamp is None:
+            timestamp = time.time()
+        rows = [(kind, tag, timestamp, self.encode(data)) for tag, data in items.items()]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO snapshots (kind, tag, timestamp, data) VALUES (?, ?, ?, ?)",
+                rows)
+
+    def get_many(self, kind, tags):
+        """Return dict of tag: Snapshot for tags found."""
+        tags = list(tags)
+        out = {}
+        for i in range(0, len(tags), BULK_CHUNK_SIZE):
+            chunk = tags[i:i + BULK_CHUNK_SIZE]
+            cursor = self.conn.execute(
+                "SELECT tag, timestamp, data FROM snapshots "
+                "WHERE kind = ? AND tag IN ({})".format(",".join("?" * len(chunk))),
+                [kind] + chunk)
+            for tag, timestamp, blob in cursor:
+                out[tag] = Snapshot(
+                    kind=kind,
+                    tag=tag,
+                    data=self.decode(blob),
+                    timestamp=dt.datetime.utcfromtimestamp(timestamp))
+        return out
+
+    def append_history(self, kind, items, timestamp=None):
+        """Append dict of tag: (data, keyframe) to history."""
+        if timestamp is None:
+            timestamp = time.time()
+        rows = [
+            (kind, tag, timestamp, int(keyframe), self.encode(data))
+            for tag, (data, keyframe) in items.items()]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO history (kind, tag, timestamp, keyframe, data) VALUES (?, ?, ?, ?, ?)",
+                rows)
+
+    def history(self, kind, tag, since):
+        """Return list of HistoryRecord needed to rebuild state from since.
+
+        Records start at the last keyframe at or before since,
+        so that deltas can be replayed on top of it.
+        """
+        row = self.conn.execute(
+            "SELECT MAX(timestamp) FROM history "
+            "WHERE kind = ? AND tag = ? AND keyframe = 1 AND timestamp <= ?",
+            (kind, tag, since)).fetchone()
+        start = row[0] if row[0] is not None else since
+        cursor = self.conn.execute(
+            "SELECT timestamp, keyframe, data FROM history "
+            "WHERE kind = ? AND tag = ? AND timestamp >= ? ORDER BY timestamp, rowid",
+            (kind, tag, start))
+        return [
+            HistoryRecord(
+                timestamp=dt.datetime.utcfromtimestamp(timestamp),
+                keyframe=bool(keyframe),
+                data=self.decode(blob))
+            for timestamp, keyframe, blob in cursor]
+
+    def stats(self):
+        """Return list of (table, kind, count, compressed bytes)."""
+        out = []
+        for table in ['snapshots', 'history']:
+            cursor = self.conn.execute(
+                "SELECT kind, COUNT(*), SUM(LENGTH(data)) FROM {} GROUP BY kind ORDER BY kind".format(table))
+            out.extend((table, kind, count, size) for kind, count, size in cursor)
+        return out
+
+
+class SnapshotStore:
+    """Shared snapshot store for API data.
+
+    This is a utility cog which replaces per-tag JSON cache files.
+    Snapshots are indexed by (kind, tag) and store when they were fetched.
+    Cogs can also append to a per-tag history of keyframes and deltas.
+
+    class MyCog:
+
+        def __init__(self, bot):
+            self.bot = bot
+
+        def foo(self, tag, data):
+            store = self.bot.get_cog('SnapshotStore')
+            store.put('mycog.player', tag, data)
+            snapshot = store.get('mycog.player', tag)
+    """
+
+    def __init__(self, bot):
+        """Init."""
+        self.bot = bot
+        self.db = SnapshotDB(DB)
+
+    def __unload(self):
+        self.db.close()
+
+    def put(self, kind, tag, data, timestamp=None):
+        """Save snapshot.
+
+        timestamp: epoch seconds. Defaults to now.
+        """
+        self.db.put_many(kind, {tag: data}, timestamp=timestamp)
+
+    def put_many(self, kind, items, timestamp=None):
+        """Save dict of tag: data in one transaction."""
+        self.db.put_many(kind, items, timestamp=timestamp)
+
+    def get(self, kind, tag):
+        """Return Snapshot or None if not found."""
+        return self.db.get_many(kind, [tag]).get(tag)
+
+    def get_many(self, kind, tags):
+        """Return dict of tag: Snapshot for tags found."""
+        return self.db.get_many(kind, tags)
+
+    def append_history(self, kind, items, timestamp=None):
+        """Append to time series.
+
+        items: dict of tag: (data, keyframe).
+        keyframe: True if data is a full state, False if it is a delta.
+        """
+        self.db.append_history(kind, items, timestamp=timestamp)
+
+    def history(self, kind, tag, since=0):
+        """Return list of HistoryRecord starting from the keyframe before since.
+
+        since: epoch seconds.
+        """
+        return self.db.history(kind, tag, since)
+
+    def import_legacy(self, kind, path):
+        """Import per-tag JSON files. Return number of files imported."""
+        count = 0
+        for filepath in glob.glob(os.path.join(path, "*.json")):
+            tag = os.path.splitext(os.path.basename(filepath))[0]
+            try:
+                data = dataIO.load_json(filepath)
+            except json.decoder.JSONDecodeError:
+                continue
+            self.put(kind, tag, data, timestamp=os.path.getmtime(filepath))
+            count += 1
+        return count
+
+    @commands.group(pass_context=True)
+    @checks.is_owner()
+    async def snapshotstore(self, ctx):
+        """Shared snapshot store."""
+        if ctx.invoked_subcommand is None:
+            await send_cmd_help(ctx)
+
+    @snapshotstore.command(name="stats", pass_context=True)
+    async def snapshotstore_stats(self, ctx):
+        """Number of snapshots and size by kind."""
+        fmt = '{:<10} {:<20} {:>8} {:>12}'
+        out = [fmt.format("Table", "Kind", "Count", "Bytes"), '-' * 53]
+        for table, kind, count, size in self.db.stats():
+            out.append(fmt.format(table, kind, count, '{:,}'.format(size or 0)))
+        out.append('-' * 53)
+        out.append('Database size: {:,} bytes'.format(os.path.getsize(DB)))
+        await self.bot.say(box('\n'.join(out)))
+
+    @snapshotstore.command(name="import", pass_context=True)
+    async def snapshotstore_import(self, ctx):
+        """Import legacy per-tag JSON cache files.
+
+        File modification times are kept as fetch timestamps.
+        """
+        await self.bot.type()
+        for kind, path in LEGACY_PATHS.items():
+            count = self.import_legacy(kind, path)
+            await self.bot.say("Imported {} snapshots into {}.".format(count, kind))
+
+
+def check_folder():
+    """Check folder."""
+    os.makedirs(PATH, exist_ok=True)
+
+
+def setup(bot):
+    """Setup."""
+    check_folder()
+    n = SnapshotStore(bot)
+    bot.add_cog(n)
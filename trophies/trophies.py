@@ -36,6 +36,13 @@ from cogs.utils import checks
 from cogs.utils.dataIO import dataIO
 from discord.ext import commands
 
+try:
+    from cogs.httpclient import client_session
+except ImportError:
+    def client_session(bot):
+        """One-off session when the HTTPClient cog is not installed."""
+        return aiohttp.ClientSession()
+
 PATH = os.path.join("data", "trophies")
 JSON = os.path.join(PATH, "settings.json")
 
@@ -165,7 +172,7 @@ class Trophies:
         """Grabs trophy info from player and return suitable clans."""
         url = 'http://api.cr-api.com/profile/' + tag
         try:
-            async with aiohttp.ClientSession() as session:
+            async with client_session(self.bot) as session:
                 async with session.get(url, timeout=10) as resp:
                     data = await resp.json()
         except json.decoder.JSONDecodeError: